@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'littlelemon.settings')
 
 application = get_asgi_application()
+
+from littlelemonAPI.async_views import serve_asgi  # noqa: E402
+from littlelemonAPI.catalog import warm_caches  # noqa: E402
+
+# Antes de la primera petición: urls.py monta las variantes de ASYNC_VIEWS solo en procesos ASGI
+serve_asgi()
+warm_caches()
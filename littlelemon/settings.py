@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 import os
 import environ
@@ -59,6 +60,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'littlelemonAPI.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -101,6 +103,81 @@ DATABASES = {
     }
 }
 
+# Colación de MenuItem.title / description para la búsqueda (el FULLTEXT ignora mayúsculas y acentos).
+# Solo MySQL: utf8mb4_0900_ai_ci en MySQL 8; MariaDB y MySQL 5.7 no la tienen: utf8mb4_unicode_ci
+MENU_SEARCH_COLLATION = env(
+    'MENU_SEARCH_COLLATION',
+    default='utf8mb4_0900_ai_ci' if DATABASES['default']['ENGINE'] == 'django.db.backends.mysql' else None,
+)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Por defecto caché en memoria local; en producción usar CACHE_URL (p. ej. redis://127.0.0.1:6379/1).
+# Con varios workers la caché debe ser compartida: la versión del menú vive en ella y de ella dependen las
+# páginas del catálogo, las facetas y el autocompletado (check --deploy avisa)
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Caché de páginas del catálogo (GET /api/menu-items/), por proceso
+MENU_CATALOG_CACHE = {
+    'MAX_ENTRIES': env.int('MENU_CATALOG_CACHE_MAX_ENTRIES', default=512),
+    'TTL': env.int('MENU_CATALOG_CACHE_TTL', default=300),  # segundos
+}
+
+# Búsqueda de texto en el menú: auto | mysql | sqlite | trigram (ver littlelemonAPI/search.py)
+MENU_SEARCH = {
+    'BACKEND': env('MENU_SEARCH_BACKEND', default='auto'),
+    # En modo auto, catálogos con hasta este número de elementos usan el índice de trigramas en proceso
+    'TRIGRAM_MAX_ITEMS': env.int('MENU_SEARCH_TRIGRAM_MAX_ITEMS', default=2000),
+}
+
+# Compresión de respuestas (brotli si está instalado, si no gzip) a partir de MIN_SIZE bytes
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': env.int('RESPONSE_COMPRESSION_MIN_SIZE', default=1024),
+    'BROTLI_QUALITY': env.int('RESPONSE_COMPRESSION_BROTLI_QUALITY', default=5),
+}
+
+# Long-poll de la cola del repartidor (?since=): espera máxima y frecuencia de comprobación, en segundos,
+# y número máximo de esperas simultáneas (en todos los workers si la caché es compartida)
+ORDER_LONG_POLL = {
+    'TIMEOUT': env.int('ORDER_LONG_POLL_TIMEOUT', default=25),
+    'INTERVAL': env.float('ORDER_LONG_POLL_INTERVAL', default=1.0),
+    'MAX_WAITERS': env.int('ORDER_LONG_POLL_MAX_WAITERS', default=4),
+}
+
+# Eventos SSE de pedidos (/api/orders/events/, solo ASGI): keepalive en segundos y eventos en cola por conexión.
+# El bus es por proceso: con varios workers, los cambios de otro llegan en la consulta de cada keepalive
+ORDER_EVENTS = {
+    'KEEPALIVE': env.int('ORDER_EVENTS_KEEPALIVE', default=15),
+    'QUEUE_SIZE': env.int('ORDER_EVENTS_QUEUE_SIZE', default=100),
+}
+
+# Rutas servidas por su variante async (async_views.py) en procesos ASGI (littlelemon.asgi); bajo WSGI se ignora:
+# menu_items, menu_item_detail, view_cart, view_orders
+ASYNC_VIEWS = env.list('ASYNC_VIEWS', default=[])
+
+# Tiempo durante el que se reproduce la respuesta de una petición con Idempotency-Key
+IDEMPOTENCY_TTL = env.int('IDEMPOTENCY_TTL', default=24 * 60 * 60)  # segundos
+
+
+# Registro: con DEBUG, los planes de consulta del listado del menú (littlelemonAPI.ordering)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'littlelemonAPI.ordering': {
+            'handlers': ['console'],
+            'level': 'DEBUG' if DEBUG else 'WARNING',
+            'propagate': False,
+        },
+    },
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,12 +221,23 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Renderizadores: JSON con orjson; MessagePack si el paquete está instalado;
+# la API navegable (costosa de renderizar) solo en desarrollo
+RENDERER_CLASSES = ['littlelemonAPI.renderers.ORJSONRenderer']
+PARSER_CLASSES = [
+    'rest_framework.parsers.JSONParser',
+    'rest_framework.parsers.FormParser',
+    'rest_framework.parsers.MultiPartParser',
+]
+if find_spec('msgpack') is not None:
+    RENDERER_CLASSES.append('littlelemonAPI.renderers.MessagePackRenderer')
+    PARSER_CLASSES.append('littlelemonAPI.renderers.MessagePackParser')
+if DEBUG:
+    RENDERER_CLASSES.append('rest_framework.renderers.BrowsableAPIRenderer')
+
 REST_FRAMEWORK = {
-    'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
-        # 'rest_framework_xml.renderers.XMLRenderer',
-    ],
+    'DEFAULT_RENDERER_CLASSES': RENDERER_CLASSES,
+    'DEFAULT_PARSER_CLASSES': PARSER_CLASSES,
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',  # Para APIs modernas, móviles, SPAs
         'rest_framework.authentication.SessionAuthentication',       # Para browsable API y testing en navegador
@@ -166,8 +254,8 @@ REST_FRAMEWORK = {
         'rest_framework.throttling.UserRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {    # CORREGIDO: Tu diccionario de tasas va aquí
-        'anon': '100/minute',        # Tasa para usuarios anónimos (usado por AnonRateThrottle)
-        'user': '100/minute',        # Tasa para usuarios autenticados (usado por UserRateThrottle)
+        'anon': env('THROTTLE_ANON_RATE', default='100/minute'),  # Tasa para usuarios anónimos (usado por AnonRateThrottle)
+        'user': env('THROTTLE_USER_RATE', default='100/minute'),  # Tasa para usuarios autenticados (usado por UserRateThrottle)
         # Puedes definir más "scopes" de throttle aquí si usas throttles personalizados
         # con scopes específicos.
     }
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'littlelemon.settings')
 
 application = get_wsgi_application()
+
+from littlelemonAPI.catalog import warm_caches  # noqa: E402
+
+warm_caches()
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class LittlelemonapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'littlelemonAPI'
+
+    def ready(self):
+        # Registrar receptores de señales (invalidación de cachés)
+        from . import signals  # noqa: F401
+        # Registrar comprobaciones de sistema (caché compartida)
+        from . import checks  # noqa: F401
@@ -0,0 +1,383 @@
+"""
+Vistas asíncronas, pensadas para el servidor ASGI (uvicorn littlelemon.asgi:application).
+
+DRF no ejecuta vistas async, así que estas son vistas de Django:
+- order_events_stream: Server-Sent Events con los cambios de estado.
+- Variantes async de menu_items, menu_itemsbuscar, view_cart y view_orders
+  con el ORM asíncrono (aget, async for, aaggregate). Se activan por ruta con
+  settings.ASYNC_VIEWS, solo en procesos ASGI (ver urls.py). Autenticación,
+  permisos, throttling y negociación de contenido son los de DRF, en un único
+  salto al pool de hilos por petición (in_thread_pool: no pasa por el hilo
+  síncrono compartido); la versión del menú se lee con la API async de
+  la caché de Django y el resto (páginas del catálogo en memoria, serialización
+  rápida, renderizado y compresión) corre en el bucle de eventos, sin E/S.
+  Lo que no tiene variante async
+  (escrituras, facetas, ?expand= extra en el menú, API navegable) se delega en
+  la vista síncrona.
+
+Comparativa WSGI / ASGI: python manage.py bench_asgi
+"""
+import asyncio
+import json
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from . import fastpath, views
+from .catalog import acatalog_key
+from .conditional import aqueryset_validators, instance_validators, not_modified, set_validators
+from .events import KEEPALIVE_SECONDS, order_events, status_event
+from .models import ORDER_TRANSITIONS, Cart, MenuItem, Order
+from .ordering import OrderingError, log_query_plan, plan_menu_ordering
+from .pagination import ORDER_ORDERING, PaginationError, apaginate
+from .serializers import MenuItemserializers, Orderserializers, parse_field_params
+
+# Formatos que las variantes async renderizan por sí mismas (la API navegable necesita la vista DRF)
+ASYNC_RENDER_FORMATS = {'json', 'msgpack'}
+
+# Estados finales: no se envían en la instantánea inicial
+FINAL_STATUSES = tuple(status for status, targets in ORDER_TRANSITIONS.items() if not targets)
+
+SSE_RETRY_MS = 3000
+
+# Margen de la consulta de resincronización frente a desfases de reloj entre
+# procesos; lo ya enviado se descarta por updated_at
+RESYNC_OVERLAP = timedelta(seconds=1)
+
+_serving_asgi = False
+
+
+def serve_asgi():
+    """Marcar el proceso como servidor ASGI; lo llama littlelemon/asgi.py antes de cargar las rutas"""
+    global _serving_asgi
+    _serving_asgi = True
+
+
+def serving_asgi():
+    return _serving_asgi
+
+
+def in_thread_pool(func):
+    """
+    sync_to_async(thread_sensitive=False): para código síncrono que no comparte
+    estado con el resto de la petición (autenticación, permisos y throttling de
+    DRF, filtros del menú). Corre en el pool de hilos en lugar de esperar turno en
+    el hilo síncrono de la petición. Al terminar se cierran las conexiones a la
+    base de datos de ese hilo según CONN_MAX_AGE, como al final de una petición
+    síncrona, para que el pool no acumule conexiones abiertas.
+    """
+    def call(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False)
+
+
+def authenticate_api_user(request):
+    """Usuario autenticado con los autenticadores de DRF, o None"""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException:
+        return None
+    return user if user.is_authenticated else None
+
+
+async def authenticated_user(request):
+    """Autenticación (consulta de sesión / usuario del token) fuera del bucle de eventos"""
+    return await in_thread_pool(authenticate_api_user)(request)
+
+
+def unauthorized_response():
+    return JsonResponse({"error": "Se requiere autenticación."}, status=401)
+
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def active_orders_snapshot(user):
+    rows = Order.objects.filter(user=user).exclude(status__in=FINAL_STATUSES).order_by('-date', '-created_at')
+    return [
+        status_event(row['id'], row['status'], row['updated_at'])
+        async for row in rows.values('id', 'status', 'updated_at')
+    ]
+
+
+async def orders_changed_since(user, since):
+    """Pedidos de `user` modificados después de `since`, también los que llegaron a un estado final"""
+    rows = Order.objects.filter(user=user, updated_at__gt=since).order_by('updated_at')
+    return [
+        status_event(row['id'], row['status'], row['updated_at'])
+        async for row in rows.values('id', 'status', 'updated_at')
+    ]
+
+
+async def order_event_stream(user):
+    """
+    Instantánea de los pedidos activos al conectar, un evento 'status' por cada
+    cambio publicado en el bus y un comentario keepalive en los silencios.
+    Si la cola del cliente se llenó se descartan los eventos pendientes y se
+    envía una instantánea nueva.
+
+    El bus solo ve los cambios hechos en este proceso. En cada silencio de
+    KEEPALIVE_SECONDS se consultan los pedidos modificados desde la última
+    comprobación, así que con varios workers los cambios hechos en otro llegan
+    como tarde en ese plazo. `sent` guarda el updated_at ya enviado de cada
+    pedido para no repetir lo que ya llegó por el bus.
+    """
+    subscription = order_events.subscribe(user.pk)
+    sent = {}
+
+    async def snapshot():
+        nonlocal since
+        since = timezone.now() - RESYNC_OVERLAP
+        events = await active_orders_snapshot(user)
+        sent.clear()
+        sent.update((event['id'], event['updated_at']) for event in events)
+        return sse_message('snapshot', events)
+
+    since = None
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        yield await snapshot()
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                checked_at = timezone.now() - RESYNC_OVERLAP
+                events = [event for event in await orders_changed_since(user, since)
+                          if sent.get(event['id']) != event['updated_at']]
+                since = checked_at
+                if not events:
+                    yield ": keepalive\n\n"
+                for event in events:
+                    sent[event['id']] = event['updated_at']
+                    yield sse_message('status', event)
+                continue
+            if subscription.overflowed:
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.overflowed = False
+                yield await snapshot()
+                continue
+            if sent.get(event['id']) != event['updated_at']:
+                sent[event['id']] = event['updated_at']
+                yield sse_message('status', event)
+    finally:
+        order_events.unsubscribe(user.pk, subscription)
+
+
+@require_GET
+async def order_events_stream(request):
+    """
+    Server-Sent Events con los cambios de estado de los pedidos del usuario.
+    Cada conexión abierta es una corrutina esperando en su cola; bajo WSGI no
+    puede mantenerse abierta sin bloquear un hilo, así que responde 501.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Este endpoint requiere el servidor ASGI."}, status=501)
+    user = await authenticated_user(request)
+    if user is None:
+        return unauthorized_response()
+    response = StreamingHttpResponse(order_event_stream(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Evitar que nginx acumule el flujo en su búfer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def prepare_api_request(request, permission_classes):
+    """
+    Negociación de contenido, autenticación, permisos y throttling de DRF para una
+    vista async. Devuelve (Request de DRF, None), (None, respuesta de error ya
+    renderizada) o (None, None) si el formato pedido debe servirlo la vista síncrona.
+    """
+    view = APIView()
+    view.permission_classes = permission_classes
+    view.args, view.kwargs = (), {}
+    view.headers = view.default_response_headers
+    view.format_kwarg = None
+    drf_request = view.initialize_request(request)
+    view.request = drf_request
+    try:
+        renderer, media_type = view.perform_content_negotiation(drf_request)
+        if renderer.format not in ASYNC_RENDER_FORMATS:
+            return None, None
+        view.initial(drf_request)
+    except APIException as exc:
+        response = view.finalize_response(drf_request, view.handle_exception(exc))
+        return None, response.render()
+    return drf_request, None
+
+
+async def aprepare_api_request(request, permission_classes):
+    return await in_thread_pool(prepare_api_request)(request, permission_classes)
+
+
+def api_response(drf_request, data, status=200):
+    """Respuesta renderizada con el renderer negociado, como la de una vista DRF"""
+    renderer = drf_request.accepted_renderer
+    body = renderer.render(data, drf_request.accepted_media_type, {'request': drf_request})
+    content_type = f'{renderer.media_type}; charset={renderer.charset}' if renderer.charset else renderer.media_type
+    return HttpResponse(body, status=status, content_type=content_type)
+
+
+def async_api_view(view):
+    """
+    Envoltorio de las variantes async: exentas de CSRF como las vistas DRF (la
+    SessionAuthentication de DRF ya lo comprueba) y con Vary: Accept como las
+    respuestas de DRF cuando hay varios renderers
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        response = await view(request, *args, **kwargs)
+        if len(api_settings.DEFAULT_RENDERER_CLASSES) > 1:
+            patch_vary_headers(response, ('Accept',))
+        return response
+    return csrf_exempt(wrapper)
+
+
+async def delegate(sync_view, request, **kwargs):
+    """
+    Servir la petición con la vista síncrona equivalente. Sigue en el hilo síncrono
+    de la petición (thread_sensitive): la vista puede escribir y usar transacciones
+    """
+    return await sync_to_async(sync_view)(request, **kwargs)
+
+
+@async_api_view
+async def menu_items_async(request):
+    """Variante async de views.menu_items (GET)"""
+    if request.method != 'GET' or request.GET.get('facets'):
+        return await delegate(views.menu_items, request)
+    fields, expand = parse_field_params(request.GET)
+    if not fastpath.supports(MenuItemserializers, expand):
+        return await delegate(views.menu_items, request)
+    api_request, error = await aprepare_api_request(request, api_settings.DEFAULT_PERMISSION_CLASSES)
+    if api_request is None:
+        return error or await delegate(views.menu_items, request)
+    request = api_request
+    renderer_format = request.accepted_renderer.format
+    cacheable = renderer_format in views.CACHEABLE_FORMATS
+    if cacheable:
+        cache_key = await acatalog_key(request.query_params, renderer_format)
+        response = views.cached_catalog_response(request, cache_key)
+        if response is not None:
+            return response
+    search = request.query_params.get('search')
+    try:
+        ordering_fields = plan_menu_ordering(request.query_params.get('ordering'), search=bool(search))
+    except OrderingError as e:
+        return api_response(request, {"error": str(e)}, status=400)
+    items = MenuItemserializers.expand_queryset(MenuItem.objects.all(), fields, expand)
+    if request.query_params.get('category') or search:
+        # Resolución de categoría y backend de búsqueda pueden consultar la base de datos
+        items = await in_thread_pool(views.filter_menu_items)(items, request.query_params)
+    else:
+        items = views.filter_menu_items(items, request.query_params)
+    if settings.DEBUG:
+        await sync_to_async(log_query_plan)(items, ordering_fields)
+    etag, last_modified = await aqueryset_validators(
+        items, fields=('updated_at', 'featured__updated_at'), extra=request.query_params.urlencode()
+    )
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return set_validators(response, etag, last_modified)
+    items = fastpath.menu_item_fast.values(items, ordering_fields, fields)
+    try:
+        page = await apaginate(request, items, ordering_fields, page_size_param='perpage', default_page_size=5)
+    except PaginationError as e:
+        return api_response(request, {"error": str(e)}, status=400)
+    data = fastpath.menu_item_fast.serialize(page, fields)
+    link = page.link_header(request)
+    if not cacheable:
+        response = api_response(request, data)
+        if link:
+            response['Link'] = link
+        return set_validators(response, etag, last_modified)
+    return views.cache_catalog_response(request, cache_key, data, etag, last_modified, link)
+
+
+@async_api_view
+async def menu_item_detail_async(request, pk):
+    """Variante async de views.menu_itemsbuscar (GET)"""
+    if request.method != 'GET':
+        return await delegate(views.menu_itemsbuscar, request, pk=pk)
+    api_request, error = await aprepare_api_request(request, [AllowAny])
+    if api_request is None:
+        return error or await delegate(views.menu_itemsbuscar, request, pk=pk)
+    request = api_request
+    try:
+        item = await MenuItem.objects.select_related('featured').aget(id=pk)
+    except (MenuItem.DoesNotExist, ValueError, ValidationError):
+        return api_response(request, {"detail": "No MenuItem matches the given query."}, status=404)
+    etag, last_modified = instance_validators(item, item.featured, extra=request.query_params.urlencode())
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return set_validators(response, etag, last_modified)
+    fields, expand = parse_field_params(request.query_params)
+    serializer = MenuItemserializers(item, fields=fields, expand=expand)
+    return set_validators(api_response(request, serializer.data), etag, last_modified)
+
+
+@async_api_view
+async def view_cart_async(request):
+    """Variante async de views.view_cart"""
+    if request.method != 'GET':
+        return await delegate(views.view_cart, request)
+    api_request, error = await aprepare_api_request(request, [IsAuthenticated])
+    if api_request is None:
+        return error or await delegate(views.view_cart, request)
+    request = api_request
+    rows = fastpath.cart_fast.values(Cart.objects.filter(user=request.user))
+    return api_response(request, fastpath.cart_fast.serialize([row async for row in rows]))
+
+
+async def apaginate_orders(request, orders, fields=None, expand=None):
+    """views.paginate_orders() con el ORM asíncrono"""
+    if fastpath.supports(Orderserializers, expand):
+        page = await apaginate(request, fastpath.order_fast.values(orders, ORDER_ORDERING, fields), ORDER_ORDERING)
+        return page, fastpath.order_fast.serialize(page, fields)
+    # Las relaciones pedidas se cargan con el prefetch del propio queryset (async for)
+    page = await apaginate(request, Orderserializers.expand_queryset(orders, fields, expand), ORDER_ORDERING)
+    return page, Orderserializers(page, many=True, fields=fields, expand=expand).data
+
+
+@async_api_view
+async def view_orders_async(request):
+    """Variante async de views.view_orders"""
+    if request.method != 'GET':
+        return await delegate(views.view_orders, request)
+    api_request, error = await aprepare_api_request(request, [IsAuthenticated])
+    if api_request is None:
+        return error or await delegate(views.view_orders, request)
+    request = api_request
+    fields, expand = parse_field_params(request.query_params)
+    orders = Order.objects.filter(user=request.user)
+    etag, last_modified = await aqueryset_validators(orders, extra=request.query_params.urlencode())
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return set_validators(response, etag, last_modified)
+    try:
+        page, data = await apaginate_orders(request, orders, fields, expand)
+    except PaginationError as e:
+        return api_response(request, {"error": str(e)}, status=400)
+    response = api_response(request, data)
+    return set_validators(views.paginated_response(response, page, request), etag, last_modified)
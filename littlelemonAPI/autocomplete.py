@@ -0,0 +1,196 @@
+"""
+Índice de autocompletado (typeahead) del menú.
+
+Trie de prefijos en proceso sobre los títulos de MenuItem y Category. Cada
+palabra normalizada (minúsculas, sin acentos) se inserta en el trie y cada nodo
+guarda las entradas cuyo título tiene una palabra con ese prefijo, así que una
+consulta no toca la base de datos: recorre len(prefijo) nodos e intersecta conjuntos.
+
+- Se construye la primera vez que se consulta (una sola consulta por modelo).
+- En el proceso que guarda o elimina, las señales lo actualizan de forma
+  incremental al confirmar la transacción, solo si estaba al día justo antes
+  de ese incremento de versión; si no, se reconstruye en la siguiente consulta.
+- Los demás workers detectan el cambio por la versión del menú (catalog.py) y lo
+  reconstruyen en la siguiente consulta; con una caché local por proceso lo
+  reconstruyen como tarde tras LOCAL_MAX_AGE segundos.
+"""
+import heapq
+import threading
+import time
+from decimal import Decimal
+
+from .catalog import get_menu_version, is_current
+from .models import Category, MenuItem
+from .search import normalize, tokenize, tokenize_all
+
+MENU_ITEM = 'menuitem'
+CATEGORY = 'category'
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+
+class _Node:
+    __slots__ = ('children', 'keys')
+
+    def __init__(self):
+        self.children = {}
+        self.keys = set()
+
+
+class PrefixIndex:
+    """Trie de prefijos de palabras -> entradas (tipo, id)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._root = _Node()
+        self._entries = {}
+        self.version = None
+        self.built_at = 0.0
+
+    # Construcción y mantenimiento
+
+    def rebuild(self):
+        version = get_menu_version()
+        root = _Node()
+        entries = {}
+        for item_id, title, price, category_id in MenuItem.objects.filter(available=True).values_list(
+            'id', 'title', 'price', 'featured_id'
+        ):
+            key = (MENU_ITEM, item_id)
+            entries[key] = _menu_item_entry(item_id, title, price, category_id)
+            _insert(root, key, title)
+        for category_id, title, slug in Category.objects.values_list('id', 'title', 'slug'):
+            key = (CATEGORY, category_id)
+            entries[key] = _category_entry(category_id, title, slug)
+            _insert(root, key, title)
+        with self._lock:
+            self._root = root
+            self._entries = entries
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def ensure_current(self):
+        if not is_current(self.version, self.built_at):
+            self.rebuild()
+
+    def _follows(self, version):
+        """
+        True si el trie estaba en la versión inmediatamente anterior a `version`,
+        la que devolvió el incremento de este cambio. Si no, falta algún cambio de
+        otro worker y solo una reconstrucción completa puede marcarlo como vigente.
+        """
+        return self.version is not None and isinstance(version, int) and self.version == version - 1
+
+    def add(self, key, make_entry, version):
+        """
+        Insertar la entrada que construye `make_entry()`. Solo se construye si el
+        trie sigue la versión: un fallo al construirla no llega a un trie obsoleto
+        """
+        with self._lock:
+            if not self._follows(version):
+                return
+            entry = make_entry()
+            self._remove(key)
+            self._entries[key] = entry
+            _insert(self._root, key, entry['title'])
+            self.version = version
+
+    def remove(self, key, version):
+        with self._lock:
+            if not self._follows(version):
+                return
+            self._remove(key)
+            self.version = version
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for word in set(tokenize_all(entry['title'])):
+            path = []
+            node = self._root
+            for char in word:
+                parent, node = node, node.children.get(char)
+                if node is None:
+                    break
+                node.keys.discard(key)
+                path.append((parent, char, node))
+            # Podar los nodos que quedaron vacíos
+            for parent, char, node in reversed(path):
+                if node.keys or node.children:
+                    break
+                del parent.children[char]
+
+    # Consulta
+
+    def complete(self, query, limit=DEFAULT_LIMIT):
+        """
+        Las `limit` mejores entradas cuyo título contiene, para cada palabra de la
+        consulta, una palabra que empieza por ella. Primero las que empiezan por la
+        consulta completa, luego los títulos más cortos, luego orden alfabético.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        self.ensure_current()
+        with self._lock:
+            candidates = None
+            for word in sorted(words, key=len, reverse=True):
+                node = self._root
+                for char in word:
+                    node = node.children.get(char)
+                    if node is None:
+                        return []
+                candidates = set(node.keys) if candidates is None else candidates & node.keys
+                if not candidates:
+                    return []
+            entries = [self._entries[key] for key in candidates]
+        prefix = ' '.join(words)
+        return heapq.nsmallest(limit, entries, key=lambda entry: (
+            not entry['_normalized'].startswith(prefix), len(entry['title']), entry['_normalized'], entry['type'],
+        ))
+
+
+def _insert(root, key, title):
+    for word in set(tokenize_all(title)):
+        node = root
+        for char in word:
+            node = node.children.setdefault(char, _Node())
+            node.keys.add(key)
+
+
+def _menu_item_entry(item_id, title, price, category_id):
+    return {
+        'type': MENU_ITEM, 'id': item_id, 'title': title, 'price': f'{Decimal(str(price)):.2f}',
+        'category': category_id, '_normalized': normalize(title),
+    }
+
+
+def _category_entry(category_id, title, slug):
+    return {'type': CATEGORY, 'id': category_id, 'title': title, 'slug': slug, '_normalized': normalize(title)}
+
+
+def public_entry(entry):
+    return {field: value for field, value in entry.items() if not field.startswith('_')}
+
+
+prefix_index = PrefixIndex()
+
+
+def index_menu_item(item, version):
+    key = (MENU_ITEM, item.pk)
+    if item.available:
+        prefix_index.add(key, lambda: _menu_item_entry(item.pk, item.title, item.price, item.featured_id), version)
+    else:
+        prefix_index.remove(key, version)
+
+
+def index_category(category, version):
+    prefix_index.add(
+        (CATEGORY, category.pk), lambda: _category_entry(category.pk, category.title, category.slug), version
+    )
+
+
+def unindex(model_name, pk, version):
+    prefix_index.remove((model_name, pk), version)
@@ -0,0 +1,230 @@
+"""
+Caché del catálogo del menú.
+
+El menú cambia pocas veces al día pero se lee miles de veces por minuto, así
+que las páginas de GET /api/menu-items/ se guardan ya renderizadas (bytes JSON)
+en una caché LRU en proceso. La clave incluye un número de versión del menú que
+se incrementa en cada save/delete de MenuItem o Category (ver signals.py), por
+lo que nunca hace falta invalidar páginas: las de versiones anteriores dejan de
+consultarse y salen por LRU o por TTL.
+
+La versión solo es común a todos los workers si la caché de Django es compartida
+(CACHE_URL con Redis o Memcached). Con la caché local por defecto (locmem) cada
+proceso tiene su propia versión y no ve los cambios hechos en otro: por eso las
+páginas y los índices en proceso ligados a la versión (categorías, trigramas,
+autocompletado) caducan además tras MENU_CATALOG_CACHE['TTL'] segundos, y al
+arrancar un worker sin DEBUG con caché local se emite un aviso.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+MENU_VERSION_KEY = 'littlelemon:menu_version'
+
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Parámetros de consulta que determinan el contenido de una página del catálogo
+CATALOG_QUERY_PARAMS = ('category', 'to_price', 'search', 'ordering', 'cursor', 'perpage', 'fields', 'expand')
+
+
+_catalog_settings = getattr(settings, 'MENU_CATALOG_CACHE', {})
+
+# Edad máxima de las estructuras en proceso ligadas a la versión del menú
+LOCAL_MAX_AGE = _catalog_settings.get('TTL', 300)
+
+
+def cache_is_process_local():
+    """True si la caché de Django no se comparte entre procesos (locmem, dummy)"""
+    return settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+def get_menu_version():
+    """
+    Devuelve la versión actual del menú.
+    La versión vive en la caché de Django: con una caché compartida todos los
+    workers ven la misma; con la local, cada proceso tiene la suya.
+    """
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        # Sembrar con un valor basado en el tiempo: si la clave se pierde nunca
+        # se reutiliza una versión anterior con páginas obsoletas en memoria
+        cache.add(MENU_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(MENU_VERSION_KEY, 0)
+    return version
+
+
+async def aget_menu_version():
+    """get_menu_version() con la API async de la caché, para las vistas async"""
+    version = await cache.aget(MENU_VERSION_KEY)
+    if version is None:
+        await cache.aadd(MENU_VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(MENU_VERSION_KEY, 0)
+    return version
+
+
+def bump_menu_version():
+    """Incrementar la versión del menú (invalida todas las páginas cacheadas)"""
+    try:
+        return cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        cache.set(MENU_VERSION_KEY, time.time_ns(), timeout=None)
+        return cache.get(MENU_VERSION_KEY)
+
+
+def is_current(version, built_at):
+    """
+    True si una estructura construida en `built_at` (time.monotonic()) con la
+    versión `version` sigue vigente: misma versión del menú y edad menor que
+    LOCAL_MAX_AGE, que acota el desfase cuando la versión no es compartida.
+    """
+    return version is not None and version == get_menu_version() and time.monotonic() - built_at < LOCAL_MAX_AGE
+
+
+class LRUCache:
+    """
+    Caché LRU con expiración por TTL y contadores de aciertos/fallos.
+    Segura entre hilos; pensada para valores pequeños e inmutables (bytes).
+    """
+
+    def __init__(self, max_entries=512, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                self.evictions += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+catalog_pages = LRUCache(
+    max_entries=_catalog_settings.get('MAX_ENTRIES', 512),
+    ttl=LOCAL_MAX_AGE,
+)
+
+
+def catalog_key(query_params, renderer_format):
+    """Clave de caché para una página del catálogo en la versión actual del menú"""
+    params = tuple(query_params.get(name, '') for name in CATALOG_QUERY_PARAMS)
+    return (get_menu_version(), renderer_format) + params
+
+
+async def acatalog_key(query_params, renderer_format):
+    params = tuple(query_params.get(name, '') for name in CATALOG_QUERY_PARAMS)
+    return (await aget_menu_version(), renderer_format) + params
+
+
+class CategoryLookup:
+    """
+    Mapa en proceso slug/título de categoría -> id.
+    Permite filtrar el menú directamente por featured_id (indexado) sin unir con
+    Category. Se descarta en cada save/delete de Category (signals.py) y cuando
+    cambia la versión del menú o pasa LOCAL_MAX_AGE, para recoger cambios hechos
+    en otros workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = None
+        self.version = None
+        self.built_at = 0.0
+
+    def warm(self):
+        from .models import Category
+
+        version = get_menu_version()
+        ids = {}
+        for category_id, slug, title in Category.objects.values_list('id', 'slug', 'title'):
+            ids[title.casefold()] = category_id
+            ids[slug] = category_id
+        with self._lock:
+            self._ids = ids
+            self.version = version
+            self.built_at = time.monotonic()
+        return ids
+
+    def clear(self):
+        with self._lock:
+            self._ids = None
+            self.version = None
+
+    def resolve(self, value):
+        """Id de la categoría con ese slug o título (sin distinguir mayúsculas), o None"""
+        ids = self._ids
+        if ids is None or not is_current(self.version, self.built_at):
+            ids = self.warm()
+        value = value.strip()
+        return ids.get(value, ids.get(value.casefold()))
+
+
+category_ids = CategoryLookup()
+
+
+def warm_caches():
+    """Cargar los mapas en proceso al arrancar el worker (wsgi.py / asgi.py)"""
+    if cache_is_process_local() and not settings.DEBUG:
+        logger.warning(
+            'La caché de Django es local a cada proceso (%s): con más de un worker la versión del menú '
+            'no se comparte y cada worker puede servir el catálogo y sus facetas desfasados hasta %s s. '
+            'Configure CACHE_URL con Redis o Memcached.',
+            settings.CACHES['default']['BACKEND'], LOCAL_MAX_AGE,
+        )
+    try:
+        category_ids.warm()
+    except DatabaseError:
+        # Base de datos aún no migrada o no disponible: se cargará en la primera petición
+        pass
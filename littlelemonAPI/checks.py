@@ -0,0 +1,20 @@
+"""
+Comprobaciones de sistema de littlelemonAPI (manage.py check --deploy)
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .catalog import LOCAL_MAX_AGE, cache_is_process_local
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """La versión del menú solo invalida el catálogo en todos los workers con una caché compartida"""
+    if not cache_is_process_local():
+        return []
+    return [Warning(
+        f"CACHES['default'] usa {settings.CACHES['default']['BACKEND']}, local a cada proceso.",
+        hint=(f'Con varios workers cada uno puede servir el catálogo y sus facetas desfasados hasta {LOCAL_MAX_AGE} s. '
+              'Configure CACHE_URL (p. ej. redis://127.0.0.1:6379/1).'),
+        id='littlelemonAPI.W001',
+    )]
@@ -0,0 +1,157 @@
+"""
+Compresión negociada (brotli / gzip) de las respuestas de la API.
+
+CompressionMiddleware comprime las respuestas de tipo JSON/MessagePack/texto
+que superan RESPONSE_COMPRESSION['MIN_SIZE'] bytes, con la mejor codificación
+que acepte el cliente (Accept-Encoding): brotli si el paquete está instalado,
+si no gzip. Las respuestas en streaming (exportaciones) se comprimen con gzip
+bloque a bloque.
+
+Las vistas que cachean cuerpos ya renderizados (páginas del catálogo) guardan
+junto al cuerpo sus variantes comprimidas con compressed_body(), de modo que el
+contenido caliente se comprime una sola vez; esas respuestas llevan ya
+Content-Encoding y el middleware no vuelve a tocarlas.
+
+Como gzip de Django, se añaden bytes aleatorios al comprimir con gzip para
+mitigar ataques tipo BREACH.
+"""
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+_compression_settings = getattr(settings, 'RESPONSE_COMPRESSION', {})
+
+MIN_SIZE = _compression_settings.get('MIN_SIZE', 1024)
+BROTLI_QUALITY = _compression_settings.get('BROTLI_QUALITY', 5)
+GZIP_MAX_RANDOM_BYTES = 100
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/msgpack', 'application/x-ndjson', 'text/')
+
+_coding_re = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+
+
+def _accepted_codings(request):
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        match = _coding_re.match(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = quality
+    return accepted
+
+
+def negotiate_encoding(request, streaming=False):
+    """'br', 'gzip' o None según Accept-Encoding y lo disponible"""
+    accepted = _accepted_codings(request)
+    candidates = ['gzip'] if streaming or brotli is None else ['br', 'gzip']
+    best = None
+    for coding in candidates:
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (coding, quality)
+    return best[0] if best else None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return compress_string(body, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '')
+    return (
+        not response.has_header('Content-Encoding')
+        and 200 <= response.status_code < 300
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def compressed_body(request, body, variants):
+    """
+    (cuerpo, codificación) para un cuerpo cacheado. `variants` es el diccionario
+    codificación -> bytes guardado junto al cuerpo; se completa la primera vez
+    que se pide cada codificación.
+    """
+    if len(body) < MIN_SIZE:
+        return body, None
+    encoding = negotiate_encoding(request)
+    if encoding is None:
+        return body, None
+    compressed = variants.get(encoding)
+    if compressed is None:
+        compressed = variants[encoding] = compress(body, encoding)
+    if len(compressed) >= len(body):
+        return body, None
+    return compressed, encoding
+
+
+def set_content_encoding(response, encoding):
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if encoding:
+        response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(response.content))
+        # Un ETag fuerte no puede compartirse entre representaciones comprimidas y sin comprimir
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+    return response
+
+
+class CompressionMiddleware:
+    # Compatible con ASGI sin pasar cada petición por un hilo (vistas async)
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if not is_compressible(response):
+            return response
+        if response.streaming:
+            return self._compress_streaming(request, response)
+        if len(response.content) < MIN_SIZE:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request)
+        if encoding is None:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        return set_content_encoding(response, encoding)
+
+    def _compress_streaming(self, request, response):
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.is_async or negotiate_encoding(request, streaming=True) is None:
+            return response
+        response.streaming_content = compress_sequence(
+            response.streaming_content, max_random_bytes=GZIP_MAX_RANDOM_BYTES
+        )
+        del response.headers['Content-Length']
+        response['Content-Encoding'] = 'gzip'
+        return response
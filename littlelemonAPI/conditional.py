@@ -0,0 +1,80 @@
+"""
+Soporte de GET condicional (ETag / If-None-Match y Last-Modified / If-Modified-Since).
+
+Los validadores se calculan a partir de TimeStampedModel.updated_at: para un
+listado basta un único aggregate (MAX(updated_at) + COUNT) sobre el queryset
+filtrado, sin serializar nada. Si el cliente ya tiene la versión vigente se
+responde 304 sin cuerpo.
+
+Los listados solo llevan ETag: borrar una fila no cambia MAX(updated_at), así
+que un Last-Modified basado en él daría un 304 obsoleto a quien solo envía
+If-Modified-Since. El COUNT del ETag sí recoge los borrados. Los objetos
+sueltos llevan además Last-Modified.
+
+Nota: QuerySet.update() no actualiza updated_at (auto_now solo se aplica en
+save()), así que las actualizaciones masivas deben fijarlo explícitamente.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """ETag débil a partir de las partes dadas (débil porque el cuerpo puede comprimirse)"""
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode(), usedforsecurity=False)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def queryset_validators(queryset, fields=('updated_at',), extra=''):
+    """
+    Devuelve (etag, None) para un queryset con una sola consulta (sin Last-Modified,
+    ver el docstring del módulo). `fields` permite incluir marcas de tiempo de
+    relaciones (p. ej. 'featured__updated_at').
+    """
+    values = queryset.order_by().aggregate(**_validator_aggregates(fields))
+    return _validators_from(values, fields, extra)
+
+
+async def aqueryset_validators(queryset, fields=('updated_at',), extra=''):
+    """queryset_validators() con el ORM asíncrono"""
+    values = await queryset.order_by().aaggregate(**_validator_aggregates(fields))
+    return _validators_from(values, fields, extra)
+
+
+def _validator_aggregates(fields):
+    aggregates = {f'max_{index}': Max(field) for index, field in enumerate(fields)}
+    return {'row_count': Count('pk'), **aggregates}
+
+
+def _validators_from(values, fields, extra):
+    timestamps = [values[f'max_{index}'] for index in range(len(fields))]
+    timestamps = [ts for ts in timestamps if ts is not None]
+    etag = make_etag(values['row_count'], *[ts.timestamp() for ts in timestamps], extra)
+    return etag, None
+
+
+def instance_validators(*instances, extra=''):
+    """Devuelve (etag, last_modified) para uno o varios objetos ya cargados"""
+    timestamps = [instance.updated_at for instance in instances]
+    last_modified = max(timestamps)
+    etag = make_etag(*[f'{instance.pk}@{instance.updated_at.timestamp()}' for instance in instances], extra)
+    return etag, last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """Respuesta 304 si el cliente ya tiene la representación vigente, si no None"""
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def set_validators(response, etag, last_modified):
+    """Añadir las cabeceras ETag y Last-Modified a la respuesta"""
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
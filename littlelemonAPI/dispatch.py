@@ -0,0 +1,158 @@
+"""
+Despacho masivo de pedidos: cambios de estado y asignación de repartidor en bloque.
+
+Cada línea sigue las mismas reglas que update_order: el cambio de estado debe
+ser legal (ORDER_TRANSITIONS) y la asignación de repartidor las de
+Order.assign_crew (no en estados finales; READY pasa a IN_DELIVERY con su
+registro en el historial). Como en update_order, cada línea se valida entera
+antes de escribir: una línea con un estado válido y un repartidor inválido no
+aplica ninguno de los dos. Las líneas que no cambian nada se omiten.
+
+Para N líneas {order_id, status, delivery_crew_id} el coste es fijo:
+- una consulta con el estado y el repartidor actuales de los pedidos
+- una consulta que valida todos los repartidores contra el grupo Delivery_crew
+- un UPDATE por combinación (estado de origen, estado final, repartidor)
+- un bulk_create del historial
+
+Cada UPDATE sigue siendo condicional sobre el estado de origen leído (como
+Order.transition): si otro cambio se cuela entre la lectura y la escritura, el
+número de filas no cuadra y se revierte todo el lote con DispatchConflict.
+"""
+import uuid
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    ORDER_TRANSITIONS, Order, OrderStatusHistory, parse_order_status, publish_status_changes,
+    status_after_crew_assignment,
+)
+from .roles import DELIVERY_CREW
+
+MAX_DISPATCH_ITEMS = 100
+
+
+class DispatchConflict(Exception):
+    """Algún pedido cambió de estado mientras se aplicaba el lote"""
+
+
+def valid_crew_ids(user_ids):
+    """Subconjunto de `user_ids` que pertenece al grupo Delivery_crew (una consulta)"""
+    if not user_ids:
+        return set()
+    return set(
+        User.objects.filter(pk__in=user_ids, groups__name=DELIVERY_CREW).values_list('pk', flat=True)
+    )
+
+
+def dispatch_orders(lines, changed_by):
+    """
+    Aplicar en bloque una lista de líneas {order_id, status?, delivery_crew_id?}.
+    Devuelve (pedidos actualizados [{'id', 'status', 'delivery_crew'}], errores) en el
+    orden recibido; las líneas con error no se aplican y no impiden aplicar las demás.
+    """
+    errors, parsed, seen = {}, [], set()
+    for index, line in enumerate(lines):
+        if not isinstance(line, dict) or not line.get('order_id'):
+            errors[index] = f"Línea {index + 1}: se requiere order_id."
+            continue
+        try:
+            order_id = str(uuid.UUID(str(line['order_id'])))
+        except ValueError:
+            errors[index] = f"Línea {index + 1}: order_id inválido."
+            continue
+        if order_id in seen:
+            errors[index] = f"Pedido {order_id} repetido en el lote."
+            continue
+        seen.add(order_id)
+        new_status = None
+        if line.get('status') not in (None, ''):
+            new_status = parse_order_status(line['status'])
+            if new_status is None:
+                errors[index] = f"Pedido {order_id}: valor de status inválido."
+                continue
+        crew_id = line.get('delivery_crew_id')
+        if crew_id is not None:
+            try:
+                crew_id = int(crew_id)
+            except (ValueError, TypeError):
+                errors[index] = f"Pedido {order_id}: delivery_crew_id inválido."
+                continue
+        if new_status is None and crew_id is None:
+            errors[index] = f"Pedido {order_id}: no hay cambios (status o delivery_crew_id)."
+            continue
+        parsed.append((index, order_id, new_status, crew_id))
+
+    current = {
+        str(pk): (order_status, current_crew)
+        for pk, order_status, current_crew in Order.objects.filter(
+            pk__in=[line[1] for line in parsed]
+        ).values_list('pk', 'status', 'delivery_crew_id')
+    }
+    crew_ids = valid_crew_ids({line[3] for line in parsed if line[3] is not None})
+
+    # (estado de origen, estado final, repartidor) -> pedidos, y el historial de cada pedido
+    groups = defaultdict(list)
+    steps = {}
+    updated = []
+    for index, order_id, new_status, crew_id in parsed:
+        if order_id not in current:
+            errors[index] = f"Pedido {order_id} no encontrado."
+            continue
+        source, current_crew = current[order_id]
+        if crew_id is not None and crew_id not in crew_ids:
+            errors[index] = f"Pedido {order_id}: el usuario {crew_id} no pertenece al grupo de entrega."
+            continue
+        target, history = source, []
+        if new_status is not None and new_status != source:
+            if new_status not in ORDER_TRANSITIONS.get(source, ()):
+                errors[index] = f"Pedido {order_id}: no se puede pasar de {source} a {new_status}."
+                continue
+            target = new_status
+            history.append((new_status, 'Despacho masivo'))
+        if crew_id is not None:
+            # Mismas reglas que Order.assign_crew, aplicadas tras el cambio de estado de la línea
+            after = status_after_crew_assignment(target)
+            if after is None:
+                errors[index] = f"Pedido {order_id}: no se puede asignar repartidor en estado {target}."
+                continue
+            if crew_id != current_crew or after != target:
+                target = after
+                history.append((after, f'Despacho masivo: repartidor {crew_id}'))
+            else:
+                crew_id = None
+        if not history:
+            # Mismo estado y mismo repartidor: nada que escribir
+            continue
+        groups[(source, target, crew_id)].append(order_id)
+        steps[order_id] = history
+        updated.append({
+            'id': order_id, 'status': target,
+            'delivery_crew': crew_id if crew_id is not None else current_crew,
+        })
+
+    if groups:
+        now = timezone.now()
+        with transaction.atomic():
+            for (source, target, crew_id), order_ids in groups.items():
+                changes = {'status': target, 'updated_at': now}
+                if crew_id is not None:
+                    changes['delivery_crew_id'] = crew_id
+                count = Order.objects.filter(pk__in=order_ids, status=source).update(**changes)
+                if count != len(order_ids):
+                    raise DispatchConflict('Algunos pedidos cambiaron de estado durante el despacho; reintente.')
+            OrderStatusHistory.objects.bulk_create([
+                OrderStatusHistory(order_id=order_id, status=step_status, notes=notes, changed_by=changed_by)
+                for order_id, history in steps.items()
+                for step_status, notes in history
+            ])
+            status_changes = [
+                (order_id, target)
+                for (source, target, crew_id), order_ids in groups.items() if target != source
+                for order_id in order_ids
+            ]
+            if status_changes:
+                transaction.on_commit(lambda: publish_status_changes(status_changes, now))
+    return updated, [errors[index] for index in sorted(errors)]
@@ -0,0 +1,89 @@
+"""
+Bus de eventos en proceso para los cambios de estado de los pedidos.
+
+Los cambios de estado (Order.transition, despacho masivo, checkout) publican
+tras el commit un evento {'id', 'status', 'updated_at'} en el canal del dueño
+del pedido; el endpoint SSE (/api/orders/events/) suscribe una cola asyncio
+por conexión y reenvía los eventos al cliente. Cada espectador inactivo es
+solo una corrutina esperando en su cola, no un hilo de WSGI.
+
+El bus es local al proceso y no necesita broker: publicar desde los hilos de
+las vistas síncronas entrega el evento con loop.call_soon_threadsafe en el
+bucle de cada suscriptor. Con varios procesos ASGI cada uno solo ve los
+cambios hechos en él: el bus da la entrega inmediata dentro del proceso y la
+base de datos es la fuente para el resto. El endpoint envía al conectar una
+instantánea del estado actual y, en cada silencio de KEEPALIVE segundos,
+consulta los pedidos modificados desde la última comprobación
+(async_views.order_event_stream). Un cambio hecho en otro worker llega como
+tarde KEEPALIVE segundos después.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+_events_settings = getattr(settings, 'ORDER_EVENTS', {})
+
+KEEPALIVE_SECONDS = _events_settings.get('KEEPALIVE', 15)
+QUEUE_SIZE = _events_settings.get('QUEUE_SIZE', 100)
+
+
+class Subscription:
+    """Cola de un suscriptor; `overflowed` indica que se descartaron eventos por cola llena"""
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Se ejecuta en el bucle del suscriptor
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class OrderEventBus:
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, channel):
+        """Nueva suscripción al canal (id de usuario); llamar desde el bucle de eventos"""
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, channel, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel, event):
+        """Entregar `event` a los suscriptores del canal; seguro desde cualquier hilo"""
+        with self._lock:
+            subscribers = tuple(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Bucle ya cerrado: la conexión terminó sin darse de baja
+                self.unsubscribe(channel, subscription)
+
+
+order_events = OrderEventBus()
+
+
+def status_event(order_id, status, updated_at):
+    return {'id': str(order_id), 'status': status, 'updated_at': updated_at.isoformat()}
@@ -0,0 +1,103 @@
+"""
+Exportación en streaming de pedidos (NDJSON / CSV).
+
+Los pedidos se leen en bloques keyset con .values() (sin instanciar modelos) y
+se escriben a medida que se generan, de modo que el worker mantiene la memoria
+constante aunque la tabla tenga cientos de miles de filas.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import OrderItem
+from .pagination import iterate_in_chunks, ORDER_ORDERING
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Mismos campos y nombres que Orderserializers / OrderItemserializers
+ORDER_FIELDS = ('id', 'user', 'delivery_crew', 'status', 'total', 'date')
+ORDER_ITEM_FIELDS = ('id', 'menuitem', 'quantity', 'unit_price', 'price')
+
+_ORDER_VALUES = ('id', 'user_id', 'delivery_crew_id', 'status', 'total', 'date', 'created_at')
+_ORDER_ITEM_VALUES = ('id', 'order_id', 'menuitem_id', 'quantity', 'unit_price', 'price')
+
+
+def _order_row(values):
+    return {
+        'id': values['id'],
+        'user': values['user_id'],
+        'delivery_crew': values['delivery_crew_id'],
+        'status': values['status'],
+        'total': values['total'],
+        'date': values['date'],
+    }
+
+
+def _item_row(values):
+    return {
+        'id': values['id'],
+        'menuitem': values['menuitem_id'],
+        'quantity': values['quantity'],
+        'unit_price': values['unit_price'],
+        'price': values['price'],
+    }
+
+
+def iter_orders(queryset, include_items=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Generar diccionarios de pedidos (con sus ítems si se piden) bloque a bloque"""
+    for chunk in iterate_in_chunks(queryset.values(*_ORDER_VALUES), ORDER_ORDERING, chunk_size):
+        items_by_order = {}
+        if include_items:
+            # Una consulta de ítems por bloque de pedidos
+            order_items = OrderItem.objects.filter(
+                order_id__in=[values['id'] for values in chunk]
+            ).order_by().values(*_ORDER_ITEM_VALUES)
+            for values in order_items:
+                items_by_order.setdefault(values['order_id'], []).append(_item_row(values))
+        for values in chunk:
+            row = _order_row(values)
+            if include_items:
+                row['items'] = items_by_order.get(values['id'], [])
+            yield row
+
+
+def stream_ndjson(queryset, include_items=False):
+    """Un objeto JSON por línea"""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in iter_orders(queryset, include_items):
+        yield encoder.encode(row) + '\n'
+
+
+class _Echo:
+    """Pseudo-buffer para csv.writer: devuelve la línea en lugar de almacenarla"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(queryset, include_items=False):
+    """
+    CSV con una fila por pedido, o una fila por ítem (columnas item_*) si se
+    incluyen ítems; los pedidos sin ítems ocupan una fila con esas columnas vacías
+    """
+    writer = csv.writer(_Echo())
+    header = list(ORDER_FIELDS)
+    if include_items:
+        header += [f'item_{field}' for field in ORDER_ITEM_FIELDS]
+    yield writer.writerow(header)
+    for row in iter_orders(queryset, include_items):
+        order_columns = [row[field] if row[field] is not None else '' for field in ORDER_FIELDS]
+        if not include_items:
+            yield writer.writerow(order_columns)
+            continue
+        if not row['items']:
+            yield writer.writerow(order_columns + [''] * len(ORDER_ITEM_FIELDS))
+        for item in row['items']:
+            yield writer.writerow(order_columns + [item[field] for field in ORDER_ITEM_FIELDS])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (stream_ndjson, 'application/x-ndjson', 'ndjson'),
+    'csv': (stream_csv, 'text/csv', 'csv'),
+}
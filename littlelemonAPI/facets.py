@@ -0,0 +1,89 @@
+"""
+Facetas del menú: cuántos elementos hay por categoría, por rango de precio y
+por disponibilidad, con los mismos filtros que el listado (?facets=1).
+
+Las tres facetas salen de una única consulta agrupada por
+(available, featured, rango de precio), que recorre el índice compuesto
+idx_menuitem_filters (available, featured, price); los totales de cada faceta
+se suman en Python. El resultado se cachea por versión del menú en la misma
+caché LRU en proceso que las páginas del catálogo, con la misma garantía: la
+versión del menú vive en la caché de Django, así que con CACHE_URL apuntando a
+una caché compartida (Redis, Memcached) un cambio en cualquier worker invalida
+las facetas de todos. Con la caché local por defecto y varios workers, cada
+worker puede servir facetas desfasadas hasta LOCAL_MAX_AGE segundos
+(check --deploy avisa con littlelemonAPI.W001).
+"""
+from decimal import Decimal
+
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from .catalog import catalog_pages, get_menu_version
+
+# Parámetros que cambian las facetas (la paginación y el orden no influyen)
+FACET_QUERY_PARAMS = ('category', 'to_price', 'search')
+
+# Límites de los rangos de precio: [0, 5), [5, 10), [10, 20), [20, 50), [50, ∞)
+PRICE_BUCKET_EDGES = (Decimal('5'), Decimal('10'), Decimal('20'), Decimal('50'))
+
+
+def _price_buckets():
+    lower = Decimal('0')
+    buckets = []
+    for upper in PRICE_BUCKET_EDGES:
+        buckets.append((lower, upper))
+        lower = upper
+    buckets.append((lower, None))
+    return buckets
+
+
+PRICE_BUCKETS = _price_buckets()
+
+
+def _bucket_expression():
+    return Case(
+        *[When(price__lt=upper, then=Value(index)) for index, (lower, upper) in enumerate(PRICE_BUCKETS[:-1])],
+        default=Value(len(PRICE_BUCKETS) - 1),
+        output_field=IntegerField(),
+    )
+
+
+def compute_facets(queryset):
+    """Conteos por categoría, rango de precio y disponibilidad en una sola consulta"""
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=_bucket_expression())
+        .values('available', 'featured_id', 'featured__title', 'price_bucket')
+        .annotate(count=Count('id'))
+    )
+    categories = {}
+    buckets = [0] * len(PRICE_BUCKETS)
+    available = {'true': 0, 'false': 0}
+    total = 0
+    for row in rows:
+        count = row['count']
+        total += count
+        category = categories.setdefault(
+            row['featured_id'], {'id': row['featured_id'], 'title': row['featured__title'], 'count': 0}
+        )
+        category['count'] += count
+        buckets[row['price_bucket']] += count
+        available['true' if row['available'] else 'false'] += count
+    return {
+        'total': total,
+        'categories': sorted(categories.values(), key=lambda category: category['title']),
+        'price_buckets': [
+            {'min': str(lower), 'max': str(upper) if upper is not None else None, 'count': count}
+            for (lower, upper), count in zip(PRICE_BUCKETS, buckets)
+        ],
+        'available': available,
+    }
+
+
+def cached_facets(query_params, queryset):
+    """Facetas del queryset filtrado, cacheadas por versión del menú y filtros"""
+    key = ('facets', get_menu_version()) + tuple(query_params.get(name, '') for name in FACET_QUERY_PARAMS)
+    facets = catalog_pages.get(key)
+    if facets is None:
+        facets = compute_facets(queryset)
+        catalog_pages.set(key, facets)
+    return facets
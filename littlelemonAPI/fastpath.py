@@ -0,0 +1,145 @@
+"""
+Serialización rápida de solo lectura para los listados más consultados.
+
+Los ModelSerializer de DRF recorren sus campos y llaman a to_representation()
+campo a campo en cada fila, lo que domina el tiempo de CPU en listados grandes.
+Aquí cada serializador se "compila" una vez: una lista de columnas para
+.values() y, por cada campo de salida, una función que construye su valor a
+partir del diccionario de la fila. La salida renderizada es idéntica byte a
+byte a la de los serializadores de serializers.py (mismos campos, mismo orden,
+decimales como texto con sus decimales fijos, UUID como texto, fechas ISO 8601).
+
+Comparativa: python manage.py bench_serializers
+"""
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+
+from .models import Cart, MenuItem, Order, OrderItem
+
+
+def format_decimal(decimal_places):
+    """Igual que serializers.DecimalField con COERCE_DECIMAL_TO_STRING (por defecto)"""
+    exponent = Decimal(1).scaleb(-decimal_places)
+
+    def format_value(value):
+        if value is None:
+            return None
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent))
+    return format_value
+
+
+def format_str(value):
+    return None if value is None else str(value)
+
+
+def format_date(value):
+    return None if value is None else value.isoformat()
+
+
+def column(name, formatter=None):
+    """Campo de salida que copia (y opcionalmente formatea) una columna de .values()"""
+    if formatter is None:
+        return (name,), lambda row: row[name]
+    return (name,), lambda row: formatter(row[name])
+
+def nested(**fields):
+    """Objeto anidado a partir de varias columnas: nested(id='featured__id', title='featured__title')"""
+    items = tuple(fields.items())
+    return tuple(fields.values()), lambda row: {key: row[source] for key, source in items}
+
+
+class FastSerializer:
+    """
+    Serializador compilado: FastSerializer(Model, [(nombre, (columnas, constructor)), ...]).
+    Solo lectura; los campos y su orden deben coincidir con el serializador DRF equivalente.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = tuple((name, build) for name, (columns, build) in fields)
+        self.field_columns = {name: columns for name, (columns, build) in fields}
+
+    def columns(self, fields=None):
+        columns = []
+        for name, field_columns in self.field_columns.items():
+            if fields and name not in fields:
+                continue
+            for field_column in field_columns:
+                if field_column not in columns:
+                    columns.append(field_column)
+        return columns
+
+    def values(self, queryset, ordering=(), fields=None):
+        """
+        .values() con las columnas de los campos pedidos y las del ordenamiento (para
+        el cursor keyset). Los campos de ordenamiento se piden por attname (featured -> featured_id)
+        """
+        columns = self.columns(fields)
+        opts = self.model._meta
+        for field in ordering:
+            name = field.lstrip('-')
+            if name not in queryset.query.annotations:
+                try:
+                    name = opts.pk.attname if name == 'pk' else opts.get_field(name).attname
+                except FieldDoesNotExist:
+                    pass
+            if name not in columns:
+                columns.append(name)
+        return queryset.values(*columns)
+
+    def build(self, fields=None):
+        """Función fila -> diccionario, opcionalmente limitada a `fields`"""
+        selected = self.fields
+        if fields:
+            selected = tuple((name, build) for name, build in self.fields if name in fields)
+        return lambda row: {name: build(row) for name, build in selected}
+
+    def serialize(self, rows, fields=None):
+        """Lista de diccionarios a partir de filas de .values()"""
+        build = self.build(fields)
+        return [build(row) for row in rows]
+
+
+def supports(serializer_class, expand=None):
+    """La ruta rápida solo reproduce la forma por defecto (sin ?expand= adicionales)"""
+    return set(expand or ()) <= set(getattr(serializer_class.Meta, 'default_expand', ()))
+
+
+# Equivalentes de MenuItemserializers, Cartserializers, Orderserializers y OrderItemserializers
+menu_item_fast = FastSerializer(MenuItem, [
+    ('id', column('id')),
+    ('title', column('title')),
+    ('price', column('price', format_decimal(2))),
+    ('featured', nested(id='featured__id', title='featured__title')),
+])
+
+cart_fast = FastSerializer(Cart, [
+    ('id', column('id', format_str)),
+    ('user', column('user_id')),
+    ('MenuItem', column('MenuItem_id')),
+    ('quantity', column('quantity')),
+    ('unit_price', column('unit_price', format_decimal(2))),
+    ('price', column('price', format_decimal(2))),
+])
+
+order_fast = FastSerializer(Order, [
+    ('id', column('id', format_str)),
+    ('user', column('user_id')),
+    ('delivery_crew', column('delivery_crew_id')),
+    ('status', column('status')),
+    ('total', column('total', format_decimal(2))),
+    ('date', column('date', format_date)),
+])
+
+order_item_fast = FastSerializer(OrderItem, [
+    ('id', column('id')),
+    ('order', column('order_id', format_str)),
+    ('menuitem', column('menuitem_id')),
+    ('quantity', column('quantity')),
+    ('unit_price', column('unit_price', format_decimal(2))),
+    ('price', column('price', format_decimal(2))),
+])
+
@@ -0,0 +1,136 @@
+"""
+Soporte de la cabecera Idempotency-Key para operaciones que no son idempotentes
+(crear pedido, añadir al carrito).
+
+La primera petición con una clave la reserva insertando una fila IdempotencyKey:
+la restricción única (user, path, key) de la base de datos garantiza que solo
+una petición gane, aunque los reintentos lleguen a workers distintos. Después se
+ejecuta la vista y se guarda su respuesta en la misma fila durante IDEMPOTENCY_TTL.
+Los reintentos con la misma clave reproducen la respuesta guardada:
+
+- misma clave y mismo cuerpo, ya terminada  -> se devuelve la respuesta guardada
+- misma clave mientras la primera sigue en curso -> 409 Conflict
+- misma clave con otra petición distinta -> 422 Unprocessable Entity
+
+Las filas caducadas se reutilizan al llegar la misma clave y se borran con
+manage.py purge_idempotency_keys.
+"""
+import functools
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Tiempo máximo que se considera "en curso" una petición (por si el worker muere)
+IN_PROGRESS_TIMEOUT = 60
+
+
+def _fingerprint(request):
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.get_full_path().encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def expired_keys(now=None):
+    """Filas que ya no protegen nada: terminadas hace más de IDEMPOTENCY_TTL o abandonadas en curso"""
+    now = now or timezone.now()
+    ttl = getattr(settings, 'IDEMPOTENCY_TTL', 24 * 60 * 60)
+    return IdempotencyKey.objects.filter(
+        Q(status_code__isnull=False, created_at__lt=now - timedelta(seconds=ttl))
+        | Q(status_code__isnull=True, updated_at__lt=now - timedelta(seconds=IN_PROGRESS_TIMEOUT))
+    )
+
+
+def _reserve(request, key, fingerprint):
+    """
+    Reservar la clave para esta petición. Devuelve (fila, None) si la reserva es
+    nuestra, o (None, respuesta) si la clave ya está en uso.
+    """
+    lookup = {'user': request.user, 'path': request.path, 'key': key}
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(fingerprint=fingerprint, **lookup), None
+    except IntegrityError:
+        pass
+    entry = IdempotencyKey.objects.filter(**lookup).first()
+    if entry is None:
+        # Liberada entre el INSERT y la lectura: la petición que la tenía acaba de fallar
+        return None, _in_progress_response()
+    if expired_keys().filter(pk=entry.pk).exists():
+        # Caducada: quedársela con un UPDATE condicional, por si otro reintento compite por ella
+        now = timezone.now()
+        taken = IdempotencyKey.objects.filter(pk=entry.pk, updated_at=entry.updated_at).update(
+            fingerprint=fingerprint, status_code=None, response=None, created_at=now, updated_at=now
+        )
+        if taken:
+            entry.fingerprint, entry.status_code, entry.response = fingerprint, None, None
+            return entry, None
+        return None, _in_progress_response()
+    return None, _existing_entry_response(entry, fingerprint)
+
+
+def _in_progress_response():
+    return Response({"error": "Hay una petición con esta Idempotency-Key en curso."},
+                    status=status.HTTP_409_CONFLICT)
+
+
+def _replay(entry):
+    response = Response(entry.response, status=entry.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _existing_entry_response(entry, fingerprint):
+    if entry.fingerprint != fingerprint:
+        return Response({"error": "La Idempotency-Key ya se usó con una petición distinta."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if entry.status_code is None:
+        return _in_progress_response()
+    return _replay(entry)
+
+
+def idempotent(view_func):
+    """
+    Decorador para vistas de función DRF; se aplica debajo de @api_view y
+    @permission_classes. Sin la cabecera Idempotency-Key la vista se ejecuta igual que siempre.
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_func(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"error": "Idempotency-Key demasiado larga."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        entry, response = _reserve(request, key, _fingerprint(request))
+        if response is not None:
+            return response
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            entry.delete()
+            raise
+
+        if response.status_code >= 500 or not hasattr(response, 'data'):
+            # Errores del servidor: liberar la clave para que el cliente pueda reintentar
+            entry.delete()
+        else:
+            entry.status_code = response.status_code
+            entry.response = response.data
+            entry.save(update_fields=['status_code', 'response', 'updated_at'])
+        return response
+    return wrapper
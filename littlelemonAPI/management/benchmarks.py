@@ -0,0 +1,40 @@
+"""
+Utilidades comunes de los comandos bench_*: datos de prueba con un sufijo
+único (bench-<tag>) y ejecución dentro de una transacción que se revierte.
+"""
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from littlelemonAPI.models import Category, MenuItem
+
+
+@contextmanager
+def rolled_back():
+    """Ejecutar el bloque en una transacción que se revierte siempre al salir"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def bench_category():
+    """Categoría bench-<tag> con un tag aleatorio, para no chocar con datos existentes"""
+    tag = uuid.uuid4().hex[:8]
+    return Category.objects.create(title=f'bench-{tag}', slug=f'bench-{tag}')
+
+
+def bench_user_and_category():
+    """(usuario, categoría) de prueba con el mismo nombre bench-<tag>"""
+    category = bench_category()
+    return User.objects.create_user(category.title), category
+
+
+def bench_menu_items(category, count, price=lambda index: Decimal('2.50')):
+    """count elementos del menú <categoría>-<n> en una sola inserción"""
+    return MenuItem.objects.bulk_create([
+        MenuItem(title=f'{category.title}-{index}', price=price(index), featured=category)
+        for index in range(count)
+    ])
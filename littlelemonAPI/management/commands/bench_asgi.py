@@ -0,0 +1,232 @@
+"""
+Prueba de carga WSGI frente a ASGI sobre la misma base de datos.
+
+    python manage.py bench_asgi --duration 10 --concurrency 8 64
+
+Arranca por turnos gunicorn (littlelemon.wsgi, hilos gthread) y uvicorn
+(littlelemon.asgi con ASYNC_VIEWS = las cuatro variantes async) contra la base
+de datos configurada, y lanza peticiones GET con conexiones keep-alive desde un
+generador de carga asyncio a menu_items, menu_item_detail, view_cart y
+view_orders. Informa peticiones por segundo y latencias p50 / p99 por servidor,
+ruta y concurrencia.
+
+Los datos de prueba (usuario, categoría, elementos del menú, carrito y pedidos)
+se confirman para que los servidores los vean y se eliminan al terminar, así
+que la base de datos debe ser un archivo SQLite o MySQL, no una en memoria.
+El throttling se desactiva en los servidores lanzados. El generador de carga
+comparte la máquina con el servidor: compárense los resultados entre sí, no
+como capacidad absoluta.
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from littlelemonAPI.catalog import bump_menu_version, cache_is_process_local
+from littlelemonAPI.management.benchmarks import bench_menu_items, bench_user_and_category
+from littlelemonAPI.models import Cart, MenuItem, Order, OrderItem
+
+ASYNC_ROUTES = 'menu_items,menu_item_detail,view_cart,view_orders'
+UNTHROTTLED_RATE = '1000000/minute'
+
+
+def server_command(server, host, port, workers, threads):
+    if server == 'wsgi':
+        return [
+            sys.executable, '-m', 'gunicorn', 'littlelemon.wsgi:application',
+            '--bind', f'{host}:{port}', '--workers', str(workers), '--threads', str(threads),
+            '--worker-class', 'gthread', '--log-level', 'warning',
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', 'littlelemon.asgi:application',
+        '--host', host, '--port', str(port), '--workers', str(workers), '--log-level', 'warning',
+    ]
+
+
+async def read_response(reader):
+    """(estado, cerrar conexión) de una respuesta HTTP/1.1, descartando el cuerpo"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Conexión cerrada por el servidor')
+    status = int(status_line.split()[1])
+    length, chunked, close = None, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding':
+            chunked = 'chunked' in value
+        elif name == 'connection':
+            close = value == 'close'
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        close = True
+    return status, close
+
+
+async def load_worker(host, port, raw_request, deadline, latencies, errors):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            writer.write(raw_request)
+            await writer.drain()
+            status, close = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if not (200 <= status < 300 or status == 304):
+                errors.append(status)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(type(e).__name__)
+            close = True
+        if close and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(host, port, path, token, concurrency, duration):
+    raw_request = (
+        f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nAuthorization: Bearer {token}\r\n'
+        'Accept: application/json\r\nAccept-Encoding: identity\r\n\r\n'
+    ).encode()
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*[
+        load_worker(host, port, raw_request, deadline, latencies, errors) for _ in range(concurrency)
+    ])
+    return latencies, errors, time.perf_counter() - start
+
+
+def wait_for_port(host, port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('El servidor terminó al arrancar.')
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'El servidor no abrió {host}:{port} en {timeout} s.')
+
+
+class Command(BaseCommand):
+    help = 'Compara peticiones por segundo y p99 de las rutas de lectura bajo WSGI y ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[8, 64])
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--warmup', type=float, default=1)
+        parser.add_argument('--items', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--threads', type=int, default=8, help='hilos por worker de gunicorn')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        if options['workers'] > 1 and cache_is_process_local():
+            raise CommandError('Con más de un worker se requiere una caché compartida (CACHE_URL).')
+        user, category = bench_user_and_category()
+        try:
+            item_id = self._populate(user, category, options['items'], options['orders'])
+            paths = [
+                '/api/menu-items/?perpage=20',
+                f'/api/menu-items/{item_id}/',
+                '/api/cart/menu-items/',
+                '/api/orders/?per_page=20',
+            ]
+            self.stdout.write(
+                f"{'servidor':>8} {'ruta':<30} {'conc':>5} {'peticiones':>10} {'req/s':>9} "
+                f"{'p50 ms':>8} {'p99 ms':>8} {'errores':>8}"
+            )
+            for server in options['servers']:
+                self._bench_server(server, paths, user, options)
+        finally:
+            Order.objects.filter(user=user).delete()
+            Cart.objects.filter(user=user).delete()
+            MenuItem.objects.filter(featured=category).delete()
+            category.delete()
+            user.delete()
+            bump_menu_version()
+
+    def _populate(self, user, category, items, orders):
+        menu_items = bench_menu_items(category, items, price=lambda i: Decimal(200 + i) / 100)
+        Cart.objects.bulk_create([
+            Cart(user=user, MenuItem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+            for item in menu_items[:10]
+        ])
+        today = timezone.now().date()
+        created = Order.objects.bulk_create([
+            Order(user=user, total=Decimal('10.00'), date=today) for _ in range(orders)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem=menu_items[0], quantity=2, unit_price=Decimal('5.00'),
+                      price=Decimal('10.00'))
+            for order in created
+        ])
+        bump_menu_version()
+        return menu_items[0].pk
+
+    def _bench_server(self, server, paths, user, options):
+        host, port = options['host'], options['port']
+        env = dict(
+            os.environ,
+            ASYNC_VIEWS=ASYNC_ROUTES if server == 'asgi' else '',
+            THROTTLE_ANON_RATE=UNTHROTTLED_RATE,
+            THROTTLE_USER_RATE=UNTHROTTLED_RATE,
+        )
+        process = subprocess.Popen(
+            server_command(server, host, port, options['workers'], options['threads']), env=env
+        )
+        try:
+            wait_for_port(host, port, process)
+            for path in paths:
+                for concurrency in options['concurrency']:
+                    # Token nuevo por tanda: ACCESS_TOKEN_LIFETIME puede ser de un minuto
+                    token = str(AccessToken.for_user(user))
+                    asyncio.run(run_load(host, port, path, token, concurrency, options['warmup']))
+                    latencies, errors, elapsed = asyncio.run(
+                        run_load(host, port, path, token, concurrency, options['duration'])
+                    )
+                    self._report(server, path, concurrency, latencies, errors, elapsed)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    def _report(self, server, path, concurrency, latencies, errors, elapsed):
+        if latencies:
+            latencies = sorted(latency * 1000 for latency in latencies)
+            p50 = statistics.median(latencies)
+            p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+        else:
+            p50 = p99 = float('nan')
+        self.stdout.write(
+            f'{server:>8} {path:<30} {concurrency:>5} {len(latencies):>10} {len(latencies) / elapsed:>9.1f} '
+            f'{p50:>8.2f} {p99:>8.2f} {len(errors):>8}'
+        )
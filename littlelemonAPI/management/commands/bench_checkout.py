@@ -0,0 +1,56 @@
+"""
+Benchmark del checkout (Order.create_from_cart): consultas y latencia según el
+tamaño del carrito.
+
+    python manage.py bench_checkout --sizes 1 10 50 100 --repeat 5
+
+Crea sus propios datos dentro de una transacción que se revierte al terminar,
+así que puede ejecutarse contra cualquier base de datos sin dejar rastro.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from littlelemonAPI.management.benchmarks import bench_menu_items, bench_user_and_category, rolled_back
+from littlelemonAPI.models import Cart, Order
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas y latencia del checkout para distintos tamaños de carrito'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1, 10, 50, 100])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        sizes = options['sizes']
+        repeat = options['repeat']
+        with rolled_back():
+            self._run(sizes, repeat)
+
+    def _run(self, sizes, repeat):
+        user, category = bench_user_and_category()
+        menu_items = bench_menu_items(category, max(sizes))
+
+        self.stdout.write(f"{'items':>6} {'queries':>8} {'p50 ms':>8} {'max ms':>8}")
+        for size in sizes:
+            timings = []
+            queries = 0
+            for _ in range(repeat):
+                Cart.objects.bulk_create([
+                    Cart(user=user, MenuItem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+                    for item in menu_items[:size]
+                ])
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    order = Order.create_from_cart(user)
+                    timings.append((time.perf_counter() - start) * 1000)
+                # Excluir SAVEPOINT/RELEASE del recuento
+                queries = sum(1 for q in captured.captured_queries if 'SAVEPOINT' not in q['sql'])
+                assert order is not None and order.items.count() == size
+            self.stdout.write(
+                f'{size:>6} {queries:>8} {statistics.median(timings):>8.2f} {max(timings):>8.2f}'
+            )
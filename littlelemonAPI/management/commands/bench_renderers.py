@@ -0,0 +1,76 @@
+"""
+Benchmark de renderizado: JSONRenderer de DRF frente a ORJSONRenderer y
+MessagePackRenderer (si msgpack está instalado) sobre listados de pedidos grandes.
+
+    python manage.py bench_renderers --sizes 100 1000 10000 --repeat 10
+
+Los datos tienen la forma de GET /api/orders/history/ (pedidos con sus ítems),
+generados en memoria; no se toca la base de datos.
+"""
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from littlelemonAPI import renderers
+
+
+def _orders(count):
+    start = date(2025, 1, 1)
+    orders = []
+    for index in range(count):
+        items = [
+            {
+                'id': index * 3 + line,
+                'menuitem': line + 1,
+                'menuitem_title': f'Plato número {line + 1} — especial',
+                'quantity': line + 1,
+                'unit_price': str(Decimal('4.50') + line),
+                'price': str((Decimal('4.50') + line) * (line + 1)),
+            }
+            for line in range(3)
+        ]
+        orders.append({
+            'id': str(uuid.UUID(int=index)),
+            'status': 'DELIVERED',
+            'total': str(sum(Decimal(item['price']) for item in items)),
+            'date': (start + timedelta(days=index % 365)).isoformat(),
+            'delivery_crew': index % 7 or None,
+            'items': items,
+        })
+    return orders
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo de renderizado y tamaño de la respuesta por renderizador'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        candidates = [('drf-json', JSONRenderer()), ('orjson', renderers.ORJSONRenderer())]
+        if renderers.orjson is None:
+            self.stdout.write('orjson no está instalado: ORJSONRenderer usa el JSONRenderer de DRF')
+        if renderers.msgpack is not None:
+            candidates.append(('msgpack', renderers.MessagePackRenderer()))
+        else:
+            self.stdout.write('msgpack no está instalado: se omite MessagePackRenderer')
+
+        self.stdout.write(f"{'renderer':>10} {'pedidos':>8} {'p50 ms':>9} {'bytes':>10}")
+        for size in options['sizes']:
+            data = _orders(size)
+            reference = JSONRenderer().render(data)
+            if renderers.ORJSONRenderer().render(data) != reference:
+                raise CommandError('ORJSONRenderer no produce los mismos bytes que JSONRenderer.')
+            for name, renderer in candidates:
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    body = renderer.render(data)
+                    timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(f'{name:>10} {size:>8} {statistics.median(timings):>9.2f} {len(body):>10}')
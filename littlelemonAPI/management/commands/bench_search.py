@@ -0,0 +1,110 @@
+"""
+Benchmark de la búsqueda del menú: latencia por backend y tamaño de catálogo.
+
+    python manage.py bench_search --sizes 10000 100000 --repeat 20
+
+Compara title__icontains (línea base) con los backends de search.py disponibles
+en la base de datos configurada (FULLTEXT en MySQL, FTS5 en SQLite) y con el
+índice de trigramas en proceso. Los elementos se insertan y confirman (los
+índices FULLTEXT de InnoDB solo se actualizan al hacer commit) y se eliminan al final.
+"""
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from littlelemonAPI.catalog import bump_menu_version
+from littlelemonAPI.management.benchmarks import bench_category
+from littlelemonAPI.models import MenuItem
+from littlelemonAPI.search import BACKENDS, SEARCH_RANK, trigram_index
+
+WORDS = [
+    'arroz', 'paella', 'mariscos', 'camarón', 'pollo', 'jalapeño', 'limón', 'café', 'leche', 'queso',
+    'tomate', 'ajo', 'cebolla', 'pimiento', 'atún', 'salmón', 'cordero', 'ternera', 'cerdo', 'chorizo',
+    'tortilla', 'patatas', 'ensalada', 'aceitunas', 'albóndigas', 'croquetas', 'gambas', 'pulpo', 'calamares',
+    'mejillones', 'almejas', 'churros', 'chocolate', 'flan', 'natillas', 'tarta', 'manzana', 'naranja',
+    'piña', 'fresa', 'hummus', 'falafel', 'baklava', 'moussaka', 'tzatziki', 'pita', 'feta', 'orégano',
+    'menta', 'yogur', 'miel', 'nueces', 'almendras', 'pistacho', 'berenjena', 'calabacín', 'espinacas',
+]
+QUERIES = ['camaron', 'paella mariscos', 'jalap', 'cafe con leche', 'choco', 'salmon limon', 'tzatziki']
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de la búsqueda del menú por backend y tamaño de catálogo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        for size in options['sizes']:
+            category = bench_category()
+            try:
+                self._populate(category, size, rng)
+                self._run(size, options['repeat'])
+            finally:
+                # DELETE directo: evita cargar los elementos y una señal por fila
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'DELETE FROM {connection.ops.quote_name(MenuItem._meta.db_table)} WHERE featured_id = %s',
+                        [category.pk],
+                    )
+                category.delete()
+                bump_menu_version()
+
+    def _populate(self, category, size, rng):
+        batch = []
+        for i in range(size):
+            title = ' '.join(rng.sample(WORDS, 3)).capitalize()
+            batch.append(MenuItem(
+                title=f'{title} {category.pk}-{i}',
+                price=Decimal(rng.randint(200, 5000)) / 100,
+                featured=category,
+                description=' '.join(rng.choices(WORDS, k=10)),
+            ))
+            if len(batch) == 5000:
+                MenuItem.objects.bulk_create(batch)
+                batch = []
+        MenuItem.objects.bulk_create(batch)
+        bump_menu_version()
+
+    def _measure(self, search, repeat):
+        timings = []
+        for _ in range(repeat):
+            for query in QUERIES:
+                start = time.perf_counter()
+                search(query)
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+    def _run(self, size, repeat):
+        self.stdout.write(f'\n{size} elementos')
+        self.stdout.write(f"{'backend':>10} {'p50 ms':>9} {'p95 ms':>9}")
+
+        def icontains(query):
+            items = MenuItem.objects.all()
+            for word in query.split():
+                items = items.filter(title__icontains=word)
+            return list(items.order_by('id')[:20])
+        self._report('icontains', self._measure(icontains, repeat))
+
+        start = time.perf_counter()
+        trigram_index.ensure_current()
+        self.stdout.write(f"{'':>10} índice de trigramas construido en {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        for name, backend in BACKENDS.items():
+            if not backend.is_available():
+                continue
+
+            def search(query, backend=backend):
+                return list(backend.filter(MenuItem.objects.all(), query).order_by(f'-{SEARCH_RANK}', 'id')[:20])
+            self._report(name, self._measure(search, repeat))
+
+    def _report(self, name, result):
+        p50, p95 = result
+        self.stdout.write(f'{name:>10} {p50:>9.2f} {p95:>9.2f}')
@@ -0,0 +1,89 @@
+"""
+Benchmark de serialización: serializadores DRF frente a la ruta rápida (fastpath.py).
+
+    python manage.py bench_serializers --sizes 10 100 1000 --repeat 20
+
+Para cada modelo y tamaño mide consulta + serialización por ambos caminos y
+comprueba que el JSON renderizado es idéntico. Crea sus propios datos dentro de
+una transacción que se revierte al terminar.
+"""
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from littlelemonAPI.fastpath import cart_fast, menu_item_fast, order_fast, order_item_fast
+from littlelemonAPI.management.benchmarks import bench_menu_items, bench_user_and_category, rolled_back
+from littlelemonAPI.models import Cart, MenuItem, Order, OrderItem
+from littlelemonAPI.serializers import Cartserializers, MenuItemserializers, OrderItemserializers, Orderserializers
+
+
+class Command(BaseCommand):
+    help = 'Compara los serializadores DRF con la serialización rápida basada en .values()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self._run(options['sizes'], options['repeat'])
+
+    def _populate(self, size):
+        user, category = bench_user_and_category()
+        menu_items = bench_menu_items(category, size, price=lambda i: Decimal('2.50') + i % 7)
+        Cart.objects.bulk_create([
+            Cart(user=user, MenuItem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+            for item in menu_items
+        ])
+        orders = Order.objects.bulk_create([
+            Order(user=user, total=item.price, delivery_crew=user if i % 2 else None)
+            for i, item in enumerate(menu_items)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+            for order, item in zip(orders, menu_items)
+        ])
+        return user, category
+
+    def _cases(self, user, category):
+        menu = MenuItem.objects.filter(featured=category)
+        carts = Cart.objects.filter(user=user)
+        orders = Order.objects.filter(user=user)
+        order_items = OrderItem.objects.filter(order__user=user)
+        return [
+            ('MenuItem', menu.select_related('featured'), MenuItemserializers, menu, menu_item_fast),
+            ('Cart', carts, Cartserializers, carts, cart_fast),
+            ('Order', orders, Orderserializers, orders, order_fast),
+            ('OrderItem', order_items, OrderItemserializers, order_items, order_item_fast),
+        ]
+
+    def _time(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def _run(self, sizes, repeat):
+        user, category = self._populate(max(sizes))
+        renderer = JSONRenderer()
+        self.stdout.write(f"{'modelo':>10} {'filas':>6} {'drf ms':>9} {'rápida ms':>10} {'x':>6}")
+        for name, drf_queryset, serializer_class, fast_queryset, fast in self._cases(user, category):
+            for size in sizes:
+                def drf():
+                    return serializer_class(drf_queryset[:size], many=True).data
+
+                def fast_path():
+                    return fast.serialize(fast.values(fast_queryset)[:size])
+
+                if renderer.render(drf()) != renderer.render(fast_path()):
+                    raise CommandError(f'La salida rápida de {name} no coincide con la de DRF.')
+                drf_ms = self._time(drf, repeat)
+                fast_ms = self._time(fast_path, repeat)
+                self.stdout.write(
+                    f'{name:>10} {size:>6} {drf_ms:>9.2f} {fast_ms:>10.2f} {drf_ms / fast_ms:>6.1f}'
+                )
@@ -0,0 +1,19 @@
+"""
+Borrar las claves Idempotency-Key caducadas (ver littlelemonAPI/idempotency.py).
+
+    python manage.py purge_idempotency_keys
+
+Pensado para ejecutarse periódicamente (cron): las claves caducadas ya se
+reutilizan si el cliente repite la misma, pero solo este comando las elimina.
+"""
+from django.core.management.base import BaseCommand
+
+from littlelemonAPI.idempotency import expired_keys
+
+
+class Command(BaseCommand):
+    help = 'Elimina las claves Idempotency-Key caducadas'
+
+    def handle(self, *args, **options):
+        deleted, _ = expired_keys().delete()
+        self.stdout.write(f'Claves eliminadas: {deleted}')
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+FTS_TABLE = 'littlelemonapi_menuitem_fts'
+MYSQL_INDEX = 'idx_menuitem_fulltext'
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Índice de texto completo sobre title y description según el motor:
+    - MySQL: índice FULLTEXT (la colación *_ai_ci que ignora acentos la fija 0008)
+    - SQLite: tabla virtual FTS5 con remove_diacritics, sincronizada por triggers
+    Otros motores usan el índice de trigramas en proceso (ver search.py).
+    """
+    table = apps.get_model('littlelemonAPI', 'MenuItem')._meta.db_table
+    connection = schema_editor.connection
+    if connection.vendor == 'mysql':
+        schema_editor.execute(
+            f'ALTER TABLE `{table}` ADD FULLTEXT INDEX `{MYSQL_INDEX}` (`title`, `description`)'
+        )
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"title, description, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON "{table}" BEGIN '
+            f'INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); END'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON "{table}" BEGIN '
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) "
+            f"VALUES ('delete', old.id, old.title, old.description); END"
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON "{table}" BEGIN '
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) "
+            f"VALUES ('delete', old.id, old.title, old.description); "
+            f'INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description); END'
+        )
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(apps, schema_editor):
+    table = apps.get_model('littlelemonAPI', 'MenuItem')._meta.db_table
+    connection = schema_editor.connection
+    if connection.vendor == 'mysql':
+        schema_editor.execute(f'ALTER TABLE `{table}` DROP INDEX `{MYSQL_INDEX}`')
+    elif connection.vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemonAPI', '0004_alter_menuitem_options_cart_idx_cart_user_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
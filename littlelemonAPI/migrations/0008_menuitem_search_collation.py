@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    El índice FULLTEXT de 0005 compara con la colación de sus columnas: fijarla
+    explícitamente (settings.MENU_SEARCH_COLLATION) en vez de depender de la
+    colación por defecto del servidor. Solo MySQL; en los demás motores es None
+    y no se altera nada (FTS5 con remove_diacritics y el índice de trigramas
+    normalizan por su cuenta).
+    """
+
+    dependencies = [
+        ('littlelemonAPI', '0007_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='menuitem',
+            name='title',
+            field=models.CharField(
+                db_collation=settings.MENU_SEARCH_COLLATION, db_index=True, max_length=255, unique=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name='menuitem',
+            name='description',
+            field=models.TextField(blank=True, db_collation=settings.MENU_SEARCH_COLLATION),
+        ),
+    ]
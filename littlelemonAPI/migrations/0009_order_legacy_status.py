@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.utils import timezone
+
+# Valores que dejó el antiguo BooleanField status y las vistas que guardaban bool(0/1):
+# 0 = en entrega, 1 = entregado (como LEGACY_ORDER_STATUS en models.py)
+LEGACY_DELIVERED = ['1', 'True', 'true']
+LEGACY_NOT_DELIVERED = ['0', 'False', 'false']
+
+
+def migrate_legacy_status(apps, schema_editor):
+    """
+    Llevar los estados heredados a OrderStatus, con su registro en el historial.
+    Un pedido "no entregado" solo estaba realmente en entrega si tenía repartidor;
+    sin él vuelve a PENDING. Se renueva updated_at para invalidar los ETag.
+    """
+    Order = apps.get_model('littlelemonAPI', 'Order')
+    OrderStatusHistory = apps.get_model('littlelemonAPI', 'OrderStatusHistory')
+    now = timezone.now()
+    changes = [
+        (Order.objects.filter(status__in=LEGACY_DELIVERED), 'DELIVERED'),
+        (Order.objects.filter(status__in=LEGACY_NOT_DELIVERED, delivery_crew__isnull=False), 'IN_DELIVERY'),
+        (Order.objects.filter(status__in=LEGACY_NOT_DELIVERED), 'PENDING'),
+    ]
+    for orders, status in changes:
+        order_ids = list(orders.values_list('pk', flat=True))
+        if not order_ids:
+            continue
+        Order.objects.filter(pk__in=order_ids).update(status=status, updated_at=now)
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(order_id=order_id, status=status, notes='Estado heredado migrado')
+            for order_id in order_ids
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('littlelemonAPI', '0008_menuitem_search_collation'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrate_legacy_status, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,14 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, ExpressionWrapper, F, Sum, Value, When
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 from decimal import Decimal
 import uuid
 from django.utils import timezone
+from .events import order_events, status_event
 
 class TimeStampedModel(models.Model):
     """
@@ -48,12 +52,13 @@ class MenuItem(TimeStampedModel):
     """
     Elemento del menú disponible para compra
     """
-    title = models.CharField(max_length=255, db_index=True, unique=True)
+    # Colación de búsqueda solo en MySQL (settings.MENU_SEARCH_COLLATION, None en otros motores)
+    title = models.CharField(max_length=255, db_index=True, unique=True, db_collation=settings.MENU_SEARCH_COLLATION)
     price = models.DecimalField(max_digits=6, decimal_places=2, db_index=True, 
                               validators=[MinValueValidator(Decimal('0.01'))])
     featured = models.ForeignKey(Category, on_delete=models.PROTECT, 
                                related_name='menu_items')
-    description = models.TextField(blank=True)
+    description = models.TextField(blank=True, db_collation=settings.MENU_SEARCH_COLLATION)
     available = models.BooleanField(default=True, db_index=True)
     image = models.ImageField(upload_to='menu_items/', blank=True, null=True)
     
@@ -86,6 +91,17 @@ class MenuItem(TimeStampedModel):
         """Verificar si el precio está por debajo de $5.00"""
         return self.price < Decimal('5.00')
 
+# Cantidad máxima de un mismo elemento en el carrito
+MAX_CART_QUANTITY = 100
+
+
+class CartQuantityError(ValueError):
+    """La cantidad de una línea del carrito superaría MAX_CART_QUANTITY"""
+
+    def __init__(self):
+        super().__init__(f'La cantidad de un elemento del carrito no puede superar {MAX_CART_QUANTITY}.')
+
+
 class Cart(TimeStampedModel):
     """
     Carrito de compras del usuario
@@ -94,7 +110,7 @@ class Cart(TimeStampedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cart_items')
     MenuItem = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='cart_items')
     quantity = models.PositiveSmallIntegerField(default=1, 
-                                          validators=[MinValueValidator(1), MaxValueValidator(100)])
+                                          validators=[MinValueValidator(1), MaxValueValidator(MAX_CART_QUANTITY)])
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
     price = models.DecimalField(max_digits=6, decimal_places=2)
     
@@ -123,6 +139,59 @@ class Cart(TimeStampedModel):
             self.unit_price = self.MenuItem.price
             self.price = self.unit_price * Decimal(str(self.quantity))
         super().save(*args, **kwargs)
+    
+    @classmethod
+    def add_items(cls, user, lines):
+        """
+        Añadir varias líneas al carrito con un número fijo de consultas.
+        `lines` es una lista de (menu_item, cantidad) con el precio ya cargado.
+        
+        Las líneas que faltan se insertan con cantidad 0 ignorando conflictos con
+        unique_together (MenuItem, user), y después un único UPDATE suma las
+        cantidades en la base de datos con F('quantity') + n, así que dos
+        peticiones concurrentes nunca pierden incrementos.
+
+        El UPDATE no pasa por los validadores del campo: si alguna línea queda por
+        encima de MAX_CART_QUANTITY se revierte todo y se lanza CartQuantityError.
+        """
+        if not lines:
+            return
+        if any(quantity > MAX_CART_QUANTITY for menu_item, quantity in lines):
+            raise CartQuantityError()
+        price_field = models.DecimalField(max_digits=6, decimal_places=2)
+        with transaction.atomic():
+            cls.objects.bulk_create([
+                cls(user=user, MenuItem=menu_item, quantity=0,
+                    unit_price=menu_item.price, price=Decimal('0.00'))
+                for menu_item, quantity in lines
+            ], ignore_conflicts=True)
+            cls.objects.filter(
+                user=user, MenuItem_id__in=[menu_item.pk for menu_item, quantity in lines]
+            ).update(
+                # price va primero: MySQL evalúa las asignaciones de izquierda a derecha
+                # y debe ver la cantidad anterior, igual que PostgreSQL y SQLite
+                price=Case(*[
+                    When(MenuItem_id=menu_item.pk,
+                         then=ExpressionWrapper((F('quantity') + quantity) * Value(menu_item.price),
+                                                output_field=price_field))
+                    for menu_item, quantity in lines
+                ], output_field=price_field),
+                unit_price=Case(*[
+                    When(MenuItem_id=menu_item.pk, then=Value(menu_item.price))
+                    for menu_item, quantity in lines
+                ], output_field=price_field),
+                quantity=Case(*[
+                    When(MenuItem_id=menu_item.pk, then=F('quantity') + quantity)
+                    for menu_item, quantity in lines
+                ], output_field=models.PositiveSmallIntegerField()),
+                updated_at=timezone.now(),
+            )
+            # Las filas quedan bloqueadas por el UPDATE hasta el commit: la comprobación no tiene carrera
+            if cls.objects.filter(
+                user=user, MenuItem_id__in=[menu_item.pk for menu_item, quantity in lines],
+                quantity__gt=MAX_CART_QUANTITY,
+            ).exists():
+                raise CartQuantityError()
 
 class OrderStatus(models.TextChoices):
     """Opciones de estado para órdenes"""
@@ -133,6 +202,60 @@ class OrderStatus(models.TextChoices):
     DELIVERED = 'DELIVERED', 'Entregado'
     CANCELLED = 'CANCELLED', 'Cancelado'
 
+# Transiciones de estado permitidas: PENDING -> PREPARING -> READY -> IN_DELIVERY -> DELIVERED,
+# con cancelación posible mientras el pedido no haya salido a entrega. Un estado fuera de
+# OrderStatus (filas anteriores a la migración 0009) no admite ninguna transición
+ORDER_TRANSITIONS = {
+    OrderStatus.PENDING: (OrderStatus.PREPARING, OrderStatus.CANCELLED),
+    OrderStatus.PREPARING: (OrderStatus.READY, OrderStatus.CANCELLED),
+    OrderStatus.READY: (OrderStatus.IN_DELIVERY, OrderStatus.CANCELLED),
+    OrderStatus.IN_DELIVERY: (OrderStatus.DELIVERED,),
+    OrderStatus.DELIVERED: (),
+    OrderStatus.CANCELLED: (),
+}
+
+# Valores de status de la API anterior (0/1): 0 = en entrega, 1 = entregado
+LEGACY_ORDER_STATUS = {0: OrderStatus.IN_DELIVERY, 1: OrderStatus.DELIVERED}
+
+
+def parse_order_status(value):
+    """Estado de OrderStatus a partir de su nombre o del código heredado 0/1; None si no es válido"""
+    if isinstance(value, str) and value.upper() in OrderStatus.values:
+        return OrderStatus(value.upper())
+    try:
+        return LEGACY_ORDER_STATUS.get(int(value))
+    except (ValueError, TypeError):
+        return None
+
+
+def status_after_crew_assignment(current):
+    """
+    Estado de un pedido en `current` tras asignarle repartidor: READY sale a
+    entrega (IN_DELIVERY), el resto lo conserva. None si ya no admite repartidor
+    (estados finales o heredados).
+    """
+    if not ORDER_TRANSITIONS.get(current):
+        return None
+    return OrderStatus.IN_DELIVERY if current == OrderStatus.READY else current
+
+
+class OrderTransitionError(Exception):
+    """Cambio de estado no permitido desde el estado actual del pedido"""
+
+    def __init__(self, current, new):
+        self.current = current
+        self.new = new
+        super().__init__(f'No se puede pasar el pedido de {current} a {new}.')
+
+
+class CrewAssignmentError(OrderTransitionError):
+    """Asignación de repartidor a un pedido ya entregado o cancelado"""
+
+    def __init__(self, current):
+        self.current = current
+        self.new = None
+        Exception.__init__(self, f'No se puede asignar repartidor a un pedido en estado {current}.')
+
 class Order(TimeStampedModel):
     """
     Orden realizada por un usuario
@@ -179,6 +302,8 @@ class Order(TimeStampedModel):
             models.Index(fields=['status', '-date'], name='idx_order_status_date'),
             # Índice para órdenes activas (no entregadas ni canceladas)
             models.Index(fields=['user', 'status'], name='idx_order_user_status'),
+            # Cola de trabajo del repartidor: filtra sus pedidos activos (READY / IN_DELIVERY) por estado
+            models.Index(fields=['delivery_crew', 'status', '-date'], name='idx_order_crew_queue'),
         ]
     
     def __str__(self):
@@ -195,21 +320,118 @@ class Order(TimeStampedModel):
     @property
     def can_be_cancelled(self):
         """Una orden puede ser cancelada si no está en entrega o ya entregada"""
-        return self.status not in [OrderStatus.IN_DELIVERY, OrderStatus.DELIVERED, OrderStatus.CANCELLED]
+        return OrderStatus.CANCELLED in ORDER_TRANSITIONS.get(self.status, ())
+
+    @staticmethod
+    def source_statuses(status):
+        """Estados desde los que se puede llegar a `status`"""
+        return [source for source, targets in ORDER_TRANSITIONS.items() if status in targets]
+
+    @classmethod
+    def transition(cls, order_id, status, changed_by=None, history_notes='', expected=None, filters=None, **changes):
+        """
+        Cambiar el estado sin leer ni bloquear el pedido: un UPDATE condicional
+        (WHERE status IN <estados de origen válidos>) y el INSERT del historial en la
+        misma transacción. Dos actualizaciones concurrentes no pueden pisarse: la
+        segunda ya no encuentra el estado de origen y falla.
+
+        `expected` restringe los estados de origen (p. ej. el leído por el llamador),
+        `filters` añade condiciones (p. ej. delivery_crew=usuario) y `changes` otros
+        campos a escribir en el mismo UPDATE.
+        Lanza Order.DoesNotExist u OrderTransitionError.
+        """
+        sources = cls.source_statuses(status)
+        if expected is not None:
+            sources = [source for source in sources if source in expected]
+        now = timezone.now()
+        with transaction.atomic():
+            updated = cls.objects.filter(pk=order_id, status__in=sources, **(filters or {})).update(
+                status=status, updated_at=now, **changes
+            )
+            if not updated:
+                # Solo en el camino de error: distinguir pedido inexistente de transición inválida
+                current = cls.objects.filter(pk=order_id, **(filters or {})).values_list('status', flat=True).first()
+                if current is None:
+                    raise cls.DoesNotExist('No existe el pedido.')
+                raise OrderTransitionError(current, status)
+            OrderStatusHistory.objects.create(
+                order_id=order_id, status=status, notes=history_notes, changed_by=changed_by
+            )
+            transaction.on_commit(lambda: publish_status_changes([(order_id, status)], now))
     
-    def assign_crew(self, delivery_person, notes=None):
-        """Asignar repartidor y actualizar estado"""
-        self.delivery_crew = delivery_person
-        if self.status == OrderStatus.READY:
-            self.status = OrderStatus.IN_DELIVERY
+    @classmethod
+    def create_from_cart(cls, user):
+        """
+        Checkout en una sola transacción con un número fijo de consultas:
+        bloquear el carrito, total por aggregate, INSERT del pedido, bulk INSERT de
+        los ítems, INSERT del historial y DELETE del carrito.
+        Devuelve None si el carrito está vacío.
+        """
+        with transaction.atomic():
+            cart_rows = list(
+                Cart.objects.select_for_update()
+                .filter(user=user)
+                .order_by()
+                .values('id', 'MenuItem_id', 'quantity', 'unit_price', 'price')
+            )
+            if not cart_rows:
+                return None
+            cart_ids = [row['id'] for row in cart_rows]
+            total = Cart.objects.filter(pk__in=cart_ids).aggregate(total=Sum('price'))['total']
+            order = cls.objects.create(user=user, total=total, date=timezone.now().date())
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    menuitem_id=row['MenuItem_id'],
+                    quantity=row['quantity'],
+                    unit_price=row['unit_price'],
+                    price=row['price'],
+                )
+                for row in cart_rows
+            ])
+            OrderStatusHistory.objects.create(
+                order=order, status=order.status, notes='Pedido creado', changed_by=user
+            )
+            Cart.objects.filter(pk__in=cart_ids).delete()
+            transaction.on_commit(
+                lambda: publish_status_changes([(order.pk, order.status)], order.updated_at, user_id=user.pk)
+            )
+        return order
+
+    def assign_crew(self, delivery_person, notes=None, changed_by=None):
+        """
+        Asignar repartidor con su registro en el historial; un pedido READY pasa a
+        IN_DELIVERY. Lanza CrewAssignmentError en estados finales y
+        OrderTransitionError si el estado cambió desde que se leyó el pedido.
+        """
+        new_status = status_after_crew_assignment(self.status)
+        if new_status is None:
+            raise CrewAssignmentError(self.status)
+        history_notes = notes or 'Repartidor asignado'
         if notes:
-            if self.notes:
-                self.notes += f"\n{notes}"
+            notes = f"{self.notes}\n{notes}" if self.notes else notes
+        else:
+            notes = self.notes
+        with transaction.atomic():
+            if new_status != self.status:
+                type(self).transition(
+                    self.pk, new_status, changed_by=changed_by, history_notes=history_notes,
+                    expected=[self.status], delivery_crew=delivery_person, notes=notes,
+                )
             else:
-                self.notes = notes
-        self.save()
-        # Crear un registro en el historial (modelo que puedes implementar después)
-        # OrderStatusHistory.objects.create(order=self, status=self.status, notes=notes)
+                # Condicional sobre el estado leído, como transition()
+                updated = type(self).objects.filter(pk=self.pk, status=self.status).update(
+                    delivery_crew=delivery_person, notes=notes, updated_at=timezone.now()
+                )
+                if not updated:
+                    current = type(self).objects.filter(pk=self.pk).values_list('status', flat=True).first()
+                    raise OrderTransitionError(current, new_status)
+                OrderStatusHistory.objects.create(
+                    order=self, status=self.status, notes=history_notes, changed_by=changed_by
+                )
+        self.delivery_crew = delivery_person
+        self.notes = notes
+        self.status = new_status
         return self
 
 class OrderItem(TimeStampedModel):
@@ -274,4 +496,48 @@ class OrderStatusHistory(TimeStampedModel):
         ]
     
     def __str__(self):
-        return f"Orden {self.order.id} cambió a {self.get_status_display()} el {self.created_at.strftime('%d/%m/%Y %H:%M')}"
\ No newline at end of file
+        return f"Orden {self.order.id} cambió a {self.get_status_display()} el {self.created_at.strftime('%d/%m/%Y %H:%M')}"
+
+
+class IdempotencyKey(TimeStampedModel):
+    """
+    Petición con cabecera Idempotency-Key (ver idempotency.py).
+    La restricción única (user, path, key) hace de reserva atómica compartida por
+    todos los workers; status_code nulo significa que la petición sigue en curso.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    path = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        verbose_name = 'Clave de idempotencia'
+        verbose_name_plural = 'Claves de idempotencia'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'path', 'key'], name='uniq_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} de {self.user_id} en {self.path}"
+
+
+def publish_status_changes(changes, updated_at, user_id=None):
+    """
+    Publicar en el bus de eventos los cambios de estado [(order_id, status)] ya confirmados.
+    Sin espectadores conectados no hace nada; si no se conoce el dueño de los pedidos
+    se resuelve con una sola consulta.
+    """
+    if not order_events.has_subscribers():
+        return
+    if user_id is None:
+        owners = {
+            str(pk): owner
+            for pk, owner in Order.objects.filter(pk__in=[order_id for order_id, status in changes])
+            .values_list('pk', 'user_id')
+        }
+    for order_id, status in changes:
+        owner = user_id if user_id is not None else owners.get(str(order_id))
+        if owner is not None:
+            order_events.publish(owner, status_event(order_id, status, updated_at))
@@ -0,0 +1,51 @@
+"""
+Planificador de ordenamiento del listado del menú.
+
+El parámetro ?ordering= ya no llega crudo a order_by(): solo se aceptan las
+claves públicas de MENU_ORDERINGS, cada una traducida a un ordenamiento que
+recorre un índice existente y termina en un campo único, de modo que el cursor
+keyset es determinista y la base de datos no necesita ordenar toda la tabla
+(filesort). Con DEBUG activo se registra el plan de la consulta para comprobarlo.
+"""
+import logging
+
+from django.conf import settings
+
+from .pagination import MENU_ITEM_ORDERING
+from .search import SEARCH_RANK
+
+logger = logging.getLogger(__name__)
+
+# Clave pública -> ordenamiento real (y el índice que lo sirve)
+MENU_ORDERINGS = {
+    'price': ('price', 'id'),                   # idx_menuitem_price_filter
+    '-price': ('-price', 'id'),                 # idx_menuitem_price_desc (price DESC, id)
+    'title': ('title',),                        # título único
+    'category': ('featured', 'price', 'id'),    # idx_menuitem_category_price
+}
+
+
+class OrderingError(ValueError):
+    pass
+
+
+def plan_menu_ordering(ordering=None, search=False):
+    """
+    Ordenamiento para el listado del menú a partir del parámetro ?ordering=.
+    Sin parámetro: por relevancia si hay búsqueda, si no por id.
+    """
+    if not ordering:
+        return ('-' + SEARCH_RANK, 'id') if search else MENU_ITEM_ORDERING
+    try:
+        return MENU_ORDERINGS[ordering.strip()]
+    except KeyError:
+        allowed = ', '.join(MENU_ORDERINGS)
+        raise OrderingError(f'Ordenamiento no permitido: "{ordering}". Valores válidos: {allowed}.')
+
+
+def log_query_plan(queryset, ordering):
+    """Con DEBUG activo, registrar el EXPLAIN de la consulta ordenada"""
+    if not settings.DEBUG or not logger.isEnabledFor(logging.DEBUG):
+        return
+    plan = queryset.order_by(*ordering).explain()
+    logger.debug('Plan para ordering=%s:\n%s', ','.join(ordering), plan)
@@ -0,0 +1,277 @@
+"""
+Paginación por cursor (keyset) para los listados de la API.
+
+A diferencia de django.core.paginator.Paginator no ejecuta COUNT(*) ni OFFSET:
+cada página filtra con WHERE (columnas de ordenamiento) > (valores del último
+registro visto), de modo que la página 1000 cuesta lo mismo que la primera y
+las consultas usan los índices compuestos existentes (idx_order_user_date,
+idx_order_status_date, la clave primaria de MenuItem, etc.).
+
+Los cursores son opacos para el cliente: base64 de los valores de la fila
+frontera, la dirección y una firma del ordenamiento con el que se generaron.
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+import math
+import uuid
+import zlib
+
+from django.db.models import Q
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.utils.urls import replace_query_param
+
+CURSOR_PARAM = 'cursor'
+PAGE_PARAM = 'page'
+MAX_PAGE_SIZE = 100
+
+# Ordenamientos respaldados por índices existentes (con desempate estable por pk)
+MENU_ITEM_ORDERING = ('id',)
+ORDER_ORDERING = ('-date', '-created_at', '-id')
+USER_ORDERING = ('username', 'id')
+GROUP_ORDERING = ('name', 'id')
+
+
+class PaginationError(Exception):
+    """Cursor o tamaño de página no válido"""
+
+
+class KeysetPage:
+    def __init__(self, results, next_cursor=None, previous_cursor=None):
+        self.results = results
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        # Solo en páginas numeradas (paginate_numbered)
+        self.number = None
+        self.count = None
+        self.pages = None
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    def links(self, request):
+        """URLs relativas de la página siguiente y anterior (o None)"""
+        url = request.get_full_path()
+        return {
+            'next': self._link(url, self.next_cursor, 1),
+            'previous': self._link(url, self.previous_cursor, -1),
+        }
+
+    def _link(self, url, cursor, step):
+        if not cursor:
+            return None
+        url = replace_query_param(url, CURSOR_PARAM, cursor)
+        if self.number is not None:
+            # Mantener ?page= coherente para los clientes que muestran current_page
+            url = replace_query_param(url, PAGE_PARAM, self.number + step)
+        return url
+
+    def link_header(self, request):
+        """Cabecera Link (RFC 8288) para listados cuyo cuerpo es una lista"""
+        links = self.links(request)
+        return ', '.join(f'<{url}>; rel="{rel}"' for rel, url in links.items() if url)
+
+
+def _ordering_signature(ordering):
+    return zlib.crc32(','.join(ordering).encode()) & 0xffff
+
+
+def _to_json_value(value):
+    # Conservar la precisión completa (DjangoJSONEncoder trunca microsegundos)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    return value
+
+
+def encode_cursor(values, ordering, reverse=False):
+    payload = {'v': [_to_json_value(v) for v in values], 'o': _ordering_signature(ordering)}
+    if reverse:
+        payload['r'] = 1
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, ordering):
+    """Devuelve (valores, reverse) o lanza PaginationError"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = payload['v']
+        signature = payload['o']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise PaginationError('Cursor inválido.')
+    if signature != _ordering_signature(ordering) or len(values) != len(ordering):
+        raise PaginationError('El cursor no corresponde al ordenamiento solicitado.')
+    return values, bool(payload.get('r'))
+
+
+class KeysetPaginator:
+    """
+    Paginador keyset sobre un queryset y un ordenamiento de campos locales o
+    anotaciones del queryset (p. ej. search_rank).
+    El ordenamiento debe ser total (terminar en un campo único, normalmente pk).
+    """
+
+    def __init__(self, queryset, ordering, page_size):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+        opts = queryset.model._meta
+        self._attnames = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if name in queryset.query.annotations:
+                self._attnames.append(name)
+                continue
+            try:
+                model_field = opts.pk if name == 'pk' else opts.get_field(name)
+            except FieldDoesNotExist:
+                raise PaginationError(f'No se puede paginar por el campo "{name}".')
+            if not model_field.concrete or model_field.many_to_many or model_field.one_to_many:
+                raise PaginationError(f'No se puede paginar por el campo "{name}".')
+            self._attnames.append(model_field.attname)
+
+    def _boundary_filter(self, values, reverse):
+        """
+        (a, b, c) > (va, vb, vc) expandido como
+        a > va OR (a = va AND b > vb) OR (a = va AND b = vb AND c > vc),
+        respetando la dirección de cada columna
+        """
+        condition = Q()
+        equal = Q()
+        for field, attname, value in zip(self.ordering, self._attnames, values):
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{attname}__{lookup}': value})
+            equal &= Q(**{attname: value})
+        return condition
+
+    def _row_values(self, obj):
+        # Admite instancias o diccionarios de .values()
+        if isinstance(obj, dict):
+            return [obj[attname] for attname in self._attnames]
+        return [getattr(obj, attname) for attname in self._attnames]
+
+    def _page_queryset(self, cursor):
+        """(queryset de la página con una fila de más, reverse)"""
+        reverse = False
+        queryset = self.queryset
+        if cursor:
+            values, reverse = decode_cursor(cursor, self.ordering)
+            queryset = queryset.filter(self._boundary_filter(values, reverse))
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+        else:
+            ordering = self.ordering
+        # Pedir una fila de más para saber si hay otra página sin contar
+        return queryset.order_by(*ordering)[:self.page_size + 1], reverse
+
+    def page(self, cursor=None):
+        queryset, reverse = self._page_queryset(cursor)
+        return self._make_page(list(queryset), bool(cursor), reverse)
+
+    async def apage(self, cursor=None):
+        """Igual que page() con el ORM asíncrono"""
+        queryset, reverse = self._page_queryset(cursor)
+        return self._make_page([row async for row in queryset], bool(cursor), reverse)
+
+    def offset_page(self, offset):
+        """
+        Página que empieza en la fila offset (OFFSET clásico), con cursores
+        para seguir por keyset desde ella. Solo para ?page=N heredado.
+        """
+        rows = list(self.queryset.order_by(*self.ordering)[offset:offset + self.page_size + 1])
+        return self._make_page(rows, offset > 0, False)
+
+    def _make_page(self, rows, has_previous, reverse):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        if not rows:
+            return KeysetPage([])
+
+        first, last = self._row_values(rows[0]), self._row_values(rows[-1])
+        if reverse:
+            next_cursor = encode_cursor(last, self.ordering)
+            previous_cursor = encode_cursor(first, self.ordering, reverse=True) if has_more else None
+        else:
+            next_cursor = encode_cursor(last, self.ordering) if has_more else None
+            previous_cursor = encode_cursor(first, self.ordering, reverse=True) if has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def get_page_size(request, param='per_page', default=20):
+    value = request.query_params.get(param, default)
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError(f'El parámetro {param} debe ser un número entero.')
+    if page_size < 1:
+        raise PaginationError(f'El parámetro {param} debe ser mayor que cero.')
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def paginate(request, queryset, ordering, page_size_param='per_page', default_page_size=20):
+    """Paginar un queryset con el cursor de la petición; lanza PaginationError"""
+    page_size = get_page_size(request, page_size_param, default_page_size)
+    paginator = KeysetPaginator(queryset, ordering, page_size)
+    return paginator.page(request.query_params.get(CURSOR_PARAM))
+
+
+def paginate_numbered(request, queryset, ordering, page_size_param='per_page', default_page_size=20):
+    """
+    paginate() para los listados que ya exponían count/pages/página actual:
+    añade esos campos a la página para no romper a los clientes existentes.
+    Con ?cursor= avanza por keyset (los enlaces llevan también ?page=); sin
+    cursor, ?page=N salta con OFFSET como antes. Lanza PaginationError.
+    """
+    page_size = get_page_size(request, page_size_param, default_page_size)
+    try:
+        number = int(request.query_params.get(PAGE_PARAM, 1))
+    except (TypeError, ValueError):
+        raise PaginationError(f'El parámetro {PAGE_PARAM} debe ser un número entero.')
+    if number < 1:
+        raise PaginationError(f'El parámetro {PAGE_PARAM} debe ser mayor que cero.')
+    paginator = KeysetPaginator(queryset, ordering, page_size)
+    cursor = request.query_params.get(CURSOR_PARAM)
+    if cursor:
+        page = paginator.page(cursor)
+    else:
+        page = paginator.offset_page((number - 1) * page_size)
+    page.number = number
+    page.count = queryset.count()
+    page.pages = max(1, math.ceil(page.count / page_size))
+    return page
+
+
+async def apaginate(request, queryset, ordering, page_size_param='per_page', default_page_size=20):
+    """paginate() con el ORM asíncrono"""
+    page_size = get_page_size(request, page_size_param, default_page_size)
+    paginator = KeysetPaginator(queryset, ordering, page_size)
+    return await paginator.apage(request.query_params.get(CURSOR_PARAM))
+
+
+
+def iterate_in_chunks(queryset, ordering, chunk_size=1000):
+    """
+    Recorrer un queryset completo en bloques keyset de tamaño fijo.
+    Cada bloque es una consulta acotada, así que la memoria no depende del tamaño
+    de la tabla (incluso en MySQL, donde .iterator() no usa cursores de servidor).
+    """
+    paginator = KeysetPaginator(queryset, ordering, chunk_size)
+    cursor = None
+    while True:
+        page = paginator.page(cursor)
+        if page.results:
+            yield page.results
+        if not page.next_cursor:
+            break
+        cursor = page.next_cursor
@@ -0,0 +1,30 @@
+from rest_framework.permissions import BasePermission
+
+from .roles import is_manager, is_delivery_crew, is_staff_or_manager
+
+# Mismo cuerpo de error que devuelven las vistas con comprobaciones manuales
+ACCESS_DENIED = {"error": "Acceso no autorizado."}
+
+
+class IsManager(BasePermission):
+    """Usuarios del grupo Manager"""
+    message = ACCESS_DENIED
+
+    def has_permission(self, request, view):
+        return is_manager(request.user)
+
+
+class IsDeliveryCrew(BasePermission):
+    """Usuarios del grupo Delivery_crew"""
+    message = ACCESS_DENIED
+
+    def has_permission(self, request, view):
+        return is_delivery_crew(request.user)
+
+
+class IsStaffOrManager(BasePermission):
+    """Administradores (is_staff) o usuarios del grupo Manager"""
+    message = ACCESS_DENIED
+
+    def has_permission(self, request, view):
+        return is_staff_or_manager(request.user)
@@ -0,0 +1,71 @@
+"""
+Renderizadores y parsers de alto rendimiento.
+
+- ORJSONRenderer: JSON con orjson (escrito en Rust). Produce los mismos bytes
+  que rest_framework.renderers.JSONRenderer con la configuración por defecto
+  (compacto, UTF-8, U+2028/U+2029 escapados); lo que orjson no serializa por sí
+  mismo (Decimal, timedelta, fechas con hora, QuerySet...) pasa por el
+  codificador de DRF. Sin orjson instalado se comporta como JSONRenderer.
+- MessagePackRenderer / MessagePackParser: application/msgpack, a elegir por el
+  cliente con las cabeceras Accept y Content-Type. Requieren el paquete msgpack;
+  settings.py solo los registra si está instalado.
+
+Comparativa: python manage.py bench_renderers
+"""
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+# Conversión de tipos no nativos igual que JSONRenderer (Decimal -> float, datetime -> ISO 8601 con ms...)
+_encode_default = encoders.JSONEncoder().default
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=_encode_default, option=option)
+        # Igual que JSONRenderer: U+2028 y U+2029 son válidos en JSON pero no en JavaScript
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = MSGPACK_MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_encode_default, use_bin_type=True)
+
+
+class MessagePackParser(parsers.BaseParser):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except Exception:
+            raise ParseError('El cuerpo no es MessagePack válido.')
@@ -0,0 +1,176 @@
+"""
+Resolución de roles (grupos) del usuario.
+
+Los nombres de grupo se cargan una sola vez por petición y se guardan en la
+instancia del usuario (request.user), de modo que varias comprobaciones de rol
+en la misma vista no repiten consultas.
+
+Entre peticiones se reutilizan desde la caché de Django solo si es compartida:
+la entrada se indexa por una versión de roles global y otra por usuario, que se
+renuevan al confirmar cualquier cambio de pertenencia (ver signals.py). Todos
+los workers dejan de ver la entrada anterior en ese momento, sin desfase. Con
+una caché local por proceso no hay forma de avisar a los demás workers, así que
+los roles se consultan en cada petición.
+"""
+import time
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import m2m_changed
+
+from .catalog import cache_is_process_local
+
+MANAGER = 'Manager'
+DELIVERY_CREW = 'Delivery_crew'
+
+ROLE_CACHE_TTL = 300
+ROLES_VERSION_KEY = 'littlelemon:roles_version'
+GROUP_COUNTS_KEY = 'littlelemon:group_user_counts'
+# Con una caché local por proceso la invalidación solo llega al worker que hizo el cambio
+GROUP_COUNTS_TTL = 300
+
+
+def _user_version_key(user_id):
+    return f'{ROLES_VERSION_KEY}:{user_id}'
+
+
+def _group_names_key(user_id):
+    """Clave de los grupos del usuario en las versiones de roles vigentes"""
+    version_keys = (ROLES_VERSION_KEY, _user_version_key(user_id))
+    versions = cache.get_many(version_keys)
+    for key in version_keys:
+        if key not in versions:
+            # Sembrar con un valor basado en el tiempo: nunca reutiliza una versión anterior
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return f'littlelemon:user_groups:{user_id}:{versions[ROLES_VERSION_KEY]}:{versions[version_keys[1]]}'
+
+
+def get_group_names(user):
+    """Conjunto de nombres de grupo del usuario (vacío para anónimos)"""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, '_group_names', None)
+    if names is not None:
+        return names
+    shared = not cache_is_process_local()
+    if shared:
+        names_key = _group_names_key(user.pk)
+        names = cache.get(names_key)
+    if names is None:
+        names = frozenset(user.groups.values_list('name', flat=True))
+        if shared:
+            cache.set(names_key, names, timeout=ROLE_CACHE_TTL)
+    user._group_names = names
+    return names
+
+
+def has_role(user, *roles):
+    """True si el usuario pertenece a alguno de los grupos indicados"""
+    return not get_group_names(user).isdisjoint(roles)
+
+
+def is_manager(user):
+    return has_role(user, MANAGER)
+
+
+def is_delivery_crew(user):
+    return has_role(user, DELIVERY_CREW)
+
+
+def is_staff_or_manager(user):
+    return bool(user and user.is_staff) or is_manager(user)
+
+
+def invalidate_user_groups(*user_ids):
+    """
+    Renovar la versión de roles de los usuarios indicados (o la global si no se indican).
+    Se aplica al confirmar la transacción: antes, otra petición aún leería los grupos anteriores.
+    """
+    keys = [_user_version_key(user_id) for user_id in user_ids] or [ROLES_VERSION_KEY]
+
+    def bump():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), timeout=None)
+    transaction.on_commit(bump)
+
+
+def get_group_user_counts():
+    """
+    Número de miembros por grupo {group_id: count}.
+    Se calcula con un único annotate(Count('user')) y se guarda en la caché de
+    Django hasta que cambie alguna pertenencia (ver signals.py), como mucho
+    GROUP_COUNTS_TTL segundos.
+    """
+    counts = cache.get(GROUP_COUNTS_KEY)
+    if counts is None:
+        counts = dict(Group.objects.annotate(user_count=Count('user')).values_list('id', 'user_count'))
+        cache.set(GROUP_COUNTS_KEY, counts, timeout=GROUP_COUNTS_TTL)
+    return counts
+
+
+def invalidate_group_user_counts():
+    cache.delete(GROUP_COUNTS_KEY)
+
+
+def _resolve_users(user_ids):
+    """Devuelve ({id: user}, ids normalizados en el orden recibido) con una sola consulta"""
+    normalized = []
+    for user_id in user_ids:
+        try:
+            normalized.append(int(user_id))
+        except (TypeError, ValueError):
+            normalized.append(user_id)
+    valid_ids = [user_id for user_id in normalized if isinstance(user_id, int)]
+    return User.objects.only('id', 'username').in_bulk(valid_ids), normalized
+
+
+def update_group_membership(group, user_ids, add=True):
+    """
+    Añadir (add=True) o quitar usuarios de un grupo en bloque:
+    un in_bulk para resolver los ids, un values_list para la pertenencia actual y
+    un único bulk_create/DELETE sobre la tabla intermedia.
+    Devuelve (usuarios cambiados [{'id', 'username'}], errores) en el orden recibido.
+    """
+    Membership = User.groups.through
+    users, normalized = _resolve_users(user_ids)
+    current = set(
+        Membership.objects.filter(group_id=group.pk, user_id__in=list(users)).values_list('user_id', flat=True)
+    )
+
+    changed, errors, pending = [], [], set()
+    for user_id in normalized:
+        user = users.get(user_id)
+        if user is None:
+            errors.append(f"Usuario con ID {user_id} no encontrado.")
+            continue
+        is_member = (user.pk in current) != (user.pk in pending)
+        if add and is_member:
+            errors.append(f"Usuario {user.username} ya pertenece al grupo.")
+        elif not add and not is_member:
+            errors.append(f"Usuario {user.username} no pertenece al grupo.")
+        else:
+            pending.add(user.pk)
+            changed.append({'id': user.pk, 'username': user.username})
+
+    if pending:
+        with transaction.atomic():
+            if add:
+                Membership.objects.bulk_create(
+                    [Membership(user_id=user_id, group_id=group.pk) for user_id in pending],
+                    ignore_conflicts=True,
+                )
+            else:
+                Membership.objects.filter(group_id=group.pk, user_id__in=pending).delete()
+        # Las operaciones sobre la tabla intermedia no emiten m2m_changed: emitirla
+        # como group.user_set.add/remove para que se invaliden las cachés de roles
+        m2m_changed.send(
+            sender=Membership, instance=group, action='post_add' if add else 'post_remove',
+            reverse=True, model=User, pk_set=pending, using=Membership.objects.db,
+        )
+    return changed, errors
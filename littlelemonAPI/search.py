@@ -0,0 +1,295 @@
+"""
+Búsqueda de texto en el menú (title y description).
+
+title__icontains se traduce a LIKE '%x%' y ningún índice B-tree puede servirlo.
+Este módulo ofrece backends intercambiables que filtran el queryset del menú y
+anotan `search_rank` (mayor = más relevante):
+
+- mysql:   índice FULLTEXT en modo booleano (+palabra* para prefijos)
+- sqlite:  tabla virtual FTS5 con remove_diacritics (útil para tests y desarrollo)
+- trigram: índice de trigramas en proceso, para catálogos pequeños o motores
+           sin texto completo; tolera errores de tipeo
+
+Todas las consultas se normalizan (minúsculas y sin acentos), así que "cafe"
+encuentra "Café con leche". El backend se elige con MENU_SEARCH['BACKEND']
+('auto' por defecto: trigramas si el catálogo es pequeño, si no el del motor).
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+
+from .catalog import LOCAL_MAX_AGE, get_menu_version, is_current
+from .models import MenuItem
+
+SEARCH_RANK = 'search_rank'
+SQLITE_FTS_TABLE = 'littlelemonapi_menuitem_fts'
+
+# Máximo de palabras consideradas por consulta
+MAX_QUERY_TOKENS = 8
+
+_search_settings = getattr(settings, 'MENU_SEARCH', {})
+
+
+def normalize(text):
+    """Minúsculas y sin diacríticos ("Jalapeño" -> "jalapeno")"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize_all(text):
+    return re.findall(r'\w+', normalize(text or ''))
+
+
+def tokenize(text):
+    return tokenize_all(text)[:MAX_QUERY_TOKENS]
+
+
+def no_results(queryset):
+    """Queryset vacío que conserva la anotación search_rank (para ordenar y paginar)"""
+    return queryset.annotate(**{SEARCH_RANK: Value(0.0, output_field=FloatField())}).none()
+
+
+class SearchBackend:
+    name = None
+
+    def is_available(self):
+        return True
+
+    def filter(self, queryset, query):
+        """Reducir el queryset a las coincidencias y anotar search_rank"""
+        raise NotImplementedError
+
+
+class MySQLFullTextBackend(SearchBackend):
+    """
+    MATCH ... AGAINST en modo booleano sobre idx_menuitem_fulltext.
+    Las palabras más cortas que innodb_ft_min_token_size o incluidas en la lista
+    de stopwords no están en el índice: exigirlas (+palabra*) dejaría la consulta
+    sin resultados, así que se descartan. Si no queda ninguna se busca en el
+    título con LIKE, que solo ocurre con consultas muy cortas.
+    """
+    name = 'mysql'
+    _min_token_size = None
+    _stopwords = None
+
+    def is_available(self):
+        return connection.vendor == 'mysql'
+
+    def _load_index_config(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT @@innodb_ft_min_token_size, @@innodb_ft_enable_stopword, @@innodb_ft_server_stopword_table'
+            )
+            min_token_size, stopwords_enabled, stopword_table = cursor.fetchone()
+            stopwords = set()
+            if stopwords_enabled:
+                if stopword_table:
+                    # 'base_de_datos/tabla' con una columna `value`
+                    schema, _, table = stopword_table.partition('/')
+                    cursor.execute(f'SELECT value FROM {connection.ops.quote_name(schema)}.'
+                                   f'{connection.ops.quote_name(table)}')
+                else:
+                    cursor.execute('SELECT value FROM INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD')
+                stopwords = {normalize(value) for (value,) in cursor.fetchall()}
+        self._stopwords = stopwords
+        self._min_token_size = min_token_size
+
+    def indexed_tokens(self, tokens):
+        """Las palabras de la consulta que el índice FULLTEXT puede contener"""
+        if self._min_token_size is None:
+            self._load_index_config()
+        return [token for token in tokens if len(token) >= self._min_token_size and token not in self._stopwords]
+
+    def filter(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return no_results(queryset)
+        tokens = self.indexed_tokens(tokens)
+        if not tokens:
+            return queryset.filter(title__icontains=query.strip()).annotate(
+                **{SEARCH_RANK: Value(0.0, output_field=FloatField())}
+            )
+        # Todas las palabras indexables obligatorias, cada una como prefijo
+        boolean_query = ' '.join(f'+{token}*' for token in tokens)
+        table = connection.ops.quote_name(MenuItem._meta.db_table)
+        match = f'MATCH({table}.`title`, {table}.`description`) AGAINST (%s IN BOOLEAN MODE)'
+        return queryset.filter(
+            RawSQL(match, [boolean_query], output_field=BooleanField())
+        ).annotate(**{SEARCH_RANK: RawSQL(match, [boolean_query], output_field=FloatField())})
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """Tabla virtual FTS5 (ver migración 0005) ordenada por bm25"""
+    name = 'sqlite'
+    _fts_available = None
+
+    def is_available(self):
+        if connection.vendor != 'sqlite':
+            return False
+        if self._fts_available is None:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SQLITE_FTS_TABLE]
+                )
+                self._fts_available = cursor.fetchone() is not None
+        return self._fts_available
+
+    def filter(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return no_results(queryset)
+        fts_query = ' '.join(f'"{token}"*' for token in tokens)
+        table = connection.ops.quote_name(MenuItem._meta.db_table)
+        matches = f'SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s'
+        # bm25 (rank) es negativo y menor cuanto más relevante: se invierte el signo
+        rank = (f'SELECT -rank FROM {SQLITE_FTS_TABLE} '
+                f'WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid = {table}."id"')
+        return queryset.filter(pk__in=RawSQL(matches, [fts_query])).annotate(
+            **{SEARCH_RANK: RawSQL(rank, [fts_query], output_field=FloatField())}
+        )
+
+
+def _trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Índice invertido de trigramas sobre el vocabulario del menú.
+    Se reconstruye completo cuando cambia la versión del menú o pasa LOCAL_MAX_AGE (catalog.py).
+    Una palabra coincide con un término si empieza por él (prefijo) o si su
+    similitud de trigramas (Jaccard) supera SIMILARITY_THRESHOLD.
+    """
+    SIMILARITY_THRESHOLD = 0.4
+    TITLE_WEIGHT = 2.0
+    DESCRIPTION_WEIGHT = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self.built_at = 0.0
+        self.size = 0
+        self._title_postings = {}
+        self._description_postings = {}
+        self._trigram_words = {}
+        self._word_trigram_count = {}
+
+    def rebuild(self, version=None):
+        title_postings = defaultdict(set)
+        description_postings = defaultdict(set)
+        size = 0
+        for item_id, title, description in MenuItem.objects.values_list('id', 'title', 'description').iterator():
+            size += 1
+            for word in tokenize_all(title):
+                title_postings[word].add(item_id)
+            for word in tokenize_all(description):
+                description_postings[word].add(item_id)
+        trigram_words = defaultdict(set)
+        word_trigram_count = {}
+        for word in set(title_postings) | set(description_postings):
+            grams = _trigrams(word)
+            word_trigram_count[word] = len(grams)
+            for gram in grams:
+                trigram_words[gram].add(word)
+        with self._lock:
+            self._title_postings = dict(title_postings)
+            self._description_postings = dict(description_postings)
+            self._trigram_words = dict(trigram_words)
+            self._word_trigram_count = word_trigram_count
+            self.size = size
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def ensure_current(self):
+        if not is_current(self.version, self.built_at):
+            self.rebuild(get_menu_version())
+
+    def _token_scores(self, token):
+        grams = _trigrams(token)
+        shared = Counter()
+        for gram in grams:
+            for word in self._trigram_words.get(gram, ()):
+                shared[word] += 1
+        scores = {}
+        for word, common in shared.items():
+            if word.startswith(token):
+                similarity = 1.0
+            else:
+                similarity = common / (len(grams) + self._word_trigram_count[word] - common)
+                if similarity < self.SIMILARITY_THRESHOLD:
+                    continue
+            for item_id in self._title_postings.get(word, ()):
+                scores[item_id] = max(scores.get(item_id, 0.0), self.TITLE_WEIGHT * similarity)
+            for item_id in self._description_postings.get(word, ()):
+                scores[item_id] = max(scores.get(item_id, 0.0), self.DESCRIPTION_WEIGHT * similarity)
+        return scores
+
+    def search(self, query):
+        """Lista de (id, puntuación) ordenada por relevancia; todas las palabras deben coincidir"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores = None
+        for token in tokens:
+            token_scores = self._token_scores(token)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {item_id: score + token_scores[item_id]
+                          for item_id, score in scores.items() if item_id in token_scores}
+            if not scores:
+                return []
+        return sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+
+
+trigram_index = TrigramIndex()
+
+
+class TrigramBackend(SearchBackend):
+    name = 'trigram'
+
+    def filter(self, queryset, query):
+        trigram_index.ensure_current()
+        ranked = trigram_index.search(query)
+        if not ranked:
+            return no_results(queryset)
+        return queryset.filter(pk__in=[item_id for item_id, score in ranked]).annotate(
+            **{SEARCH_RANK: Case(
+                *[When(pk=item_id, then=Value(score)) for item_id, score in ranked],
+                output_field=FloatField(),
+            )}
+        )
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (MySQLFullTextBackend(), SQLiteFTS5Backend(), TrigramBackend())
+}
+
+
+def catalog_size():
+    """Número de elementos del menú, cacheado por versión del menú"""
+    return cache.get_or_set(
+        f'littlelemon:menu_size:{get_menu_version()}', MenuItem.objects.count, timeout=LOCAL_MAX_AGE
+    )
+
+
+def get_search_backend():
+    configured = _search_settings.get('BACKEND', 'auto')
+    if configured != 'auto':
+        return BACKENDS[configured]
+    if catalog_size() <= _search_settings.get('TRIGRAM_MAX_ITEMS', 2000):
+        return BACKENDS['trigram']
+    for name in ('mysql', 'sqlite'):
+        if BACKENDS[name].is_available():
+            return BACKENDS[name]
+    return BACKENDS['trigram']
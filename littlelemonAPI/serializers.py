@@ -5,6 +5,52 @@ from rest_framework.validators import UniqueValidator
 import bleach
 from django.contrib.auth.models import User, Group
 
+def parse_field_params(query_params):
+    """Listas de ?fields= y ?expand= (separadas por comas) o None si no se indican"""
+    def parse(name):
+        value = query_params.get(name)
+        if not value:
+            return None
+        return [part.strip() for part in value.split(',') if part.strip()]
+    return parse('fields'), parse('expand')
+
+class DynamicFieldsMixin:
+    """
+    Campos dinámicos para serializadores de lectura:
+    - fields=[...] limita la salida a esos campos
+    - expand=[...] sustituye el id de una relación por su representación anidada
+
+    Meta.expandable_fields: nombre -> (serializador, kwargs, 'select' | 'prefetch')
+    Meta.default_expand: relaciones que se anidan siempre (formato de respuesta existente)
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        default_expand = getattr(self.Meta, 'default_expand', ())
+        for name in expand or ():
+            if name in expandable and name not in default_expand:
+                serializer_class, serializer_kwargs, strategy = expandable[name]
+                self.fields[name] = serializer_class(read_only=True, **serializer_kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def expand_queryset(cls, queryset, fields=None, expand=None):
+        """Aplicar select_related/prefetch_related solo a las relaciones que se van a serializar"""
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        wanted = set(expand or ()) | set(getattr(cls.Meta, 'default_expand', ()))
+        for name in sorted(wanted & expandable.keys()):
+            if fields and name not in fields:
+                continue
+            serializer_class, serializer_kwargs, strategy = expandable[name]
+            if strategy == 'select':
+                queryset = queryset.select_related(name)
+            else:
+                queryset = queryset.prefetch_related(name)
+        return queryset
+
 class Categoryserializer(BleachCleanMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -13,7 +59,7 @@ class Categoryserializer(BleachCleanMixin, serializers.ModelSerializer):
     def validate_title(self, value):
         return bleach.clean(value)
 
-class MenuItemserializers(BleachCleanMixin, serializers.ModelSerializer):
+class MenuItemserializers(DynamicFieldsMixin, BleachCleanMixin, serializers.ModelSerializer):
     featured = Categoryserializer(read_only=True)
     featured_id = serializers.IntegerField(write_only=True)
     title = serializers.CharField(max_length=255, validators=[UniqueValidator(queryset=MenuItem.objects.all())])
@@ -22,6 +68,8 @@ class MenuItemserializers(BleachCleanMixin, serializers.ModelSerializer):
     class Meta:
         model = MenuItem
         fields = ['id', 'title', 'price', 'featured', 'featured_id']
+        expandable_fields = {'featured': (Categoryserializer, {}, 'select')}
+        default_expand = ('featured',)
 
     def validate_title(self, value):
         return bleach.clean(value)
@@ -37,15 +85,39 @@ class Cartserializers(BleachCleanMixin, serializers.ModelSerializer):
         model = Cart
         fields = ['id', 'user', 'MenuItem', 'quantity', 'unit_price', 'price']
 
-class Orderserializers(BleachCleanMixin, serializers.ModelSerializer):
+class OrderItemserializers(DynamicFieldsMixin, BleachCleanMixin, serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'order', 'menuitem', 'quantity', 'unit_price', 'price']
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name']
+
+class Orderserializers(DynamicFieldsMixin, BleachCleanMixin, serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date']
+        expandable_fields = {
+            'items': (OrderItemserializers, {'many': True}, 'prefetch'),
+            'delivery_crew': (UserSummarySerializer, {}, 'select'),
+        }
+
+class OrderHistoryItemSerializer(serializers.ModelSerializer):
+    menuitem_title = serializers.CharField(source='menuitem.title', read_only=True)
 
-class OrderItemserializers(BleachCleanMixin, serializers.ModelSerializer):
     class Meta:
         model = OrderItem
-        fields = ['id', 'order', 'menuitem', 'quantity', 'unit_price', 'price']
+        fields = ['id', 'menuitem', 'menuitem_title', 'quantity', 'unit_price', 'price']
+
+class OrderHistorySerializer(serializers.ModelSerializer):
+    """Pedido con sus ítems; requiere prefetch de items con select_related('menuitem')"""
+    items = OrderHistoryItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'status', 'total', 'date', 'delivery_crew', 'items']
 
 class UserSerializer(serializers.ModelSerializer):
     groups = serializers.StringRelatedField(many=True, read_only=True)
@@ -77,7 +149,13 @@ class GroupSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'user_count']
     
     def get_user_count(self, obj):
-        return obj.user_set.count()
+        # Preferir el conteo anotado (annotate) o precalculado en el contexto para evitar N+1
+        user_count = getattr(obj, 'user_count', None)
+        if user_count is None:
+            user_count = self.context.get('user_counts', {}).get(obj.pk)
+        if user_count is None:
+            user_count = obj.user_set.count()
+        return user_count
 
 class GroupDetailSerializer(serializers.ModelSerializer):
     users = UserSerializer(source='user_set', many=True, read_only=True)
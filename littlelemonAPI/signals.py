@@ -0,0 +1,76 @@
+"""
+Receptores de señales de littlelemonAPI
+"""
+from django.db import transaction
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from .autocomplete import CATEGORY, MENU_ITEM, index_category, index_menu_item, unindex
+from .catalog import bump_menu_version, category_ids
+from .models import Category, MenuItem
+from .roles import invalidate_user_groups, invalidate_group_user_counts
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_menu_catalog(sender, instance, signal, **kwargs):
+    """
+    Cualquier cambio en el menú o sus categorías crea una nueva versión del catálogo.
+    Se aplica al confirmar la transacción para no cachear datos aún no visibles, y
+    con la versión resultante se actualiza el índice de autocompletado de este proceso.
+    """
+    model_name = MENU_ITEM if sender is MenuItem else CATEGORY
+    pk = instance.pk
+
+    def apply():
+        version = bump_menu_version()
+        if signal is post_delete:
+            unindex(model_name, pk, version)
+        elif sender is MenuItem:
+            index_menu_item(instance, version)
+        else:
+            index_category(instance, version)
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_ids(sender, **kwargs):
+    """Descartar el mapa slug/título -> id de este proceso"""
+    transaction.on_commit(category_ids.clear)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """Olvidar los roles y conteos cacheados cuando cambia la pertenencia a grupos"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    invalidate_group_user_counts()
+    if not reverse:
+        # user.groups.add/remove/clear(...)
+        instance.__dict__.pop('_group_names', None)
+        invalidate_user_groups(instance.pk)
+    elif pk_set:
+        # group.user_set.add/remove(...)
+        invalidate_user_groups(*pk_set)
+    else:
+        # group.user_set.clear(): no se conocen los usuarios afectados
+        invalidate_user_groups()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_all_group_memberships(sender, **kwargs):
+    """Renombrar o eliminar un grupo afecta a todos sus miembros"""
+    invalidate_user_groups()
+    invalidate_group_user_counts()
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user_memberships(sender, instance, **kwargs):
+    """Eliminar un usuario borra sus pertenencias en cascada, sin m2m_changed"""
+    invalidate_user_groups(instance.pk)
+    invalidate_group_user_counts()
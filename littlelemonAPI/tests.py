@@ -1,3 +1,1290 @@
-from django.test import TestCase
+import gzip
+import json
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import async_views, compression, fastpath, renderers, views
+from .autocomplete import prefix_index
+from .catalog import acatalog_key, bump_menu_version, catalog_key, catalog_pages, category_ids, is_current
+from .dispatch import dispatch_orders
+from .events import order_events, status_event
+from .exports import iter_orders
+from .idempotency import IN_PROGRESS_TIMEOUT
+from .models import (
+    Cart, Category, IdempotencyKey, MenuItem, Order, OrderItem, OrderStatus, OrderStatusHistory,
+    OrderTransitionError
+)
+from .ordering import MENU_ORDERINGS
+from .roles import DELIVERY_CREW, MANAGER, has_role, is_delivery_crew, is_manager
+from .search import _search_settings
+from .serializers import Cartserializers, MenuItemserializers, OrderItemserializers, Orderserializers
+from .urls import select_view
+from .workqueue import LONG_POLL_MAX_WAITERS, WAITER_SLOT_KEY
+
+
+class LittleLemonTestCase(APITestCase):
+    """Base común: cachés limpias (throttling, versión del menú, páginas) y un usuario autenticado"""
+
+    def setUp(self):
+        cache.clear()
+        catalog_pages.clear()
+        self.user = User.objects.create_user('cliente', password='clave-segura-123')
+        self.client.force_authenticate(self.user)
+
+
+class MenuConditionalGetTests(LittleLemonTestCase):
+    """ETag / If-None-Match en el catálogo y el detalle de pedido; sin Last-Modified en los listados"""
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(title='Pizzas')
+        self.item = MenuItem.objects.create(title='Margarita', price=Decimal('9.50'), featured=self.category)
+        self.url = reverse('menu_items')
+
+    def test_matching_etag_returns_304_without_body(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.content)
+
+    def test_menu_write_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('menu_item_detail', args=[self.item.pk]), {'price': '10.00'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['price'], '10.00')
+
+    def test_list_has_no_last_modified_so_deletes_are_not_hidden(self):
+        MenuItem.objects.create(title='Napolitana', price=Decimal('11.00'), featured=self.category)
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.delete()
+        since = http_date((timezone.now() + timedelta(days=1)).timestamp())
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['title'] for item in response.json()], ['Napolitana'])
+
+    def test_empty_orders_have_distinct_etags(self):
+        etags = {
+            self.client.get(reverse('get_order_items', args=[order.pk]))['ETag']
+            for order in (Order.objects.create(user=self.user, total=0), Order.objects.create(user=self.user, total=0))
+        }
+        self.assertEqual(len(etags), 2)
+
+    def test_detail_etag_changes_after_write(self):
+        url = reverse('menu_item_detail', args=[self.item.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.item.title = 'Margarita clásica'
+        self.item.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class MenuCatalogCacheTests(LittleLemonTestCase):
+    """Páginas del catálogo servidas ya renderizadas hasta que cambia la versión del menú"""
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(title='Postres')
+        MenuItem.objects.create(title='Flan', price=Decimal('3.00'), featured=self.category)
+        self.url = reverse('menu_items')
+
+    def test_repeated_page_is_served_without_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+
+    def test_menu_write_serves_a_new_page(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(title='Natillas', price=Decimal('3.50'), featured=self.category)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(sorted(item['title'] for item in response.json()), ['Flan', 'Natillas'])
+
+    def test_query_params_select_different_pages(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, {'to_price': '1'})['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.url, {'to_price': '1'}).json(), [])
+
+    def test_cache_stats_are_staff_only(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        url = reverse('menu_cache_stats')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.user.is_staff = True
+        self.user.save()
+        stats = self.client.get(url).json()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+
+
+class CartBatchTests(LittleLemonTestCase):
+    """Alta de varias líneas del carrito con UPDATE atómico y el tope de cantidad por línea"""
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(title='Entrantes')
+        self.bread = MenuItem.objects.create(title='Pan', price=Decimal('1.50'), featured=category)
+        self.soup = MenuItem.objects.create(title='Sopa', price=Decimal('4.00'), featured=category)
+        self.url = reverse('add_to_cart_batch')
+
+    def cart(self):
+        return dict(Cart.objects.filter(user=self.user).values_list('MenuItem__title', 'quantity'))
+
+    def test_batch_adds_and_increments_with_prices(self):
+        items = [{'menu_item_id': self.bread.pk, 'quantity': 2}, {'menu_item_id': self.soup.pk}]
+        self.assertEqual(self.client.post(self.url, items, format='json').status_code, status.HTTP_200_OK)
+        response = self.client.post(self.url, {'items': [{'menu_item_id': self.bread.pk, 'quantity': 3}]},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.cart(), {'Pan': 5, 'Sopa': 1})
+        self.assertEqual(Cart.objects.get(user=self.user, MenuItem=self.bread).price, Decimal('7.50'))
+
+    def test_repeated_adds_cannot_exceed_max_quantity(self):
+        items = [{'menu_item_id': self.bread.pk, 'quantity': 60}, {'menu_item_id': self.soup.pk, 'quantity': 1}]
+        self.assertEqual(self.client.post(self.url, items, format='json').status_code, status.HTTP_200_OK)
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # Se revierte el lote entero, también la línea que no superaba el tope
+        self.assertEqual(self.cart(), {'Pan': 60, 'Sopa': 1})
+
+    def test_single_add_cannot_exceed_max_quantity(self):
+        url = reverse('add_to_cart')
+        response = self.client.post(url, {'menu_item_id': self.soup.pk, 'quantity': 101}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.cart(), {})
+
+
+class CheckoutTests(LittleLemonTestCase):
+    """Checkout en una transacción con un número de consultas que no depende del carrito"""
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(title='Tapas')
+        self.items = [
+            MenuItem.objects.create(title=f'Tapa {i}', price=Decimal('2.50'), featured=category) for i in range(10)
+        ]
+
+    def fill_cart(self, user, size):
+        Cart.objects.bulk_create([
+            Cart(user=user, MenuItem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+            for item in self.items[:size]
+        ])
+
+    def test_cart_becomes_order_with_items_total_and_history(self):
+        self.fill_cart(self.user, 3)
+        response = self.client.post(reverse('create_order'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.total, Decimal('15.00'))
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(list(order.status_history.values_list('status', flat=True)), [OrderStatus.PENDING])
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+    def test_empty_cart_returns_400(self):
+        response = self.client.post(reverse('create_order'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        counts = []
+        for size in (1, 10):
+            self.fill_cart(self.user, size)
+            with CaptureQueriesContext(connection) as captured:
+                Order.create_from_cart(self.user)
+            counts.append(sum(1 for query in captured.captured_queries if 'SAVEPOINT' not in query['sql']))
+        self.assertEqual(counts[0], counts[1])
+
+
+class IdempotencyKeyTests(LittleLemonTestCase):
+    """Idempotency-Key: un reintento repite la respuesta guardada sin crear otro pedido"""
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(title='Postres')
+        self.item = MenuItem.objects.create(title='Flan', price=Decimal('4.00'), featured=category)
+        Cart.objects.create(user=self.user, MenuItem=self.item, quantity=2)
+
+    def test_retry_replays_response_without_second_order(self):
+        url = reverse('create_order')
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        retry = self.client.post(url, HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+
+    def test_same_key_with_different_body_is_rejected(self):
+        url = reverse('add_to_cart')
+        response = self.client.post(url, {'menu_item_id': self.item.pk, 'quantity': 1},
+                                    format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(url, {'menu_item_id': self.item.pk, 'quantity': 5},
+                                    format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 3)
+
+    def test_key_in_progress_returns_409(self):
+        url = reverse('create_order')
+        # Reserva hecha por otra petición (p. ej. en otro worker) que aún no terminó
+        self.client.post(url, HTTP_IDEMPOTENCY_KEY='checkout-2')
+        IdempotencyKey.objects.filter(key='checkout-2').update(status_code=None, response=None)
+
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='checkout-2')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_abandoned_reservation_is_taken_over(self):
+        url = reverse('create_order')
+        IdempotencyKey.objects.create(user=self.user, path=url, key='checkout-3', fingerprint='otro')
+        IdempotencyKey.objects.filter(key='checkout-3').update(
+            updated_at=timezone.now() - timedelta(seconds=IN_PROGRESS_TIMEOUT + 1)
+        )
+
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='checkout-3')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        entry = IdempotencyKey.objects.get(key='checkout-3')
+        self.assertEqual(entry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(entry.response['id'], response.json()['id'])
+
+
+class PrefixIndexVersionTests(LittleLemonTestCase):
+    """Actualización incremental del autocompletado frente a cambios de otros workers"""
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(title='Bebidas')
+        prefix_index.rebuild()
+
+    def test_local_save_updates_trie_incrementally(self):
+        version = prefix_index.version
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(title='Limonada', price=Decimal('3.00'), featured=self.category)
+        self.assertEqual(prefix_index.version, version + 1)
+        self.assertEqual([entry['title'] for entry in prefix_index.complete('limo')], ['Limonada'])
+
+    def test_missed_remote_change_is_not_marked_current(self):
+        version = prefix_index.version
+        bump_menu_version()  # cambio hecho en otro worker, nunca cargado aquí
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(title='Horchata', price=Decimal('3.00'), featured=self.category)
+        self.assertEqual(prefix_index.version, version)
+        self.assertFalse(is_current(prefix_index.version, prefix_index.built_at))
+
+    def test_str_price_is_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(title='Tisana', price='9.5', featured=self.category)
+        self.assertEqual([entry['price'] for entry in prefix_index.complete('tisa')], ['9.50'])
+
+
+class RoleCacheTests(LittleLemonTestCase):
+    """Grupos del usuario cargados una vez por petición y compartidos solo con una caché común"""
+
+    def setUp(self):
+        super().setUp()
+        self.managers = Group.objects.create(name=MANAGER)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_role_checks_in_one_request_share_one_query(self):
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertFalse(is_manager(user))
+            self.assertFalse(has_role(user, MANAGER, DELIVERY_CREW))
+            self.assertFalse(is_delivery_crew(user))
+
+    def test_shared_cache_reuses_groups_until_membership_changes(self):
+        with mock.patch('littlelemonAPI.roles.cache_is_process_local', return_value=False):
+            self.assertFalse(is_manager(self.fresh_user()))
+            user = self.fresh_user()
+            with self.assertNumQueries(0):
+                self.assertFalse(is_manager(user))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.managers.user_set.add(self.user)
+            self.assertTrue(is_manager(self.fresh_user()))
+
+    def test_process_local_cache_queries_every_request(self):
+        self.assertFalse(is_manager(self.fresh_user()))
+        self.managers.user_set.add(self.user)
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(is_manager(user))
+
+
+class GroupListTests(LittleLemonTestCase):
+    """Listado de grupos con conteos de miembros sin una consulta por grupo"""
+
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+        self.groups = [Group.objects.create(name=f'Grupo {i}') for i in range(6)]
+        for i, group in enumerate(self.groups):
+            for j in range(i):
+                group.user_set.add(User.objects.create_user(f'miembro-{i}-{j}'))
+        self.url = reverse('group_list')
+
+    def test_counts_are_correct_with_constant_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({g['name']: g['user_count'] for g in response.data},
+                         {f'Grupo {i}': i for i in range(6)})
+        self.assertLessEqual(len(captured), 2)
+
+    def test_membership_change_refreshes_counts(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.groups[0].user_set.add(self.user)
+        counts = {g['name']: g['user_count'] for g in self.client.get(self.url).data}
+        self.assertEqual(counts['Grupo 0'], 1)
+
+    def test_per_page_paginates_with_link_header(self):
+        response = self.client.get(self.url, {'per_page': 4})
+        self.assertEqual([g['name'] for g in response.data], [f'Grupo {i}' for i in range(4)])
+        self.assertIn('rel="next"', response['Link'])
+
+
+class GroupMembershipTests(LittleLemonTestCase):
+    """Alta y baja de miembros de un grupo en bloque, con errores por id en el orden recibido"""
+
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+        self.group = Group.objects.create(name='Cocina')
+        self.members = [User.objects.create_user(f'cocinero{i}') for i in range(3)]
+        self.url = reverse('group_users', args=[self.group.pk])
+
+    def test_bulk_add_reports_duplicates_and_unknown_ids(self):
+        self.group.user_set.add(self.members[0])
+        ids = [member.pk for member in self.members] + [999, self.members[1].pk]
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post(self.url, {'user_ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([u['username'] for u in response.data['added_users']], ['cocinero1', 'cocinero2'])
+        self.assertEqual(len(response.data['errors']), 3)
+        self.assertEqual(set(self.group.user_set.values_list('username', flat=True)),
+                         {'cocinero0', 'cocinero1', 'cocinero2'})
+        self.assertLessEqual(len([q for q in captured.captured_queries if 'SAVEPOINT' not in q['sql']]), 8)
+
+    def test_bulk_remove_drops_roles_from_cache(self):
+        self.group.name = MANAGER
+        self.group.save()
+        self.group.user_set.add(*self.members)
+        member = User.objects.get(pk=self.members[0].pk)
+        with mock.patch('littlelemonAPI.roles.cache_is_process_local', return_value=False):
+            self.assertTrue(is_manager(member))
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(
+                    self.url, {'user_ids': [self.members[0].pk, self.members[1].pk]}, format='json'
+                )
+            self.assertEqual(len(response.data['removed_users']), 2)
+            self.assertFalse(is_manager(User.objects.get(pk=self.members[0].pk)))
+        self.assertEqual(list(self.group.user_set.values_list('username', flat=True)), ['cocinero2'])
+
+    def test_empty_user_ids_returns_400(self):
+        response = self.client.post(self.url, {'user_ids': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MenuCategoryFilterTests(LittleLemonTestCase):
+    """Filtro ?category= por slug o título, resuelto a featured_id con un mapa en proceso"""
+
+    def setUp(self):
+        super().setUp()
+        self.pizzas = Category.objects.create(title='Pizzas Caseras')
+        drinks = Category.objects.create(title='Bebidas')
+        MenuItem.objects.create(title='Margarita', price=Decimal('9.50'), featured=self.pizzas)
+        MenuItem.objects.create(title='Agua', price=Decimal('1.00'), featured=drinks)
+        self.url = reverse('menu_items')
+
+    def titles(self, category):
+        response = self.client.get(self.url, {'category': category})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['title'] for item in response.json()]
+
+    def test_slug_and_title_select_the_same_category(self):
+        self.assertEqual(self.titles('pizzas-caseras'), ['Margarita'])
+        self.assertEqual(self.titles('pizzas caseras'), ['Margarita'])
+
+    def test_unknown_category_is_an_empty_list(self):
+        self.assertEqual(self.titles('postres'), [])
+
+    def test_lookup_is_served_from_memory(self):
+        category_ids.warm()
+        with self.assertNumQueries(0):
+            resolved = [category_ids.resolve(value) for value in ('pizzas-caseras', 'PIZZAS CASERAS', 'postres')]
+        self.assertEqual(resolved, [self.pizzas.pk, self.pizzas.pk, None])
+
+    def test_renamed_category_is_picked_up(self):
+        self.assertEqual(self.titles('pizzas-caseras'), ['Margarita'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pizzas.title = 'Pizzas'
+            self.pizzas.slug = 'pizzas'
+            self.pizzas.save()
+        self.assertEqual(self.titles('pizzas'), ['Margarita'])
+        self.assertEqual(self.titles('pizzas-caseras'), [])
+
+
+class MenuOrderingTests(LittleLemonTestCase):
+    """?ordering= limitado a claves públicas con desempate único para el cursor"""
+
+    def setUp(self):
+        super().setUp()
+        starters = Category.objects.create(title='Entrantes')
+        mains = Category.objects.create(title='Principales')
+        for title, price, category in [
+            ('Croquetas', '6.00', starters), ('Gazpacho', '5.00', starters), ('Pulpo', '14.00', mains),
+            ('Cordero', '18.00', mains), ('Bravas', '5.00', starters), ('Merluza', '14.00', mains),
+        ]:
+            MenuItem.objects.create(title=title, price=Decimal(price), featured=category)
+        self.url = reverse('menu_items')
+
+    def titles(self, ordering, perpage=20):
+        """Títulos de todas las páginas siguiendo la cabecera Link"""
+        titles, url, params = [], self.url, {'ordering': ordering, 'perpage': perpage}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles += [item['title'] for item in response.json()]
+            links = [link.split('>;') for link in response.get('Link', '').split(', ') if link]
+            url, params = next((target.lstrip('<') for target, rel in links if 'next' in rel), None), None
+        return titles
+
+    def test_price_orderings_break_ties_by_id(self):
+        self.assertEqual(self.titles('price'), ['Gazpacho', 'Bravas', 'Croquetas', 'Pulpo', 'Merluza', 'Cordero'])
+        self.assertEqual(self.titles('-price'), ['Cordero', 'Pulpo', 'Merluza', 'Croquetas', 'Gazpacho', 'Bravas'])
+
+    def test_paging_follows_the_same_order(self):
+        for ordering in MENU_ORDERINGS:
+            self.assertEqual(self.titles(ordering, perpage=2), self.titles(ordering), ordering)
+
+    def test_category_ordering_groups_by_category_then_price(self):
+        self.assertEqual(self.titles('category')[:3], ['Gazpacho', 'Bravas', 'Croquetas'])
+
+    def test_unknown_ordering_returns_400(self):
+        for ordering in ('password', 'featured__title', 'price;drop'):
+            response = self.client.get(self.url, {'ordering': ordering})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, ordering)
+
+
+class MenuFacetTests(LittleLemonTestCase):
+    """Facetas del menú: conteos con los filtros del listado, invalidados por la versión del menú"""
+
+    def setUp(self):
+        super().setUp()
+        self.pizzas = Category.objects.create(title='Pizzas')
+        self.drinks = Category.objects.create(title='Bebidas')
+        for title, price, category, available in [
+            ('Margarita', '9.50', self.pizzas, True),
+            ('Cuatro quesos', '12.00', self.pizzas, False),
+            ('Agua', '1.00', self.drinks, True),
+            ('Vino', '25.00', self.drinks, True),
+        ]:
+            MenuItem.objects.create(title=title, price=Decimal(price), featured=category, available=available)
+        self.url = reverse('menu_items')
+
+    def facets(self, **params):
+        response = self.client.get(self.url, {'facets': 1, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_counts_per_category_price_bucket_and_availability(self):
+        facets = self.facets()
+        self.assertEqual(facets['total'], 4)
+        self.assertEqual([(c['title'], c['count']) for c in facets['categories']], [('Bebidas', 2), ('Pizzas', 2)])
+        self.assertEqual([bucket['count'] for bucket in facets['price_buckets']], [1, 1, 1, 1, 0])
+        self.assertEqual(facets['available'], {'true': 3, 'false': 1})
+
+    def test_counts_follow_listing_filters(self):
+        facets = self.facets(to_price='10')
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual([(c['title'], c['count']) for c in facets['categories']], [('Bebidas', 1), ('Pizzas', 1)])
+
+    def test_menu_version_bump_invalidates_cached_facets(self):
+        self.assertEqual(self.facets()['total'], 4)
+        # Alta sin señales, como la vería este worker si el cambio se hizo en otro
+        MenuItem.objects.bulk_create([MenuItem(title='Cerveza', price=Decimal('3.00'), featured=self.drinks)])
+        self.assertEqual(self.facets()['total'], 4)
+        bump_menu_version()
+        self.assertEqual(self.facets()['total'], 5)
+
+
+class MenuSearchTests(LittleLemonTestCase):
+    """Búsqueda del menú: normalización, relevancia y paginación por cursor sobre search_rank"""
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(title='Bebidas')
+        for title, description in [
+            ('Café con leche', 'Espresso y leche'),
+            ('Café solo', ''),
+            ('Tarta de café', 'Bizcocho'),
+            ('Zumo', 'Naranja, sin café'),
+            ('Leche merengada', 'Con canela'),
+        ]:
+            MenuItem.objects.create(title=title, description=description, price=Decimal('3.00'), featured=category)
+
+    def search(self, backend, query, perpage=20):
+        """Títulos de todas las páginas siguiendo la cabecera Link, con el backend dado"""
+        titles, url, params = [], reverse('menu_items'), {'search': query, 'perpage': perpage}
+        with mock.patch.dict(_search_settings, {'BACKEND': backend}):
+            while url:
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                titles += [item['title'] for item in response.json()]
+                links = [link.split('>;') for link in response.get('Link', '').split(', ') if link]
+                url, params = next((target.lstrip('<') for target, rel in links if 'next' in rel), None), None
+        return titles
+
+    def test_sqlite_fts5_ignores_accents_and_matches_prefixes(self):
+        self.assertEqual(
+            sorted(self.search('sqlite', 'cafe')), ['Café con leche', 'Café solo', 'Tarta de café', 'Zumo']
+        )
+        self.assertEqual(sorted(self.search('sqlite', 'LECH')), ['Café con leche', 'Leche merengada'])
+
+    def test_sqlite_fts5_paging_matches_single_page(self):
+        single = self.search('sqlite', 'cafe')
+        self.assertEqual(self.search('sqlite', 'cafe', perpage=1), single)
+
+    def test_trigram_ranks_title_matches_before_description(self):
+        titles = self.search('trigram', 'cafe')
+        self.assertEqual(titles[-1], 'Zumo')
+        self.assertEqual(sorted(titles[:3]), ['Café con leche', 'Café solo', 'Tarta de café'])
+
+    def test_trigram_tolerates_typos_and_requires_every_word(self):
+        self.assertEqual(self.search('trigram', 'merengda'), ['Leche merengada'])
+        self.assertEqual(self.search('trigram', 'cafe naranja'), ['Zumo'])
+
+    def test_trigram_paging_matches_single_page(self):
+        single = self.search('trigram', 'cafe leche')
+        self.assertEqual(single[0], 'Café con leche')
+        self.assertEqual(self.search('trigram', 'cafe', perpage=2), self.search('trigram', 'cafe'))
+
+
+class OrderTestCase(LittleLemonTestCase):
+    """Base con un gerente, un repartidor y pedidos del usuario"""
+
+    def setUp(self):
+        super().setUp()
+        self.manager = User.objects.create_user('gerente')
+        self.manager.groups.add(Group.objects.get_or_create(name=MANAGER)[0])
+        self.crew = User.objects.create_user('repartidor')
+        self.crew.groups.add(Group.objects.get_or_create(name=DELIVERY_CREW)[0])
+
+    def make_order(self, order_status=OrderStatus.PENDING, **fields):
+        return Order.objects.create(user=self.user, total=Decimal('10.00'), status=order_status, **fields)
+
+    def history(self, order):
+        return list(OrderStatusHistory.objects.filter(order=order).order_by('created_at', 'id')
+                    .values_list('status', flat=True))
+
+
+class OrderExportTests(OrderTestCase):
+    """Exportación en streaming de todos los pedidos en NDJSON y CSV"""
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(title='Principales')
+        self.paella = MenuItem.objects.create(title='Paella', price=Decimal('12.00'), featured=category)
+        self.tortilla = MenuItem.objects.create(title='Tortilla', price=Decimal('6.00'), featured=category)
+        self.with_items = self.make_order(delivery_crew=self.crew)
+        for item in (self.paella, self.tortilla):
+            OrderItem.objects.create(order=self.with_items, menuitem=item, quantity=1,
+                                     unit_price=item.price, price=item.price)
+        self.empty = self.make_order(OrderStatus.CANCELLED)
+        self.user.is_staff = True
+        self.user.save()
+        self.url = reverse('export_all_orders')
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_has_one_order_per_line_with_items(self):
+        rows = [json.loads(line) for line in self.export(items=1).splitlines()]
+        self.assertEqual({row['id'] for row in rows}, {str(self.with_items.pk), str(self.empty.pk)})
+        items = {row['id']: row['items'] for row in rows}
+        self.assertEqual(sorted(item['menuitem'] for item in items[str(self.with_items.pk)]),
+                         [self.paella.pk, self.tortilla.pk])
+        self.assertEqual(items[str(self.empty.pk)], [])
+
+    def test_csv_has_one_row_per_item_and_filters_status(self):
+        lines = self.export(output='csv', items=1).splitlines()
+        self.assertTrue(lines[0].startswith('id,user,delivery_crew,status,total,date,item_id'))
+        self.assertEqual(len(lines), 1 + 2 + 1)
+        lines = self.export(output='csv', status=OrderStatus.CANCELLED).splitlines()
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], [str(self.empty.pk)])
+
+    def test_chunks_cover_every_order_once(self):
+        for _ in range(3):
+            self.make_order()
+        rows = list(iter_orders(Order.objects.all(), chunk_size=2))
+        self.assertEqual(len({row['id'] for row in rows}), Order.objects.count())
+        self.assertEqual(len(rows), Order.objects.count())
+
+    def test_export_is_staff_only_and_validates_format(self):
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class OrderHistoryTests(OrderTestCase):
+    """Historial del usuario con sus ítems en tres consultas por página"""
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(title='Carnes')
+        self.items = [
+            MenuItem.objects.create(title=title, price=Decimal('8.00'), featured=category)
+            for title in ('Chuletón', 'Secreto')
+        ]
+        self.url = reverse('order_history')
+
+    def add_orders(self, count, user=None):
+        for _ in range(count):
+            order = Order.objects.create(user=user or self.user, total=Decimal('16.00'))
+            for item in self.items:
+                OrderItem.objects.create(order=order, menuitem=item, quantity=1, unit_price=item.price,
+                                         price=item.price)
+
+    def test_orders_embed_items_with_titles(self):
+        self.add_orders(1)
+        self.add_orders(1, user=self.crew)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(sorted(item['menuitem_title'] for item in response.data[0]['items']),
+                         ['Chuletón', 'Secreto'])
+
+    def test_query_count_is_fixed_per_page(self):
+        counts = []
+        for count in (1, 6):
+            self.add_orders(count)
+            with CaptureQueriesContext(connection) as captured:
+                self.client.get(self.url)
+            counts.append(len(captured))
+        self.assertEqual(counts, [3, 3])
+
+    def test_unchanged_history_returns_304(self):
+        self.add_orders(2)
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class FastPathSerializerTests(OrderTestCase):
+    """La serialización rápida renderiza los mismos bytes que los serializadores DRF"""
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(title='Guisos')
+        self.item = MenuItem.objects.create(title='Fabada', price=Decimal('11.5'), featured=category)
+        Cart.objects.create(user=self.user, MenuItem=self.item, quantity=3)
+        order = self.make_order(delivery_crew=self.crew)
+        OrderItem.objects.create(order=order, menuitem=self.item, quantity=2, unit_price=self.item.price,
+                                 price=Decimal('23'))
+        self.make_order(OrderStatus.CANCELLED)
+
+    def assertSameJSON(self, fast, serializer_class, queryset, fields=None):
+        renderer = JSONRenderer()
+        expected = serializer_class(queryset, many=True, fields=fields).data
+        self.assertEqual(renderer.render(fast.serialize(fast.values(queryset, fields=fields), fields)),
+                         renderer.render(expected))
+
+    def test_every_fast_serializer_matches_drf(self):
+        self.assertSameJSON(fastpath.menu_item_fast, MenuItemserializers, MenuItem.objects.order_by('id'))
+        self.assertSameJSON(fastpath.order_fast, Orderserializers, Order.objects.order_by('id'))
+        self.assertSameJSON(fastpath.order_item_fast, OrderItemserializers, OrderItem.objects.order_by('id'))
+        renderer = JSONRenderer()
+        carts = Cart.objects.order_by('id')
+        self.assertEqual(renderer.render(fastpath.cart_fast.serialize(fastpath.cart_fast.values(carts))),
+                         renderer.render(Cartserializers(carts, many=True).data))
+
+    def test_field_subsets_match_drf(self):
+        self.assertSameJSON(fastpath.menu_item_fast, MenuItemserializers, MenuItem.objects.all(), ['id', 'price'])
+        self.assertSameJSON(fastpath.order_fast, Orderserializers, Order.objects.order_by('id'), ['total', 'date'])
+
+    def test_extra_expand_falls_back_to_drf(self):
+        self.assertTrue(fastpath.supports(MenuItemserializers, ['featured']))
+        self.assertFalse(fastpath.supports(Orderserializers, ['items']))
+
+
+class RendererTests(LittleLemonTestCase):
+    """ORJSONRenderer con los mismos bytes que JSONRenderer y MessagePack por negociación de contenido"""
+
+    DATA = {
+        'price': Decimal('9.50'),
+        'when': timezone.make_aware(datetime(2025, 1, 2, 3, 4, 5, 678901)),
+        'id': uuid.UUID(int=7),
+        'text': 'línea\u2028separada',
+        1: [None, True, 2.5],
+    }
+
+    def test_orjson_matches_drf_json_bytes(self):
+        self.assertEqual(renderers.ORJSONRenderer().render(self.DATA), JSONRenderer().render(self.DATA))
+
+    def test_without_orjson_falls_back_to_drf(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.ORJSONRenderer().render(self.DATA), JSONRenderer().render(self.DATA))
+
+    @skipIf(renderers.msgpack is None, 'msgpack no está instalado')
+    def test_msgpack_is_negotiated_for_responses_and_requests(self):
+        category = Category.objects.create(title='Quesos')
+        item = MenuItem.objects.create(title='Manchego', price=Decimal('7.00'), featured=category)
+        response = self.client.get(reverse('menu_items'), HTTP_ACCEPT=renderers.MSGPACK_MEDIA_TYPE)
+        self.assertEqual(response['Content-Type'], renderers.MSGPACK_MEDIA_TYPE)
+        self.assertEqual(renderers.msgpack.unpackb(response.content)[0]['title'], 'Manchego')
+
+        body = renderers.msgpack.packb({'items': [{'menu_item_id': item.pk, 'quantity': 2}]})
+        response = self.client.post(reverse('add_to_cart_batch'), body,
+                                    content_type=renderers.MSGPACK_MEDIA_TYPE)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Cart.objects.get(user=self.user).quantity, 2)
+
+        response = self.client.post(reverse('add_to_cart_batch'), b'\xc1', content_type=renderers.MSGPACK_MEDIA_TYPE)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ResponseCompressionTests(LittleLemonTestCase):
+    """Compresión negociada por Accept-Encoding, una sola vez por página cacheada del catálogo"""
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(title='Vinos')
+        MenuItem.objects.bulk_create([
+            MenuItem(title=f'Reserva de la casa {i}', price=Decimal('19.00'), featured=category) for i in range(40)
+        ])
+        self.url = reverse('menu_items')
+
+    def test_negotiation_follows_quality_values(self):
+        factory = RequestFactory()
+        for header, streaming, expected in [
+            ('gzip', False, 'gzip'),
+            ('gzip;q=0, identity', False, None),
+            ('br;q=0.5, gzip;q=0.8', False, 'gzip'),
+            ('*', True, 'gzip'),
+            ('', False, None),
+        ]:
+            request = factory.get('/', HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(compression.negotiate_encoding(request, streaming=streaming), expected, header)
+
+    def test_cached_page_is_compressed_once(self):
+        plain = self.client.get(self.url, {'perpage': 100})
+        self.assertNotIn('Content-Encoding', plain)
+        with mock.patch.object(compression, 'compress', wraps=compression.compress) as compress:
+            for _ in range(3):
+                response = self.client.get(self.url, {'perpage': 100}, HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(compress.call_count, 1)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/'))
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get(self.url, {'perpage': 1}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_streaming_export_is_gzipped(self):
+        self.user.is_staff = True
+        self.user.save()
+        Order.objects.create(user=self.user, total=Decimal('19.00'))
+        response = self.client.get(reverse('export_all_orders'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        rows = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(rows), 1)
+
+
+class OrderStatusTransitionTests(OrderTestCase):
+    """Máquina de estados del pedido con historial en la misma transacción"""
+
+    def update(self, order, data):
+        self.client.force_authenticate(self.manager)
+        return self.client.patch(reverse('update_order', args=[order.pk]), data, format='json')
+
+    def test_legal_transition_updates_status_and_history(self):
+        order = self.make_order()
+        response = self.update(order, {'status': 'preparing'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order.refresh_from_db()
+        self.assertEqual(order.status, OrderStatus.PREPARING)
+        self.assertEqual(self.history(order), [OrderStatus.PREPARING])
+
+    def test_illegal_transition_returns_409_without_history(self):
+        order = self.make_order()
+        response = self.update(order, {'status': 'DELIVERED'})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        order.refresh_from_db()
+        self.assertEqual(order.status, OrderStatus.PENDING)
+        self.assertEqual(self.history(order), [])
+
+    def test_final_states_accept_no_transition(self):
+        order = self.make_order(OrderStatus.CANCELLED)
+        self.assertEqual(self.update(order, {'status': 'PENDING'}).status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(order.can_be_cancelled)
+
+    def test_unknown_status_returns_400(self):
+        order = self.make_order()
+        self.assertEqual(self.update(order, {'status': 'PERDIDO'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stale_expected_status_is_a_conflict(self):
+        order = self.make_order()
+        Order.transition(order.pk, OrderStatus.PREPARING)
+        with self.assertRaises(OrderTransitionError):
+            Order.transition(order.pk, OrderStatus.CANCELLED, expected=[OrderStatus.PENDING])
+        self.assertEqual(self.history(order), [OrderStatus.PREPARING])
+
+    def test_legacy_status_is_a_conflict_not_a_server_error(self):
+        order = self.make_order('True')
+        self.assertFalse(order.can_be_cancelled)
+        self.assertEqual(self.update(order, {'status': 'CANCELLED'}).status_code, status.HTTP_409_CONFLICT)
+
+    def test_delivery_crew_only_moves_own_orders(self):
+        order = self.make_order(OrderStatus.READY, delivery_crew=self.crew)
+        other = self.make_order(OrderStatus.READY)
+        self.client.force_authenticate(self.crew)
+        url = 'update_order_status_delivery'
+        response = self.client.patch(reverse(url, args=[order.pk]), {'status': 'IN_DELIVERY'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(reverse(url, args=[other.pk]), {'status': 'IN_DELIVERY'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.history(order), [OrderStatus.IN_DELIVERY])
+        self.assertEqual(self.history(other), [])
+
+    def test_invalid_crew_leaves_status_unchanged(self):
+        order = self.make_order()
+        response = self.update(order, {'status': 'PREPARING', 'delivery_crew_id': 999})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        order.refresh_from_db()
+        self.assertEqual(order.status, OrderStatus.PENDING)
+        self.assertEqual(self.history(order), [])
+
+
+class DispatchOrdersTests(OrderTestCase):
+    """Despacho masivo agrupado con las reglas de asignación de repartidor"""
+
+    def dispatch(self, lines):
+        self.client.force_authenticate(self.manager)
+        response = self.client.post(reverse('dispatch_orders'), lines, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_query_count_does_not_grow_with_lines(self):
+        def count_queries(size):
+            orders = [self.make_order(OrderStatus.PREPARING) for _ in range(size)]
+            lines = [{'order_id': str(order.pk), 'status': 'READY'} for order in orders]
+            with CaptureQueriesContext(connection) as queries:
+                updated, errors = dispatch_orders(lines, self.manager)
+            self.assertEqual((len(updated), errors), (size, []))
+            return len(queries)
+
+        self.assertEqual(count_queries(2), count_queries(10))
+
+    def test_crew_assignment_moves_ready_order_to_delivery(self):
+        order = self.make_order(OrderStatus.READY)
+        data = self.dispatch([{'order_id': str(order.pk), 'delivery_crew_id': self.crew.pk}])
+        self.assertEqual(data['updated_orders'], [
+            {'id': str(order.pk), 'status': OrderStatus.IN_DELIVERY, 'delivery_crew': self.crew.pk}
+        ])
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.delivery_crew_id), (OrderStatus.IN_DELIVERY, self.crew.pk))
+        self.assertEqual(self.history(order), [OrderStatus.IN_DELIVERY])
+
+    def test_status_and_crew_on_one_line_follow_update_order(self):
+        order = self.make_order(OrderStatus.PREPARING)
+        self.dispatch([{'order_id': str(order.pk), 'status': 'READY', 'delivery_crew_id': self.crew.pk}])
+        order.refresh_from_db()
+        self.assertEqual(order.status, OrderStatus.IN_DELIVERY)
+        self.assertEqual(self.history(order), [OrderStatus.READY, OrderStatus.IN_DELIVERY])
+
+    def test_crew_assignment_rejected_on_final_states(self):
+        delivered = self.make_order(OrderStatus.DELIVERED)
+        cancelled = self.make_order(OrderStatus.CANCELLED)
+        data = self.dispatch([
+            {'order_id': str(delivered.pk), 'delivery_crew_id': self.crew.pk},
+            {'order_id': str(cancelled.pk), 'delivery_crew_id': self.crew.pk},
+        ])
+        self.assertEqual(data['updated_orders'], [])
+        self.assertEqual(len(data['errors']), 2)
+        self.assertFalse(Order.objects.filter(delivery_crew=self.crew).exists())
+        self.assertFalse(OrderStatusHistory.objects.exists())
+
+    def test_no_op_lines_are_skipped(self):
+        pending = self.make_order()
+        assigned = self.make_order(OrderStatus.PREPARING, delivery_crew=self.crew)
+        data = self.dispatch([
+            {'order_id': str(pending.pk), 'status': 'PENDING'},
+            {'order_id': str(assigned.pk), 'delivery_crew_id': self.crew.pk},
+        ])
+        self.assertEqual((data['updated_orders'], data['errors']), ([], []))
+        self.assertFalse(OrderStatusHistory.objects.exists())
+
+    def test_invalid_lines_reported_in_order_without_blocking_others(self):
+        valid = self.make_order()
+        data = self.dispatch([
+            {'order_id': 'no-es-uuid', 'status': 'PREPARING'},
+            {'order_id': str(valid.pk), 'status': 'PREPARING'},
+            {'order_id': str(self.make_order().pk), 'status': 'DELIVERED'},
+            {'order_id': str(self.make_order().pk), 'delivery_crew_id': self.user.pk},
+        ])
+        self.assertEqual([order['id'] for order in data['updated_orders']], [str(valid.pk)])
+        self.assertEqual(len(data['errors']), 3)
+        self.assertTrue(data['errors'][0].startswith('Línea 1'))
+
+    def test_update_order_rejects_crew_on_delivered_order(self):
+        order = self.make_order(OrderStatus.DELIVERED)
+        self.client.force_authenticate(self.manager)
+        response = self.client.patch(reverse('update_order', args=[order.pk]),
+                                     {'delivery_crew_id': self.crew.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        order.refresh_from_db()
+        self.assertIsNone(order.delivery_crew_id)
+
+    def test_update_order_crew_conflict_rolls_back_status(self):
+        order = self.make_order()
+        self.client.force_authenticate(self.manager)
+        response = self.client.patch(reverse('update_order', args=[order.pk]),
+                                     {'status': 'CANCELLED', 'delivery_crew_id': self.crew.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.delivery_crew_id), (OrderStatus.PENDING, None))
+        self.assertEqual(self.history(order), [])
+
+    def test_line_with_valid_status_and_invalid_crew_is_not_applied(self):
+        order = self.make_order()
+        data = self.dispatch([{'order_id': str(order.pk), 'status': 'PREPARING', 'delivery_crew_id': 999}])
+        self.assertEqual((data['updated_orders'], len(data['errors'])), ([], 1))
+        order.refresh_from_db()
+        self.assertEqual(order.status, OrderStatus.PENDING)
+        self.assertEqual(self.history(order), [])
+
+
+class ListPaginationCompatTests(OrderTestCase):
+    """Los listados paginados conservan los campos y el conjunto de filas que ya usaban los clientes"""
+
+    def setUp(self):
+        super().setUp()
+        self.group = Group.objects.get(name=DELIVERY_CREW)
+        for i in range(5):
+            user = User.objects.create_user(f'usuario{i}')
+            self.group.user_set.add(user)
+        self.client.force_authenticate(self.manager)
+
+    def test_user_list_page_param_keeps_legacy_fields(self):
+        response = self.client.get(reverse('user_list'), {'page': 2, 'per_page': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        usernames = sorted(User.objects.values_list('username', flat=True))
+        self.assertEqual((response.data['count'], response.data['pages'], response.data['current_page']),
+                         (len(usernames), 3, 2))
+        self.assertEqual([u['username'] for u in response.data['results']], usernames[3:6])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_user_list_cursor_links_walk_all_pages(self):
+        seen = []
+        url = reverse('user_list') + '?per_page=3'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data['current_page'])
+            seen += [u['username'] for u in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, sorted(User.objects.values_list('username', flat=True)))
+        self.assertEqual(pages, [1, 2, 3])
+
+    def test_user_list_page_past_the_end_is_empty(self):
+        response = self.client.get(reverse('user_list'), {'page': 9})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['results'], response.data['current_page']), ([], 9))
+        self.assertEqual(self.client.get(reverse('user_list'), {'page': 'x'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_group_detail_keeps_page_and_pages(self):
+        response = self.client.get(reverse('group_detail', args=[self.group.pk]), {'per_page': 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['page'], response.data['pages'], response.data['user_count']), (1, 2, 6))
+        self.assertEqual(len(response.data['users']), 4)
+        response = self.client.get(response.data['next'])
+        self.assertEqual((response.data['page'], len(response.data['users'])), (2, 2))
+        self.assertIsNone(response.data['next'])
+
+    def test_delivery_orders_lists_every_assigned_order(self):
+        other = User.objects.create_user('otro-repartidor')
+        mine = self.make_order(delivery_crew=self.crew)
+        theirs = self.make_order(delivery_crew=other)
+        self.make_order()
+        for user in (self.manager, self.crew):
+            self.client.force_authenticate(user)
+            response = self.client.get(reverse('view_delivery_orders'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual({o['id'] for o in response.data}, {str(mine.pk), str(theirs.pk)})
+            self.assertNotIn('Link', response)
+
+    def test_delivery_orders_paginates_on_request(self):
+        orders = [self.make_order(delivery_crew=self.crew) for _ in range(3)]
+        response = self.client.get(reverse('view_delivery_orders'), {'per_page': 2})
+        self.assertEqual(len(response.data), 2)
+        self.assertIn('rel="next"', response['Link'])
+        self.assertEqual(len(self.client.get(reverse('view_delivery_orders')).data), len(orders))
+
+
+class SparseFieldsetTests(OrderTestCase):
+    """?fields= recorta la salida y ?expand= anida relaciones con una consulta por relación"""
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(title='Arroces')
+        self.paella = MenuItem.objects.create(title='Paella', price=Decimal('12.00'), featured=self.category)
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = self.make_order(delivery_crew=self.crew)
+            OrderItem.objects.create(order=order, menuitem=self.paella, quantity=1,
+                                     unit_price=self.paella.price, price=self.paella.price)
+
+    def test_menu_fields_limit_keys_and_keep_default_nesting(self):
+        response = self.client.get(reverse('menu_items'), {'fields': 'id,title'})
+        self.assertEqual(response.json(), [{'id': self.paella.pk, 'title': 'Paella'}])
+        item = self.client.get(reverse('menu_items')).json()[0]
+        self.assertEqual(item['featured']['title'], 'Arroces')
+
+    def test_order_expand_nests_items_and_crew(self):
+        self.add_orders(1)
+        order = self.client.get(reverse('view_orders'), {'expand': 'items,delivery_crew'}).json()[0]
+        self.assertEqual(order['delivery_crew']['username'], 'repartidor')
+        self.assertEqual([item['menuitem'] for item in order['items']], [self.paella.pk])
+        plain = self.client.get(reverse('view_orders')).json()[0]
+        self.assertEqual(plain['delivery_crew'], self.crew.pk)
+        self.assertNotIn('items', plain)
+
+    def test_expand_query_count_does_not_grow_with_orders(self):
+        counts = []
+        for count in (1, 5):
+            self.add_orders(count)
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse('view_orders'), {'expand': 'items,delivery_crew', 'per_page': 50})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_unknown_names_are_ignored(self):
+        self.add_orders(1)
+        order = self.client.get(reverse('view_orders'), {'fields': 'id,status,secret', 'expand': 'user'}).json()[0]
+        self.assertEqual(set(order), {'id', 'status'})
+
+
+class DeliveryQueueTests(OrderTestCase):
+    """Cola del repartidor con long-poll sobre un cursor que ve entradas y salidas"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('delivery_queue')
+        self.order = self.make_order(OrderStatus.IN_DELIVERY, delivery_crew=self.crew)
+
+    def poll(self, since=None, wait=0):
+        self.client.force_authenticate(self.crew)
+        params = {} if since is None else {'since': since, 'wait': wait}
+        return self.client.get(self.url, params)
+
+    def test_unchanged_queue_returns_204(self):
+        cursor = self.poll().json()['cursor']
+        self.assertEqual(self.poll(cursor).status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_reassignment_wakes_the_poll(self):
+        first = self.poll().json()
+        self.assertEqual([order['id'] for order in first['results']], [str(self.order.pk)])
+        other_crew = User.objects.create_user('otro-repartidor')
+        other_crew.groups.add(Group.objects.get(name=DELIVERY_CREW))
+        self.client.force_authenticate(self.manager)
+        response = self.client.post(reverse('dispatch_orders'), [
+            {'order_id': str(self.order.pk), 'delivery_crew_id': other_crew.pk}
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.poll(first['cursor'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'], [])
+        self.assertNotEqual(response.json()['cursor'], first['cursor'])
+
+    def test_invalid_cursor_returns_400(self):
+        self.assertEqual(self.poll('2026-10-18T02:39:12Z').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_waiters_are_capped(self):
+        cursor = self.poll().json()['cursor']
+        for slot in range(LONG_POLL_MAX_WAITERS):
+            cache.add(WAITER_SLOT_KEY.format(slot), 1)
+        response = self.poll(cursor, wait=5)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+
+
+def sse_data(message):
+    """(evento, datos) de un mensaje SSE"""
+    lines = dict(line.split(': ', 1) for line in message.strip().splitlines())
+    return lines['event'], json.loads(lines['data'])
+
+
+class OrderEventStreamTests(LittleLemonTestCase):
+    """Flujo SSE: instantánea, eventos del bus y resincronización con la base de datos"""
+
+    def setUp(self):
+        super().setUp()
+        self.order = Order.objects.create(user=self.user, total=Decimal('5.00'))
+
+    def test_wsgi_request_gets_501(self):
+        self.assertEqual(self.client.get(reverse('order_events')).status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    async def test_snapshot_then_published_status_without_repeats(self):
+        stream = async_views.order_event_stream(self.user)
+        try:
+            self.assertTrue((await anext(stream)).startswith('retry:'))
+            event, data = sse_data(await anext(stream))
+            self.assertEqual((event, [order['id'] for order in data]), ('snapshot', [str(self.order.pk)]))
+
+            now = timezone.now()
+            await Order.objects.filter(pk=self.order.pk).aupdate(status=OrderStatus.PREPARING, updated_at=now)
+            order_events.publish(self.user.pk, status_event(self.order.pk, OrderStatus.PREPARING, now))
+            event, data = sse_data(await anext(stream))
+            self.assertEqual((event, data['status']), ('status', OrderStatus.PREPARING))
+
+            # La resincronización encuentra el mismo cambio y no lo repite
+            with mock.patch.object(async_views, 'KEEPALIVE_SECONDS', 0.01):
+                self.assertEqual(await anext(stream), ': keepalive\n\n')
+        finally:
+            await stream.aclose()
+        self.assertFalse(order_events.has_subscribers())
+
+    async def test_change_from_another_worker_arrives_on_resync(self):
+        stream = async_views.order_event_stream(self.user)
+        try:
+            await anext(stream)
+            await anext(stream)
+            # Cambio hecho en otro proceso: llega a la base de datos pero no a este bus
+            await Order.objects.filter(pk=self.order.pk).aupdate(
+                status=OrderStatus.CANCELLED, updated_at=timezone.now()
+            )
+            with mock.patch.object(async_views, 'KEEPALIVE_SECONDS', 0.01):
+                event, data = sse_data(await anext(stream))
+        finally:
+            await stream.aclose()
+        self.assertEqual((event, data['id'], data['status']), ('status', str(self.order.pk), OrderStatus.CANCELLED))
+
+
+@override_settings(ASYNC_VIEWS=['menu_items'])
+class AsyncViewSelectionTests(LittleLemonTestCase):
+    """Variantes async solo en procesos ASGI y sin caché síncrona en el bucle"""
+
+    def select_menu_items(self):
+        return select_view('menu_items', views.menu_items, async_views.menu_items_async)
+
+    def test_wsgi_process_mounts_sync_view(self):
+        self.assertIs(self.select_menu_items(), views.menu_items)
+
+    def test_asgi_process_mounts_async_view(self):
+        with mock.patch.object(async_views, '_serving_asgi', True):
+            self.assertIs(self.select_menu_items(), async_views.menu_items_async)
+
+    def test_async_catalog_key_matches_sync_key(self):
+        params = QueryDict('page=2&ordering=price')
+        self.assertEqual(async_to_sync(acatalog_key)(params, 'json'), catalog_key(params, 'json'))
+        bump_menu_version()
+        self.assertEqual(async_to_sync(acatalog_key)(params, 'json'), catalog_key(params, 'json'))
+
+
+class AsyncVariantParityTests(APITransactionTestCase):
+    """
+    Las variantes async responden lo mismo que las vistas síncronas. Transaccional:
+    autenticación y filtros corren en el pool de hilos, con otra conexión
+    """
+
+    def setUp(self):
+        cache.clear()
+        catalog_pages.clear()
+        self.user = User.objects.create_user('cliente-async')
+        category = Category.objects.create(title='Bebidas')
+        self.items = [
+            MenuItem.objects.create(title=title, price=Decimal(price), featured=category)
+            for title, price in [('Agua', '1.00'), ('Café', '1.80'), ('Té', '1.50')]
+        ]
+        Cart.objects.create(user=self.user, MenuItem=self.items[1], quantity=2)
+        Order.objects.create(user=self.user, total=Decimal('3.60'))
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def assert_same_response(self, name, async_view, args=(), params=None, headers=None):
+        headers = self.headers if headers is None else headers
+        url = reverse(name, args=args)
+        catalog_pages.clear()
+        expected = self.client.get(url, params, headers=headers)
+        catalog_pages.clear()
+        request = AsyncRequestFactory().get(url, params, headers=headers)
+        # Camino async propio, sin delegar en la vista síncrona
+        with mock.patch.object(async_views, 'delegate', side_effect=AssertionError('delegó en la vista síncrona')):
+            response = async_to_sync(async_view)(request, *args)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.get('Link'), expected.get('Link'))
+        self.assertEqual(response.get('ETag'), expected.get('ETag'))
+        self.assertEqual(json.loads(response.content), expected.json())
+        return response
+
+    def test_menu_items(self):
+        self.assert_same_response('menu_items', async_views.menu_items_async, params={'perpage': 2})
+        self.assert_same_response(
+            'menu_items', async_views.menu_items_async, params={'category': 'bebidas', 'ordering': '-price'}
+        )
+        self.assert_same_response('menu_items', async_views.menu_items_async, params={'search': 'cafe'})
+
+    def test_menu_item_detail(self):
+        self.assert_same_response('menu_item_detail', async_views.menu_item_detail_async, args=[self.items[0].pk])
+        self.assert_same_response('menu_item_detail', async_views.menu_item_detail_async, args=[999])
+
+    def test_cart_and_orders(self):
+        self.assert_same_response('view_cart', async_views.view_cart_async)
+        self.assert_same_response('view_orders', async_views.view_orders_async)
+
+    def test_unauthenticated(self):
+        self.assert_same_response('view_orders', async_views.view_orders_async, headers={})
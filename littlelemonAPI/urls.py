@@ -1,6 +1,18 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
 from rest_framework.authtoken.views import obtain_auth_token
+
+
+def select_view(name, sync_view, async_view):
+    """
+    Variante async de la ruta si su nombre figura en settings.ASYNC_VIEWS y el
+    proceso sirve ASGI (littlelemon/asgi.py). Bajo WSGI Django envolvería la vista
+    async con async_to_sync en cada petición, así que se monta la síncrona.
+    """
+    return async_view if name in settings.ASYNC_VIEWS and async_views.serving_asgi() else sync_view
+
+
 urlpatterns = [
     path('register/', views.register_user, name="register_user"),
     path('users/users/me/', views.current_user, name="current_user"),
@@ -9,8 +21,10 @@ urlpatterns = [
     path("throttle-check-auth/", views.throttle_check_auth, name="throttle_check_auth"),
     path('token-auth/', obtain_auth_token, name="api_token_auth"),
     # Rutas para menú
-    path('menu-items/', views.menu_items, name="menu_items"),
-    path('menu-items/<str:pk>/', views.menu_itemsbuscar, name="menu_item_detail"),
+    path('menu-items/', select_view('menu_items', views.menu_items, async_views.menu_items_async), name="menu_items"),
+    path('menu-items/autocomplete/', views.menu_autocomplete, name="menu_autocomplete"),
+    path('menu-items/cache-stats/', views.menu_cache_stats, name="menu_cache_stats"),
+    path('menu-items/<str:pk>/', select_view('menu_item_detail', views.menu_itemsbuscar, async_views.menu_item_detail_async), name="menu_item_detail"),
     
     # Rutas para categorías
     path('categories/', views.create_category, name="create_category"),
@@ -30,18 +44,24 @@ urlpatterns = [
     path('groups/delivery-crew/users/<str:userId>/', views.remove_from_delivery_crew, name="remove_delivery_crew"),
     
     # Rutas para carrito
-    path('cart/menu-items/', views.view_cart, name="view_cart"),
+    path('cart/menu-items/', select_view('view_cart', views.view_cart, async_views.view_cart_async), name="view_cart"),
     path('cart/menu-items/<int:pk>/', views.cart_item_detail, name="cart_item_detail"),
     path('cart/menu-items/add/', views.add_to_cart, name="add_to_cart"),
+    path('cart/menu-items/batch/', views.add_to_cart_batch, name="add_to_cart_batch"),
     path('cart/menu-items/clear/', views.clear_cart, name="clear_cart"),
     
     # Rutas para pedidos
-    path('orders/', views.view_orders, name="view_orders"),
+    path('orders/', select_view('view_orders', views.view_orders, async_views.view_orders_async), name="view_orders"),
     path('orders/create/', views.create_order, name="create_order"),
-    path('orders/<int:pk>/', views.get_order_items, name="get_order_items"),
+    path('orders/history/', views.order_history, name="order_history"),
+    path('orders/events/', async_views.order_events_stream, name="order_events"),
+    path('orders/dispatch/', views.dispatch_orders_view, name="dispatch_orders"),
+    path('orders/<uuid:pk>/', views.get_order_items, name="get_order_items"),
     path('orders/all/', views.view_all_orders, name="view_all_orders"),
-    path('orders/<int:pk>/update/', views.update_order, name="update_order"),
-    path('orders/<int:pk>/delete/', views.delete_order, name="delete_order"),
+    path('orders/all/export/', views.export_all_orders, name="export_all_orders"),
+    path('orders/<uuid:pk>/update/', views.update_order, name="update_order"),
+    path('orders/<uuid:pk>/delete/', views.delete_order, name="delete_order"),
     path('orders/delivery/', views.view_delivery_orders, name="view_delivery_orders"),
-    path('orders/<int:pk>/status/', views.update_order_status_delivery, name="update_order_status_delivery"),
+    path('orders/delivery/queue/', views.delivery_queue, name="delivery_queue"),
+    path('orders/<uuid:pk>/status/', views.update_order_status_delivery, name="update_order_status_delivery"),
 ]
\ No newline at end of file
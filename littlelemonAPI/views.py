@@ -1,21 +1,91 @@
+import math
+
 from django.shortcuts import render
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from .serializers import (
     Categoryserializer, MenuItemserializers, Cartserializers, 
-    Orderserializers, OrderItemserializers, UserSerializer,
+    Orderserializers, OrderItemserializers, UserSerializer, parse_field_params,
+    OrderHistorySerializer,
     UserCreateSerializer, GroupSerializer, GroupDetailSerializer
 )
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import Category, MenuItem, Cart, CartQuantityError, Order, OrderItem, OrderStatus, OrderTransitionError, parse_order_status
 from django.shortcuts import get_object_or_404
-from django.core.paginator import Paginator, EmptyPage
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 from django.contrib.auth.models import User, Group
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Prefetch
+from .catalog import catalog_pages, catalog_key, category_ids, get_menu_version
+from .conditional import queryset_validators, instance_validators, not_modified, set_validators
+from .pagination import (
+    paginate, paginate_numbered, PaginationError, CURSOR_PARAM,
+    ORDER_ORDERING, USER_ORDERING, GROUP_ORDERING
+)
+from .exports import EXPORT_FORMATS
+from .idempotency import idempotent
+from .search import get_search_backend
+from .facets import cached_facets
+from . import fastpath
+from .compression import compressed_body, set_content_encoding
+from .ordering import plan_menu_ordering, log_query_plan, OrderingError
+from .workqueue import (
+    crew_queue, queue_cursor, wait_for_changes, encode_since, decode_since, CursorError, LONG_POLL_TIMEOUT,
+    LONG_POLL_INTERVAL, acquire_waiter_slot, release_waiter_slot
+)
+from .dispatch import dispatch_orders, DispatchConflict, MAX_DISPATCH_ITEMS
+from .autocomplete import prefix_index, public_entry, DEFAULT_LIMIT, MAX_LIMIT
+from .permissions import IsManager, IsDeliveryCrew, IsStaffOrManager
+from .roles import (
+    MANAGER, DELIVERY_CREW, has_role, is_manager, is_staff_or_manager,
+    get_group_user_counts, update_group_membership
+)
+
+# Formatos cuya respuesta del catálogo se puede cachear ya renderizada
+CACHEABLE_FORMATS = {'json'}
+
+# Máximo de líneas aceptadas en una petición de carrito por lotes
+MAX_CART_BATCH_ITEMS = 100
+
+# Estados que puede fijar un repartidor sobre sus pedidos
+DELIVERY_CREW_STATUSES = (OrderStatus.IN_DELIVERY, OrderStatus.DELIVERED)
+
+def paginated_response(response, page, request):
+    """Añadir la cabecera Link con los cursores a un listado cuyo cuerpo es una lista"""
+    link = page.link_header(request)
+    if link:
+        response['Link'] = link
+    return response
+
+def invalid_status_response():
+    valid = ', '.join(OrderStatus.values)
+    return Response({"error": f"Valor de status inválido. Valores válidos: {valid}."},
+                    status=status.HTTP_400_BAD_REQUEST)
+
+def serialize_orders(orders, fields=None, expand=None):
+    """Serializar un listado de pedidos completo (sin paginar) en ORDER_ORDERING"""
+    orders = orders.order_by(*ORDER_ORDERING)
+    if fastpath.supports(Orderserializers, expand):
+        return fastpath.order_fast.serialize(fastpath.order_fast.values(orders, ORDER_ORDERING, fields), fields)
+    orders = Orderserializers.expand_queryset(orders, fields, expand)
+    return Orderserializers(orders, many=True, fields=fields, expand=expand).data
+
+def paginate_orders(request, orders, fields=None, expand=None):
+    """
+    Devuelve (página keyset, datos serializados) de un listado de pedidos: ruta
+    rápida con .values() salvo que se pidan relaciones anidadas (?expand=)
+    """
+    if fastpath.supports(Orderserializers, expand):
+        page = paginate(request, fastpath.order_fast.values(orders, ORDER_ORDERING, fields), ORDER_ORDERING)
+        return page, fastpath.order_fast.serialize(page, fields)
+    page = paginate(request, Orderserializers.expand_queryset(orders, fields, expand), ORDER_ORDERING)
+    return page, Orderserializers(page, many=True, fields=fields, expand=expand).data
+
 def hello_world(request):
     return Response("Hello, world!")
 
@@ -62,47 +132,157 @@ def register_user(request):
         
 
 
+def cached_catalog_response(request, cache_key):
+    """Página del catálogo ya renderizada desde la caché (o 304), o None si no está"""
+    cached = catalog_pages.get(cache_key)
+    if cached is None:
+        return None
+    body, etag, last_modified, link, variants = cached
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        # Variante comprimida guardada junto al cuerpo: se comprime una vez por página
+        body, encoding = compressed_body(request, body, variants)
+        response = set_content_encoding(
+            HttpResponse(body, content_type=request.accepted_renderer.media_type), encoding
+        )
+        if link:
+            response['Link'] = link
+    response['X-Cache'] = 'HIT'
+    return set_validators(response, etag, last_modified)
+
+def cache_catalog_response(request, cache_key, data, etag, last_modified, link):
+    """Renderizar una página del catálogo, guardarla en la caché y responderla"""
+    body = request.accepted_renderer.render(data, request.accepted_renderer.media_type)
+    variants = {}
+    catalog_pages.set(cache_key, (body, etag, last_modified, link, variants))
+    body, encoding = compressed_body(request, body, variants)
+    response = set_content_encoding(
+        HttpResponse(body, content_type=request.accepted_renderer.media_type), encoding
+    )
+    response['X-Cache'] = 'MISS'
+    if link:
+        response['Link'] = link
+    return set_validators(response, etag, last_modified)
+
+def filter_menu_items(items, query_params):
+    """Filtros del catálogo (category, to_price, search); compartido con la variante async"""
+    category_name = query_params.get('category')
+    to_price = query_params.get('to_price')
+    search = query_params.get('search')
+    if category_name:
+        # Slug o título -> id en memoria: se filtra por featured_id sin unir con Category
+        category_id = category_ids.resolve(category_name)
+        items = items.filter(featured_id=category_id) if category_id is not None else items.none()
+    if to_price:
+        items = items.filter(price__lte=to_price)
+    if search:
+        # Texto completo sobre title y description, anotando search_rank
+        items = get_search_backend().filter(items, search)
+    return items
+
 @api_view(['GET','POST'])
 # @permission_classes([IsAuthenticated])  # Comentado para usar IsAuthenticatedOrReadOnly global
 def menu_items(request):
     if request.method == 'GET':
-        items = MenuItem.objects.select_related('featured').all()
-        category_name = request.query_params.get('category')
-        to_price = request.query_params.get('to_price')
+        # Servir la página ya renderizada si la versión actual del menú está en caché
+        renderer_format = request.accepted_renderer.format
+        facets = request.query_params.get('facets')
+        cacheable = renderer_format in CACHEABLE_FORMATS and not facets
+        if cacheable:
+            cache_key = catalog_key(request.query_params, renderer_format)
+            response = cached_catalog_response(request, cache_key)
+            if response is not None:
+                return response
+        fields, expand = parse_field_params(request.query_params)
+        items = filter_menu_items(
+            MenuItemserializers.expand_queryset(MenuItem.objects.all(), fields, expand), request.query_params
+        )
         search = request.query_params.get('search')
         ordering = request.query_params.get('ordering')
-        perpage = request.query_params.get('perpage', default=5)
-        page = request.query_params.get('page', default=1)
-        if category_name:
-            items = items.filter(Category__title=category_name)
-        if to_price:
-            items = items.filter(price__lte=to_price)
-        if search:
-            items = items.filter(title__icontains=search)
-        if ordering:
-            ordering_fields = ordering.split(",")
-            print(*ordering_fields)
-            items = items.order_by(*ordering_fields)
-        paginator = Paginator(items, per_page=perpage)
+        if facets:
+            # Conteos por categoría, rango de precio y disponibilidad en lugar de una página
+            return Response(cached_facets(request.query_params, items))
         try:
-            items = paginator.page(number=page)
-        except EmptyPage:
-            items = []
-        serializer = MenuItemserializers(items, many=True)
-        return Response(serializer.data)
+            ordering_fields = plan_menu_ordering(ordering, search=bool(search))
+        except OrderingError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        log_query_plan(items, ordering_fields)
+        # Validadores baratos (MAX(updated_at) + COUNT) antes de paginar y serializar
+        etag, last_modified = queryset_validators(
+            items, fields=('updated_at', 'featured__updated_at'), extra=request.query_params.urlencode()
+        )
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return set_validators(response, etag, last_modified)
+        fast = fastpath.supports(MenuItemserializers, expand)
+        if fast:
+            # Filas de .values() serializadas sin instanciar modelos ni campos DRF
+            items = fastpath.menu_item_fast.values(items, ordering_fields, fields)
+        try:
+            page = paginate(request, items, ordering_fields, page_size_param='perpage', default_page_size=5)
+        except PaginationError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if fast:
+            data = fastpath.menu_item_fast.serialize(page, fields)
+        else:
+            data = MenuItemserializers(page, many=True, fields=fields, expand=expand).data
+        link = page.link_header(request)
+        if not cacheable:
+            response = Response(data)
+            if link:
+                response['Link'] = link
+            return set_validators(response, etag, last_modified)
+        return cache_catalog_response(request, cache_key, data, etag, last_modified, link)
     elif request.method == 'POST':
         serializer = MenuItemserializers(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def menu_cache_stats(request):
+    """
+    Estadísticas de la caché del catálogo (aciertos, fallos, entradas)
+    Requiere permisos de administrador
+    """
+    if not request.user.is_staff:
+        return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
+    data = catalog_pages.stats()
+    data['menu_version'] = get_menu_version()
+    return Response(data)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def menu_autocomplete(request):
+    """
+    Sugerencias para escribir-mientras-se-busca: ?q=<prefijo>&limit=<n>
+    Se responden desde el índice de prefijos en memoria, sin consultar la base de datos
+    """
+    query = request.query_params.get('q', '')
+    try:
+        limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        return Response({"error": "El parámetro limit debe ser un número entero."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1:
+        return Response({"error": "El parámetro limit debe ser mayor que cero."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    results = [public_entry(entry) for entry in prefix_index.complete(query, limit)]
+    return Response({"results": results})
+
 @api_view(["GET", "PATCH", "DELETE"])
 @permission_classes([AllowAny])  # Permitir acceso a todos para GET, pero PATCH y DELETE requieren autenticación en configuración global
 def menu_itemsbuscar(request, pk):
-    item = get_object_or_404(MenuItem, id=pk)
+    item = get_object_or_404(MenuItem.objects.select_related('featured'), id=pk)
     if request.method == 'GET':
-        serializer = MenuItemserializers(item)
-        return Response(serializer.data)
+        etag, last_modified = instance_validators(item, item.featured, extra=request.query_params.urlencode())
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return set_validators(response, etag, last_modified)
+        fields, expand = parse_field_params(request.query_params)
+        serializer = MenuItemserializers(item, fields=fields, expand=expand)
+        return set_validators(Response(serializer.data), etag, last_modified)
     elif request.method == 'PATCH':
         serializer = MenuItemserializers(item, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
@@ -121,7 +301,7 @@ def Categoria(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def secret(request):
-    if request.user.groups.filter(name='Manager').exists():
+    if is_manager(request.user):
         return Response({"message": "Some secret message"})
     else:
         return Response(status=403)
@@ -234,38 +414,80 @@ def remove_from_delivery_crew(request, userId):
 @permission_classes([IsAuthenticated])
 def view_cart(request):
     cart_items = Cart.objects.filter(user=request.user)
-    serializer = Cartserializers(cart_items, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    data = fastpath.cart_fast.serialize(fastpath.cart_fast.values(cart_items))
+    return Response(data, status=status.HTTP_200_OK)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotent
 def add_to_cart(request):
     menu_item_id = request.data.get("menu_item_id")
     quantity = request.data.get("quantity", 1)
     if not menu_item_id:
         return Response({"error": "Se requiere menu_item_id."}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        menu_item = MenuItem.objects.get(id=menu_item_id)
-    except MenuItem.DoesNotExist:
+        menu_item = MenuItem.objects.only('id', 'price').get(id=menu_item_id)
+    except (MenuItem.DoesNotExist, ValueError):
         return Response({"error": "El elemento del menú no existe."}, status=status.HTTP_404_NOT_FOUND)
     try:
         quantity = int(quantity)
-    except ValueError:
+    except (ValueError, TypeError):
         return Response({"error": "Cantidad inválida."}, status=status.HTTP_400_BAD_REQUEST)
-    unit_price = menu_item.price
-    total_price = unit_price * quantity
-    cart_item, created = Cart.objects.get_or_create(
-        user=request.user,
-        MenuItem=menu_item,
-        defaults={'quantity': quantity, 'unit_price': unit_price, 'price': total_price}
-    )
-    if not created:
-        cart_item.quantity += quantity
-        cart_item.price = cart_item.quantity * unit_price
-        cart_item.save()
+    if quantity <= 0:
+        return Response({"error": "La cantidad debe ser mayor que cero."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        Cart.add_items(request.user, [(menu_item, quantity)])
+    except CartQuantityError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    cart_item = Cart.objects.get(user=request.user, MenuItem=menu_item)
     serializer = Cartserializers(cart_item)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@idempotent
+def add_to_cart_batch(request):
+    """
+    Añadir varios elementos al carrito en una sola petición
+    Cuerpo: {"items": [{"menu_item_id": 1, "quantity": 2}, ...]} (o directamente la lista)
+    Devuelve el carrito actualizado
+    """
+    lines = request.data.get("items") if isinstance(request.data, dict) else request.data
+    if not isinstance(lines, list) or not lines:
+        return Response({"error": "Se requiere una lista de items."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(lines) > MAX_CART_BATCH_ITEMS:
+        return Response({"error": f"Como máximo {MAX_CART_BATCH_ITEMS} items por petición."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    # Validar y agrupar cantidades por elemento del menú
+    quantities = {}
+    for line in lines:
+        if not isinstance(line, dict) or not line.get("menu_item_id"):
+            return Response({"error": "Cada item requiere menu_item_id."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            menu_item_id = int(line["menu_item_id"])
+            quantity = int(line.get("quantity", 1))
+        except (ValueError, TypeError):
+            return Response({"error": "Cantidad o menu_item_id inválido."}, status=status.HTTP_400_BAD_REQUEST)
+        if quantity <= 0:
+            return Response({"error": "La cantidad debe ser mayor que cero."}, status=status.HTTP_400_BAD_REQUEST)
+        quantities[menu_item_id] = quantities.get(menu_item_id, 0) + quantity
+    
+    # Todos los elementos del menú en una sola consulta
+    menu_items = MenuItem.objects.only('id', 'price').in_bulk(list(quantities))
+    missing = [menu_item_id for menu_item_id in quantities if menu_item_id not in menu_items]
+    if missing:
+        return Response({"error": "Algunos elementos del menú no existen.", "missing_ids": missing},
+                        status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        Cart.add_items(request.user, [(menu_items[menu_item_id], quantity)
+                                      for menu_item_id, quantity in quantities.items()])
+    except CartQuantityError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = Cartserializers(Cart.objects.filter(user=request.user), many=True)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
 def clear_cart(request):
@@ -275,113 +497,196 @@ def clear_cart(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def view_orders(request):
+    fields, expand = parse_field_params(request.query_params)
     orders = Order.objects.filter(user=request.user)
-    serializer = Orderserializers(orders, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    etag, last_modified = queryset_validators(orders, extra=request.query_params.urlencode())
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return set_validators(response, etag, last_modified)
+    try:
+        # Paginación keyset sobre idx_order_user_date
+        page, data = paginate_orders(request, orders, fields, expand)
+    except PaginationError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    response = Response(data, status=status.HTTP_200_OK)
+    return set_validators(paginated_response(response, page, request), etag, last_modified)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def order_history(request):
+    """
+    Historial de pedidos del usuario con sus ítems y el título de cada plato
+    Siempre tres consultas por página: validadores, pedidos (idx_order_user_date) e ítems
+    """
+    orders = Order.objects.filter(user=request.user)
+    etag, last_modified = queryset_validators(orders, extra=request.query_params.urlencode())
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return set_validators(response, etag, last_modified)
+    orders = orders.prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('menuitem'))
+    )
+    try:
+        page = paginate(request, orders, ORDER_ORDERING)
+    except PaginationError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = OrderHistorySerializer(page, many=True)
+    response = Response(serializer.data, status=status.HTTP_200_OK)
+    return set_validators(paginated_response(response, page, request), etag, last_modified)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotent
 def create_order(request):
-    cart_items = Cart.objects.filter(user=request.user)
-    if not cart_items.exists():
+    order = Order.create_from_cart(request.user)
+    if order is None:
         return Response({"error": "El carrito está vacío."}, status=status.HTTP_400_BAD_REQUEST)
-    total = sum(item.price for item in cart_items)
-    order = Order.objects.create(
-        user=request.user,
-        total=total,
-        date=timezone.now().date()
-    )
-    order_items = []
-    for item in cart_items:
-        order_items.append(OrderItem(
-            order=order,
-            menuitem=item.MenuItem,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            price=item.price
-        ))
-    OrderItem.objects.bulk_create(order_items)
-    cart_items.delete()
     serializer = Orderserializers(order)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_order_items(request, pk):
-    order = get_object_or_404(Order, pk=pk)
-    if order.user != request.user:
+    # Solo el dueño: comparar user_id evita cargar el usuario del pedido
+    order = get_object_or_404(Order.objects.only('id', 'user_id'), pk=pk)
+    if order.user_id != request.user.pk:
         return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
-    order_items = OrderItem.objects.filter(order=order)
-    serializer = OrderItemserializers(order_items, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    order_items = OrderItem.objects.filter(order_id=order.pk)
+    # El id del pedido en el ETag: dos pedidos vacíos no comparten validador
+    etag, last_modified = queryset_validators(order_items, extra=str(order.pk))
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return set_validators(response, etag, last_modified)
+    data = fastpath.order_item_fast.serialize(fastpath.order_item_fast.values(order_items))
+    return set_validators(Response(data, status=status.HTTP_200_OK), etag, last_modified)
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def view_all_orders(request):
     if not request.user.is_staff:
         return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
+    fields, expand = parse_field_params(request.query_params)
     orders = Order.objects.all()
-    serializer = Orderserializers(orders, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    order_status = request.query_params.get('status')
+    if order_status:
+        # Filtro por estado servido por idx_order_status_date
+        orders = orders.filter(status=order_status)
+    try:
+        page, data = paginate_orders(request, orders, fields, expand)
+    except PaginationError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return paginated_response(Response(data, status=status.HTTP_200_OK), page, request)
 
-@api_view(["PATCH"])
+@api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def update_order(request, pk):
-    if not request.user.groups.filter(name="Manager").exists():
+def export_all_orders(request):
+    """
+    Exportar todos los pedidos en streaming (NDJSON o CSV)
+    Parámetros: output=ndjson|csv, items=1 para incluir los ítems, status para filtrar
+    Requiere permisos de administrador
+    """
+    if not request.user.is_staff:
         return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
+    output = request.query_params.get('output', 'ndjson')
+    if output not in EXPORT_FORMATS:
+        return Response({"error": "Formato no soportado. Use ndjson o csv."}, status=status.HTTP_400_BAD_REQUEST)
+    include_items = request.query_params.get('items') in ('1', 'true', 'True')
+    orders = Order.objects.all()
+    order_status = request.query_params.get('status')
+    if order_status:
+        orders = orders.filter(status=order_status)
+    stream, content_type, extension = EXPORT_FORMATS[output]
+    response = StreamingHttpResponse(stream(orders, include_items), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="orders.{extension}"'
+    return response
+
+@api_view(["PATCH"])
+@permission_classes([IsAuthenticated, IsManager])
+def update_order(request, pk):
+    """
+    Cambiar estado y/o repartidor de un pedido. Todo se valida antes de escribir y
+    ambos cambios van en una sola transacción: un 400 o 409 deja el pedido intacto.
+    """
     order = get_object_or_404(Order, pk=pk)
+    new_status = None
     if "status" in request.data:
-        new_status = request.data["status"]
-        try:
-            new_status = int(new_status)
-        except (ValueError, TypeError):
-            return Response({"error": "Valor de status inválido."}, status=status.HTTP_400_BAD_REQUEST)
-        if new_status not in [0, 1]:
-            return Response({"error": "El status debe ser 0 o 1."}, status=status.HTTP_400_BAD_REQUEST)
-        order.status = bool(new_status)
-    if "delivery_crew_ids" in request.data:
-        crew_ids = request.data["delivery_crew_ids"]
-        if not isinstance(crew_ids, list):
-            crew_ids = [crew_ids]
-        delivery_users = []
-        for uid in crew_ids:
-            try:
-                user = User.objects.get(pk=uid)
-            except User.DoesNotExist:
-                return Response({"error": f"El usuario con id {uid} no existe."}, status=status.HTTP_400_BAD_REQUEST)
-            if not user.groups.filter(name="Delivery_crew").exists():
-                return Response({"error": f"El usuario con id {uid} no pertenece al grupo de entrega."}, status=status.HTTP_400_BAD_REQUEST)
-            delivery_users.append(user)
-        order.delivery_crew.set(delivery_users)
-    order.save()
+        new_status = parse_order_status(request.data["status"])
+        if new_status is None:
+            return invalid_status_response()
+    delivery_user = None
+    if "delivery_crew_id" in request.data or "delivery_crew_ids" in request.data:
+        # delivery_crew es una ForeignKey: un único repartidor por pedido
+        crew_id = request.data.get("delivery_crew_id", request.data.get("delivery_crew_ids"))
+        if isinstance(crew_id, list):
+            if len(crew_id) != 1:
+                return Response({"error": "Un pedido solo puede tener un repartidor."}, status=status.HTTP_400_BAD_REQUEST)
+            crew_id = crew_id[0]
+        if str(crew_id).isdigit():
+            delivery_user = User.objects.filter(pk=crew_id, groups__name=DELIVERY_CREW).first()
+        if delivery_user is None:
+            return Response({"error": f"El usuario con id {crew_id} no existe o no pertenece al grupo de entrega."},
+                            status=status.HTTP_400_BAD_REQUEST)
+    try:
+        with transaction.atomic():
+            if new_status is not None:
+                # UPDATE condicional sobre el estado leído: si otro cambio llegó antes, 409
+                Order.transition(order.pk, new_status, changed_by=request.user, expected=[order.status])
+                order.status = new_status
+            if delivery_user is not None:
+                order.assign_crew(delivery_user, changed_by=request.user)
+    except OrderTransitionError as e:
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
     serializer = Orderserializers(order)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsManager])
+def dispatch_orders_view(request):
+    """
+    Despacho masivo: [{order_id, status, delivery_crew_id}, ...] (o {"orders": [...]}).
+    Las líneas inválidas se devuelven en 'errors' y no impiden aplicar las demás.
+    """
+    lines = request.data.get("orders") if isinstance(request.data, dict) else request.data
+    if not isinstance(lines, list) or not lines:
+        return Response({"error": "Se requiere una lista de pedidos."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(lines) > MAX_DISPATCH_ITEMS:
+        return Response({"error": f"Máximo {MAX_DISPATCH_ITEMS} pedidos por lote."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        updated_orders, errors = dispatch_orders(lines, request.user)
+    except DispatchConflict as e:
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response({
+        'message': f"Se actualizaron {len(updated_orders)} pedidos.",
+        'updated_orders': updated_orders,
+        'errors': errors
+    }, status=status.HTTP_200_OK)
+
 @api_view(["PATCH"])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsDeliveryCrew])
 def update_order_status_delivery(request, pk):
-    if not request.user.groups.filter(name="Delivery_crew").exists():
-        return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
-    order = get_object_or_404(Order, pk=pk)
     if "status" not in request.data:
         return Response({"error": "El campo 'status' es requerido."}, status=status.HTTP_400_BAD_REQUEST)
-    new_status = request.data["status"]
+    new_status = parse_order_status(request.data["status"])
+    if new_status is None:
+        return invalid_status_response()
+    if new_status not in DELIVERY_CREW_STATUSES:
+        return Response({"error": "El repartidor solo puede marcar pedidos en entrega o entregados."},
+                        status=status.HTTP_400_BAD_REQUEST)
     try:
-        new_status = int(new_status)
-    except (ValueError, TypeError):
-        return Response({"error": "Valor de status inválido."}, status=status.HTTP_400_BAD_REQUEST)
-    if new_status not in [0, 1]:
-        return Response({"error": "El status debe ser 0 o 1."}, status=status.HTTP_400_BAD_REQUEST)
-    order.status = bool(new_status)
-    order.save()
-    serializer = Orderserializers(order)
+        # Sin lectura previa: UPDATE condicional restringido a los pedidos del repartidor + historial
+        Order.transition(pk, new_status, changed_by=request.user, filters={'delivery_crew': request.user})
+    except Order.DoesNotExist:
+        return Response({"error": "Pedido no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+    except OrderTransitionError as e:
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+    serializer = Orderserializers(Order.objects.get(pk=pk))
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
 def delete_order(request, pk):
     order = get_object_or_404(Order, pk=pk)
-    if order.user != request.user and not request.user.groups.filter(name="Manager").exists():
+    if order.user_id != request.user.id and not is_manager(request.user):
         return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
     order.delete()
     return Response({"message": "Pedido eliminado."}, status=status.HTTP_200_OK)
@@ -389,22 +694,70 @@ def delete_order(request, pk):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def view_delivery_orders(request):
-    if not request.user.groups.filter(name__in=["Manager", "Delivery_crew"]).exists():
+    if not has_role(request.user, MANAGER, DELIVERY_CREW):
         return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
-    orders = Order.objects.filter(delivery_crew__isnull=False).distinct()
-    serializer = Orderserializers(orders, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    fields, expand = parse_field_params(request.query_params)
+    orders = Order.objects.filter(delivery_crew__isnull=False)
+    if CURSOR_PARAM not in request.query_params and 'per_page' not in request.query_params:
+        # Sin parámetros de paginación se devuelve la lista completa, como antes;
+        # los repartidores tienen su cola paginada en /orders/delivery/queue/
+        return Response(serialize_orders(orders, fields, expand), status=status.HTTP_200_OK)
+    try:
+        page, data = paginate_orders(request, orders, fields, expand)
+    except PaginationError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return paginated_response(Response(data, status=status.HTTP_200_OK), page, request)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsDeliveryCrew])
+def delivery_queue(request):
+    """
+    Cola de trabajo del repartidor: sus pedidos READY / IN_DELIVERY (idx_order_crew_queue).
+    Con ?since=<cursor> espera hasta ?wait= segundos a que cambie su cola (pedidos que
+    cambian, entran o salen); si no cambia nada responde 204 y el cliente vuelve a
+    preguntar con el mismo cursor. Con todos los huecos de espera ocupados responde 503.
+    """
+    since = request.query_params.get("since")
+    if since:
+        try:
+            since = decode_since(since)
+        except CursorError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            wait = min(max(int(request.query_params.get("wait", LONG_POLL_TIMEOUT)), 0), LONG_POLL_TIMEOUT)
+        except ValueError:
+            return Response({"error": "Valor de wait inválido."}, status=status.HTTP_400_BAD_REQUEST)
+        cursor, changed = wait_for_changes(request.user, since, timeout=0)
+        if not changed and wait > 0:
+            slot = acquire_waiter_slot(wait)
+            if slot is None:
+                return Response(
+                    {"error": "Demasiadas esperas en curso, vuelve a intentarlo."},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": str(max(1, math.ceil(LONG_POLL_INTERVAL)))},
+                )
+            try:
+                cursor, changed = wait_for_changes(request.user, since, timeout=wait)
+            finally:
+                release_waiter_slot(slot)
+        if not changed:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+    else:
+        cursor = queue_cursor(request.user)
+    fields, expand = parse_field_params(request.query_params)
+    orders = crew_queue(request.user).order_by(*ORDER_ORDERING)
+    return Response({
+        "cursor": encode_since(cursor),
+        "results": fastpath.order_fast.serialize(fastpath.order_fast.values(orders, fields=fields), fields),
+    }, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsStaffOrManager])
 def create_category(request):
     """
     Crear una nueva categoría
     Requiere permisos de administrador o gerente
     """
-    if not request.user.is_staff and not request.user.groups.filter(name="Manager").exists():
-        return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
-    
     serializer = Categoryserializer(data=request.data)
     if serializer.is_valid():
         serializer.save()
@@ -423,11 +776,15 @@ def category_detail(request, pk):
         return Response(status=status.HTTP_404_NOT_FOUND)
     
     if request.method == 'GET':
+        etag, last_modified = instance_validators(category)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return set_validators(response, etag, last_modified)
         serializer = Categoryserializer(category)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), etag, last_modified)
     
     # Verificar permisos para modificaciones
-    if not request.user.is_staff and not request.user.groups.filter(name="Manager").exists():
+    if not is_staff_or_manager(request.user):
         return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
     
     if request.method == 'PUT' or request.method == 'PATCH':
@@ -449,38 +806,35 @@ def category_detail(request, pk):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsStaffOrManager])
 def user_list(request):
     """
     Listar todos los usuarios del sistema.
     Requiere permisos de administrador o gerente
     """
-    if not request.user.is_staff and not request.user.groups.filter(name="Manager").exists():
-        return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
-    
     # Soporte para paginación y filtrado
-    page = int(request.query_params.get('page', 1))
-    per_page = int(request.query_params.get('per_page', 10))
     search = request.query_params.get('search', '')
     
     # Filtrar usuarios
-    users = User.objects.all().order_by('username')
+    users = User.objects.all()
     if search:
         users = users.filter(username__icontains=search) | users.filter(email__icontains=search)
     
-    # Paginar resultados
-    paginator = Paginator(users, per_page)
+    # Paginar resultados (?page= como antes, o ?cursor= para seguir por keyset)
     try:
-        users = paginator.page(page)
-    except EmptyPage:
-        users = []
+        page = paginate_numbered(request, users, USER_ORDERING, default_page_size=10)
+    except PaginationError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer = UserSerializer(users, many=True)
+    serializer = UserSerializer(page, many=True)
+    links = page.links(request)
     
     return Response({
-        'count': paginator.count,
-        'pages': paginator.num_pages,
-        'current_page': page,
+        'count': page.count,
+        'pages': page.pages,
+        'current_page': page.number,
+        'next': links['next'],
+        'previous': links['previous'],
         'results': serializer.data
     })
 
@@ -491,9 +845,8 @@ def user_detail(request, pk):
     Recuperar, actualizar o desactivar un usuario
     """
     # Solo administradores, gerentes o el propio usuario pueden acceder
-    if not (request.user.is_staff or 
-            request.user.groups.filter(name="Manager").exists() or 
-            request.user.id == int(pk)):
+    staff_or_manager = is_staff_or_manager(request.user)
+    if not (staff_or_manager or request.user.id == int(pk)):
         return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
     
     try:
@@ -517,8 +870,7 @@ def user_detail(request, pk):
         return Response(data)
     
     # Solo administradores o gerentes pueden modificar usuarios (excepto el propio usuario)
-    if request.method in ['PUT', 'PATCH'] and not (request.user.is_staff or 
-            request.user.groups.filter(name="Manager").exists()) and request.user.id != int(pk):
+    if request.method in ['PUT', 'PATCH'] and not staff_or_manager and request.user.id != int(pk):
         return Response({"error": "No tienes permisos para modificar este usuario."},
                         status=status.HTTP_403_FORBIDDEN)
     
@@ -602,25 +954,27 @@ def cart_item_detail(request, pk):
                        status=status.HTTP_200_OK)
 
 @api_view(['GET', 'POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsStaffOrManager])
 def group_list(request):
     """
     Listar todos los grupos o crear un nuevo grupo
     Requiere permisos de administrador o gerente
     """
-    if not request.user.is_staff and not request.user.groups.filter(name="Manager").exists():
-        return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
-    
     if request.method == 'GET':
-        groups = Group.objects.all().order_by('name')
-        data = []
-        for group in groups:
-            data.append({
-                'id': group.id,
-                'name': group.name,
-                'user_count': group.user_set.count()
-            })
-        return Response(data)
+        # Conteos en caché (o un único annotate) en lugar de un COUNT por grupo
+        user_counts = get_group_user_counts()
+        groups = Group.objects.all()
+        paged = CURSOR_PARAM in request.query_params or 'per_page' in request.query_params
+        if paged:
+            try:
+                groups = paginate(request, groups, GROUP_ORDERING)
+            except PaginationError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            groups = groups.order_by(*GROUP_ORDERING)
+        serializer = GroupSerializer(groups, many=True, context={'user_counts': user_counts})
+        response = Response(serializer.data)
+        return paginated_response(response, groups, request) if paged else response
     
     elif request.method == 'POST':
         if not request.user.is_staff:  # Solo administradores pueden crear grupos
@@ -644,31 +998,23 @@ def group_list(request):
         }, status=status.HTTP_201_CREATED)
 
 @api_view(['GET', 'PUT', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsStaffOrManager])
 def group_detail(request, pk):
     """
     Recuperar, actualizar o eliminar un grupo
     """
-    if not request.user.is_staff and not request.user.groups.filter(name="Manager").exists():
-        return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
-    
     try:
         group = Group.objects.get(pk=pk)
     except Group.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
     
     if request.method == 'GET':
-        # Obtener usuarios del grupo con paginación
-        page = int(request.query_params.get('page', 1))
-        per_page = int(request.query_params.get('per_page', 20))
-        
-        users = group.user_set.all().order_by('username')
-        paginator = Paginator(users, per_page)
-        
+        # Obtener usuarios del grupo con paginación (?page= o ?cursor=)
         try:
-            paginated_users = paginator.page(page)
-        except EmptyPage:
-            paginated_users = []
+            paginated_users = paginate_numbered(request, group.user_set.all(), USER_ORDERING)
+        except PaginationError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        links = paginated_users.links(request)
         
         users_data = []
         for user in paginated_users:
@@ -681,10 +1027,12 @@ def group_detail(request, pk):
         return Response({
             'id': group.id,
             'name': group.name,
-            'user_count': group.user_set.count(),
+            'user_count': get_group_user_counts().get(group.pk, 0),
             'users': users_data,
-            'page': page,
-            'pages': paginator.num_pages
+            'page': paginated_users.number,
+            'pages': paginated_users.pages,
+            'next': links['next'],
+            'previous': links['previous']
         })
     
     elif request.method == 'PUT':
@@ -720,14 +1068,11 @@ def group_detail(request, pk):
                        status=status.HTTP_200_OK)
 
 @api_view(['POST', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, IsStaffOrManager])
 def group_users(request, pk):
     """
     Añadir o eliminar usuarios de un grupo
     """
-    if not request.user.is_staff and not request.user.groups.filter(name="Manager").exists():
-        return Response({"error": "Acceso no autorizado."}, status=status.HTTP_403_FORBIDDEN)
-    
     try:
         group = Group.objects.get(pk=pk)
     except Group.DoesNotExist:
@@ -743,22 +1088,7 @@ def group_users(request, pk):
             return Response({"error": "Se requiere al menos un ID de usuario."},
                           status=status.HTTP_400_BAD_REQUEST)
         
-        added_users = []
-        errors = []
-        
-        for user_id in user_ids:
-            try:
-                user = User.objects.get(pk=user_id)
-                if user not in group.user_set.all():
-                    group.user_set.add(user)
-                    added_users.append({
-                        'id': user.id,
-                        'username': user.username
-                    })
-                else:
-                    errors.append(f"Usuario {user.username} ya pertenece al grupo.")
-            except User.DoesNotExist:
-                errors.append(f"Usuario con ID {user_id} no encontrado.")
+        added_users, errors = update_group_membership(group, user_ids, add=True)
         
         return Response({
             'message': f"Se añadieron {len(added_users)} usuarios al grupo.",
@@ -776,22 +1106,7 @@ def group_users(request, pk):
             return Response({"error": "Se requiere al menos un ID de usuario."},
                           status=status.HTTP_400_BAD_REQUEST)
         
-        removed_users = []
-        errors = []
-        
-        for user_id in user_ids:
-            try:
-                user = User.objects.get(pk=user_id)
-                if user in group.user_set.all():
-                    group.user_set.remove(user)
-                    removed_users.append({
-                        'id': user.id,
-                        'username': user.username
-                    })
-                else:
-                    errors.append(f"Usuario {user.username} no pertenece al grupo.")
-            except User.DoesNotExist:
-                errors.append(f"Usuario con ID {user_id} no encontrado.")
+        removed_users, errors = update_group_membership(group, user_ids, add=False)
         
         return Response({
             'message': f"Se eliminaron {len(removed_users)} usuarios del grupo.",
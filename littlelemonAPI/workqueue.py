@@ -0,0 +1,96 @@
+"""
+Cola de trabajo del repartidor: sus pedidos activos (READY / IN_DELIVERY).
+
+La consulta de la cola filtra por el índice compuesto idx_order_crew_queue
+(delivery_crew, status, -date); con dos estados en status__in el orden del
+listado no sale del índice, pero la cola de un repartidor es corta y se ordena
+en memoria. El cursor `since` resume la cola actual: número de pedidos y mayor
+updated_at. Todo cambio de un pedido de la cola (transition, assign_crew,
+dispatch) actualiza updated_at y toda salida de la cola (reasignación, entrega,
+cancelación) cambia el número de pedidos, así que cualquier diferencia con el
+cursor que envía la app es un cambio. Con ?since=<cursor> la vista espera
+(long-poll) hasta que la cola cambie o venza ORDER_LONG_POLL['TIMEOUT'],
+comprobando cada ORDER_LONG_POLL['INTERVAL'] segundos con una consulta agregada.
+
+Cada espera ocupa un worker, por eso como mucho ORDER_LONG_POLL['MAX_WAITERS']
+peticiones esperan a la vez (en todos los procesos si la caché es compartida);
+las demás reciben la cola si ya cambió o un 503 con Retry-After.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Order, OrderStatus
+
+_long_poll_settings = getattr(settings, 'ORDER_LONG_POLL', {})
+
+LONG_POLL_TIMEOUT = _long_poll_settings.get('TIMEOUT', 25)
+LONG_POLL_INTERVAL = _long_poll_settings.get('INTERVAL', 1)
+LONG_POLL_MAX_WAITERS = _long_poll_settings.get('MAX_WAITERS', 4)
+
+QUEUE_STATUSES = (OrderStatus.READY, OrderStatus.IN_DELIVERY)
+
+WAITER_SLOT_KEY = 'workqueue:waiter:{}'
+
+
+class CursorError(ValueError):
+    """Cursor `since` con formato inválido"""
+
+
+def crew_queue(user):
+    """Pedidos activos asignados a `user` (idx_order_crew_queue)"""
+    return Order.objects.filter(delivery_crew=user, status__in=QUEUE_STATUSES)
+
+
+def queue_cursor(user):
+    """Cursor de la cola de `user`: (número de pedidos, mayor updated_at o None)"""
+    cursor = crew_queue(user).aggregate(count=Count('id'), updated_at=Max('updated_at'))
+    return cursor['count'], cursor['updated_at']
+
+
+def encode_since(cursor):
+    count, updated_at = cursor
+    micros = 0 if updated_at is None else int(updated_at.timestamp()) * 1_000_000 + updated_at.microsecond
+    return f'{count}.{micros}'
+
+
+def decode_since(token):
+    count, _, micros = token.partition('.')
+    if not (count.isdigit() and micros.isdigit()):
+        raise CursorError('Cursor since inválido.')
+    return token
+
+
+def acquire_waiter_slot(timeout):
+    """
+    Reservar uno de los LONG_POLL_MAX_WAITERS huecos de espera. Los huecos son claves
+    de caché que caducan solas, por si el proceso muere sin liberarlas.
+    Devuelve la clave reservada o None si no queda ninguno
+    """
+    for slot in range(LONG_POLL_MAX_WAITERS):
+        key = WAITER_SLOT_KEY.format(slot)
+        if cache.add(key, 1, timeout=int(timeout) + 5):
+            return key
+    return None
+
+
+def release_waiter_slot(key):
+    cache.delete(key)
+
+
+def wait_for_changes(user, since, timeout=LONG_POLL_TIMEOUT, interval=LONG_POLL_INTERVAL):
+    """
+    Esperar hasta que el cursor de la cola de `user` deje de ser `since` o venza
+    `timeout`. Devuelve el cursor actual (True si hubo cambios, False si no)
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        cursor = queue_cursor(user)
+        if encode_since(cursor) != since:
+            return cursor, True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return cursor, False
+        time.sleep(min(interval, remaining))